@@ -0,0 +1,126 @@
+# CloudTrail Parquet 압축(cloudtrail_compaction) 효과 측정: 합성 로그 크기별로
+#   raw      : gzip JSON 원본을 그대로 읽어 9단계 쿼리 (Athena 원본 테이블과 같은 방식, eventtime 문자열 비교)
+#   compact  : 리전별로 eventtime 정렬 Parquet 변환 (9compact_cloudtrail_logs의 UNLOAD에 해당, 1회 비용)
+#   query    : 변환된 Parquet에서 같은 쿼리 (eventtime TIMESTAMP 비교 → 행 그룹 min/max로 건너뜀)
+# Athena 대신 내장 엔진 duckdb 사용 (없으면 측정 생략), 합성 로그는 benchmark/cloudtrail_scan.py와 동일
+#
+# 사용법: python benchmark/cloudtrail_compaction.py [객체 수,...]
+#   예: python benchmark/cloudtrail_compaction.py 100,400,1600
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import cloudtrail_scan
+
+# 합성 로그 생성기 재사용 (lambda/cloudtrail_scan과 이름이 같아 경로로 불러옴)
+_spec = importlib.util.spec_from_file_location(
+    "cloudtrail_scan_benchmark", os.path.join(os.path.dirname(__file__), "cloudtrail_scan.py")
+)
+fixtures = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fixtures)
+
+# Athena 원본 테이블처럼 필요한 필드만 스키마로 지정 (자동 추론으로 eventTime이 TIMESTAMP가 되지 않게)
+RECORDS_TYPE = ("STRUCT(eventTime VARCHAR, eventSource VARCHAR, eventName VARCHAR, "
+                "userIdentity STRUCT(arn VARCHAR), userAgent VARCHAR)[]")
+# 합성 로그 규모에 맞춘 행 그룹 크기 (Athena UNLOAD는 파일 크기 기준으로 나눔)
+ROW_GROUP_SIZE = 16384
+
+
+def raw_source(root, region):
+    day = fixtures.DAY.strftime("%Y/%m/%d")
+    path = os.path.join(root, fixtures.BUCKET, fixtures.LOG_PREFIX, region, day, "*.json.gz")
+    return (f"(SELECT unnest(Records) AS r FROM read_json('{path}', "
+            f"columns = {{'Records': '{RECORDS_TYPE}'}}, format = 'auto'))")
+
+
+def raw_query(root, region, window, arn_prefix):
+    start, end = window
+    return f"""
+    SELECT DISTINCT r.eventSource AS event_source, r.eventName AS event_name
+    FROM {raw_source(root, region)}
+    WHERE r.eventTime BETWEEN '{start.strftime('%Y-%m-%dT%H:%M:%SZ')}' AND '{end.strftime('%Y-%m-%dT%H:%M:%SZ')}'
+      AND (r.userIdentity.arn LIKE '{arn_prefix}%' OR r.userAgent LIKE '%Terraform%')
+    """
+
+
+def compact_sql(root, region, target):
+    return f"""
+    COPY (
+      SELECT
+        strptime(r.eventTime, '%Y-%m-%dT%H:%M:%SZ') AS eventtime,
+        r.eventSource AS eventsource,
+        r.eventName AS eventname,
+        r.userIdentity.arn AS useridentity_arn,
+        r.userAgent AS useragent
+      FROM {raw_source(root, region)}
+      ORDER BY 1
+    ) TO '{target}' (FORMAT PARQUET, COMPRESSION SNAPPY, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+    """
+
+
+def compact_query(target, window, arn_prefix):
+    start, end = window
+    return f"""
+    SELECT DISTINCT eventsource AS event_source, eventname AS event_name
+    FROM read_parquet('{target}')
+    WHERE eventtime BETWEEN TIMESTAMP '{start.strftime('%Y-%m-%d %H:%M:%S')}'
+                        AND TIMESTAMP '{end.strftime('%Y-%m-%d %H:%M:%S')}'
+      AND (useridentity_arn LIKE '{arn_prefix}%' OR useragent LIKE '%Terraform%')
+    """
+
+
+def timed(con, sqls):
+    start = time.perf_counter()
+    rows = set()
+    for sql in sqls:
+        result = con.execute(sql)
+        if result.description:
+            rows |= set(result.fetchall())
+    return time.perf_counter() - start, rows
+
+
+def size_of(root):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+def main():
+    try:
+        import duckdb
+    except ImportError:
+        print("⚠️ duckdb가 없어 측정 생략 (pip install duckdb)")
+        return 0
+
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "100,400,1600").split(",")]
+    arn_prefix = cloudtrail_scan.role_arn_prefix(fixtures.ACCOUNT_ID)
+
+    print(f"{'objects':>8}{'rawMB':>8}{'pqMB':>7}{'raw':>8}{'compact':>9}{'query':>8}{'apis':>6}  (초)")
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix="cloudtrail-compaction-bench-")
+        try:
+            fixtures.make_fixtures(root, size)
+            raw_dir = os.path.join(root, fixtures.BUCKET)
+            compact_dir = os.path.join(root, "compact")
+            os.makedirs(compact_dir)
+            targets = {region: os.path.join(compact_dir, f"{region}.parquet") for region in fixtures.REGIONS}
+            con = duckdb.connect()
+
+            raw, raw_rows = timed(con, [raw_query(root, region, fixtures.WINDOW, arn_prefix)
+                                        for region in fixtures.REGIONS])
+            compact, _ = timed(con, [compact_sql(root, region, target) for region, target in targets.items()])
+            query, compact_rows = timed(con, [compact_query(target, fixtures.WINDOW, arn_prefix)
+                                              for target in targets.values()])
+            assert raw_rows == compact_rows
+            con.close()
+            print(f"{size:8}{size_of(raw_dir) / 1024 / 1024:8.1f}{size_of(compact_dir) / 1024 / 1024:7.1f}"
+                  f"{raw:8.2f}{compact:9.2f}{query:8.3f}{len(raw_rows):6}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# 합성 CloudTrail 로그 생성기 (9/10단계 규모 측정용)
+# - terratest CodeBuild 빌드 N회: iam_action_catalog의 리소스 타입별 API를 배포(init → 생성 → 테스트 → 삭제) 순서로 호출
+# - 관련 없는 트래픽: 콘솔 사용자, 애플리케이션 역할, AWS 서비스, 다른 배포 파이프라인, 로컬 terraform 사용자
+# - 실제 전달 방식처럼 리전별 5분 단위로 묶어 5~15분 뒤 전달된 gzip 파일로 저장
+#   ({bucket}/AWSLogs/{account}/CloudTrail/{region}/yyyy/MM/dd/{account}_CloudTrail_{region}_{yyyymmddThhmm}Z_{id}.json.gz)
+# - 첫 번째 빌드의 시간 범위에서 9단계 조건(역할 ARN 또는 Terraform user agent)에 맞는 API를 정답으로 반환
+#
+# 사용법: python benchmark/cloudtrail_corpus.py 출력_디렉터리 [하루 이벤트 수] [terraform 비율] [빌드 수]
+#   예: python benchmark/cloudtrail_corpus.py /tmp/corpus 100000 0.05 4
+import gzip
+import json
+import os
+import random
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import cloudtrail_scan
+import iam_action_catalog
+
+ACCOUNT_ID = "123456789012"
+BUCKET = "cloudtrail-logs-bench"
+LOG_PREFIX = f"AWSLogs/{ACCOUNT_ID}/CloudTrail"
+REGIONS = ["ap-northeast-2", "us-east-1"]
+HOME_REGION = "ap-northeast-2"
+DAY = datetime(2026, 10, 19, tzinfo=timezone.utc)
+# 글로벌 서비스 이벤트는 us-east-1에 기록됨
+GLOBAL_SERVICES = {"iam", "route53", "cloudfront", "wafv2"}
+DELIVERY_INTERVAL = timedelta(minutes=5)
+MAX_RECORDS_PER_FILE = 500
+
+BUILD_MINUTES = 25
+# 빌드 단계: (이름, 시작 분, 끝 분, 이벤트 비중)
+BUILD_PHASES = [("init", 0, 1, 0.05), ("create", 1, 10, 0.40), ("test", 10, 18, 0.20), ("destroy", 18, 25, 0.35)]
+TERRAFORM_AGENT = ("APN/1.0 HashiCorp/1.0 Terraform/1.9.5 (+https://www.terraform.io) "
+                   "terraform-provider-aws/5.70.0 (+https://registry.terraform.io/providers/hashicorp/aws) "
+                   "aws-sdk-go-v2/1.30.5 ua/2.1 os/linux lang/go#1.22.6 md/GOOS#linux md/GOARCH#amd64")
+
+# 관련 없는 트래픽: 호출 주체 / user agent / 액션 / 비중
+BACKGROUND = [
+    {"type": "IAMUser", "arn": "arn:aws:iam::{account}:user/dev-{n}", "agent": "AWS Internal",
+     "actions": ["ec2:DescribeInstances", "s3:ListBuckets", "cloudwatch:GetMetricData", "iam:ListRoles",
+                 "logs:DescribeLogGroups", "rds:DescribeDBInstances"], "weight": 2},
+    {"type": "AssumedRole", "arn": "arn:aws:sts::{account}:assumed-role/app-lambda-role/app-{n}",
+     "agent": "Boto3/1.34.0 md/Botocore#1.34.0 ua/2.0 os/linux#5.10 lang/python#3.12.2 exec-env/AWS_Lambda_python3.12",
+     "actions": ["kms:Decrypt", "secretsmanager:GetSecretValue", "sts:AssumeRole", "sqs:ListQueues",
+                 "lambda:GetFunction"], "weight": 5},
+    {"type": "AWSService", "arn": None, "agent": "ecs.amazonaws.com", "invoked_by": "ecs.amazonaws.com",
+     "actions": ["sts:AssumeRole", "kms:GenerateDataKey", "ecs:SubmitTaskStateChange",
+                 "ec2:DescribeNetworkInterfaces"], "weight": 4},
+    {"type": "AssumedRole", "arn": "arn:aws:sts::{account}:assumed-role/other-deploy-role/pipeline-{n}",
+     "agent": "aws-cli/2.15.0 Python/3.11.6 Linux/5.10 exe/x86_64.amzn.2 prompt/off command/cloudformation.deploy",
+     "actions": ["cloudformation:DescribeStacks", "cloudformation:CreateChangeSet", "s3:PutObject",
+                 "ec2:DescribeSecurityGroups"], "weight": 2},
+    # 9단계 user agent 조건에 걸리는 로컬 terraform 사용자 (빌드 시간과 겹치면 정답에 포함)
+    {"type": "IAMUser", "arn": "arn:aws:iam::{account}:user/ops-admin", "agent": TERRAFORM_AGENT,
+     "actions": ["ec2:DescribeVpcs", "s3:GetBucketPolicy", "iam:GetRole"], "weight": 0.2},
+]
+
+
+def _id(rng, length=32):
+    return f"{rng.getrandbits(length * 4):0{length}x}"
+
+
+def _uuid(rng):
+    value = _id(rng)
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+
+def event_region(action):
+    return "us-east-1" if action.split(":")[0] in GLOBAL_SERVICES else HOME_REGION
+
+
+def make_record(rng, event_time, action, identity, agent, region, invoked_by=None):
+    service, name = action.split(":", 1)
+    user_identity = {"type": identity["type"]}
+    if invoked_by:
+        user_identity["invokedBy"] = invoked_by
+    else:
+        user_identity.update({
+            "principalId": f"AROA{_id(rng, 16).upper()}:{identity['session']}",
+            "arn": identity["arn"],
+            "accountId": ACCOUNT_ID,
+            "accessKeyId": f"ASIA{_id(rng, 16).upper()}",
+        })
+        if identity["type"] == "AssumedRole":
+            role = identity["arn"].split("/")[1]
+            user_identity["sessionContext"] = {
+                "sessionIssuer": {"type": "Role", "arn": f"arn:aws:iam::{ACCOUNT_ID}:role/{role}",
+                                  "accountId": ACCOUNT_ID, "userName": role},
+                "attributes": {"creationDate": event_time.strftime("%Y-%m-%dT%H:00:00Z"), "mfaAuthenticated": "false"}
+            }
+    read_only = name.startswith(("Describe", "Get", "List"))
+    return {
+        "eventVersion": "1.09",
+        "userIdentity": user_identity,
+        "eventTime": event_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "eventSource": f"{service}.amazonaws.com",
+        "eventName": name,
+        "awsRegion": region,
+        "sourceIPAddress": invoked_by or f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+        "userAgent": agent,
+        "requestParameters": None if read_only else {"tagSpecificationSet": {"items": [{"resourceType": service}]}},
+        "responseElements": None,
+        "requestID": _uuid(rng),
+        "eventID": _uuid(rng),
+        "readOnly": read_only,
+        "eventType": "AwsApiCall",
+        "managementEvent": True,
+        "recipientAccountId": ACCOUNT_ID,
+        "eventCategory": "Management",
+    }
+
+
+def build_times(builds):
+    """빌드 시작 시각: 업무 시간(01~23시) 안에 고르게"""
+    return [DAY + timedelta(hours=1) + timedelta(minutes=(22 * 60 * i) // max(builds, 1)) for i in range(builds)]
+
+
+def build_events(rng, start, count):
+    """terratest 빌드 1회의 (eventTime, action, identity, agent, invokedBy) 목록"""
+    types = rng.sample(sorted(iam_action_catalog.CATALOG), min(8, len(iam_action_catalog.CATALOG)))
+    phase_actions = {
+        "init": sorted(iam_action_catalog.PROVIDER_ACTIONS),
+        "create": sorted({a for t in types for a in iam_action_catalog.CATALOG[t]["read"] + iam_action_catalog.CATALOG[t]["create"]}),
+        "test": sorted({a for t in types for a in iam_action_catalog.CATALOG[t]["read"]}),
+        "destroy": sorted({a for t in types for a in iam_action_catalog.CATALOG[t]["read"] + iam_action_catalog.CATALOG[t]["delete"]}),
+    }
+    session = f"AWSCodeBuild-{_uuid(rng)}"
+    identity = {"type": "AssumedRole", "arn": f"{cloudtrail_scan.role_arn_prefix(ACCOUNT_ID)}/{session}", "session": session}
+    events = []
+    for phase, begin, end, share in BUILD_PHASES:
+        actions = phase_actions[phase]
+        # 각 액션 최소 1회 + 나머지는 조회(Describe) 폴링처럼 무작위 반복
+        picks = actions + [rng.choice(actions) for _ in range(max(0, int(count * share) - len(actions)))]
+        for action in picks:
+            offset = rng.uniform(begin * 60, end * 60)
+            events.append((start + timedelta(seconds=offset), action, identity, TERRAFORM_AGENT, None))
+    return events
+
+
+def background_events(rng, count):
+    weights = [b["weight"] for b in BACKGROUND]
+    events = []
+    for _ in range(count):
+        source = rng.choices(BACKGROUND, weights)[0]
+        n = rng.randrange(20)
+        identity = {"type": source["type"], "arn": (source["arn"] or "").format(account=ACCOUNT_ID, n=n),
+                    "session": f"session-{n}"}
+        event_time = DAY + timedelta(seconds=rng.uniform(0, 24 * 60 * 60))
+        events.append((event_time, rng.choice(source["actions"]), identity, source["agent"], source.get("invoked_by")))
+    return events
+
+
+def write_files(rng, root, records_by_region):
+    """리전별 5분 단위로 묶어 5~15분 뒤 전달된 파일로 저장 → (객체 수, 바이트)"""
+    objects, total_bytes = 0, 0
+    for region, records in records_by_region.items():
+        intervals = defaultdict(list)
+        for record in records:
+            event_time = datetime.strptime(record["eventTime"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            intervals[int((event_time - DAY) / DELIVERY_INTERVAL)].append(record)
+        for index, batch in sorted(intervals.items()):
+            delivered = DAY + DELIVERY_INTERVAL * (index + 1) + timedelta(minutes=rng.uniform(5, 15))
+            for i in range(0, len(batch), MAX_RECORDS_PER_FILE):
+                name = (f"{ACCOUNT_ID}_CloudTrail_{region}_{delivered.strftime('%Y%m%dT%H%M')}Z_"
+                        f"{_id(rng, 16)}.json.gz")
+                path = os.path.join(root, BUCKET, LOG_PREFIX, region, delivered.strftime("%Y/%m/%d"), name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, "wt") as f:
+                    json.dump({"Records": batch[i:i + MAX_RECORDS_PER_FILE]}, f)
+                objects += 1
+                total_bytes += os.path.getsize(path)
+    return objects, total_bytes
+
+
+def generate(root, events, terraform_share=0.05, builds=4, margin_seconds=0, seed=7):
+    """root 아래에 하루치 로그 생성 → {"bucket", "log_prefix", "regions", "build_window", "expected", ...}
+
+    build_window는 첫 번째 빌드의 시작/종료(ISO), expected는 그 범위(± margin_seconds)에서
+    9단계 조건에 맞는 {(eventSource, eventName)}
+    """
+    rng = random.Random(seed)
+    terraform_events = int(events * terraform_share)
+    starts = build_times(builds)
+    raw = []
+    for start in starts:
+        raw.extend(build_events(rng, start, terraform_events // max(builds, 1)))
+    raw.extend(background_events(rng, max(0, events - len(raw))))
+
+    window_start, window_end = starts[0], starts[0] + timedelta(minutes=BUILD_MINUTES)
+    margin = timedelta(seconds=margin_seconds)
+    window_text = tuple(t.strftime("%Y-%m-%dT%H:%M:%SZ") for t in (window_start - margin, window_end + margin))
+    arn_prefix = cloudtrail_scan.role_arn_prefix(ACCOUNT_ID)
+
+    records_by_region = defaultdict(list)
+    expected = set()
+    for event_time, action, identity, agent, invoked_by in raw:
+        record = make_record(rng, event_time, action, identity, agent, event_region(action), invoked_by)
+        records_by_region[record["awsRegion"]].append(record)
+        if cloudtrail_scan.matches(record, arn_prefix, window_text):
+            expected.add((record["eventSource"], record["eventName"]))
+    objects, total_bytes = write_files(rng, root, records_by_region)
+    return {
+        "bucket": BUCKET,
+        "log_prefix": LOG_PREFIX,
+        "regions": REGIONS,
+        "account_id": ACCOUNT_ID,
+        "build_window": {"start": window_start.isoformat(), "end": window_end.isoformat()},
+        "expected": expected,
+        "records": len(raw),
+        "objects": objects,
+        "bytes": total_bytes,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("사용법: python benchmark/cloudtrail_corpus.py 출력_디렉터리 [하루 이벤트 수] [terraform 비율] [빌드 수]")
+        return 1
+    root = sys.argv[1]
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    share = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    builds = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    corpus = generate(root, events, share, builds)
+    print(f"✅ {corpus['records']}건 → 객체 {corpus['objects']}개, {corpus['bytes'] / 1024 / 1024:.1f} MB "
+          f"(s3://{BUCKET}/{LOG_PREFIX} → {root})")
+    print(f"🕒 첫 빌드: {corpus['build_window']['start']} ~ {corpus['build_window']['end']}, "
+          f"정답 API {len(corpus['expected'])}개")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
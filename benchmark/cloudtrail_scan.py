@@ -0,0 +1,126 @@
+# CloudTrail 직접 조회(cloudtrail_scan) 시간 측정: 합성 로그 크기별로
+#   serial  : 하루 전체 객체를 1개 스레드로 읽기
+#   pooled  : 하루 전체 객체를 스레드 풀로 읽기
+#   window  : 스레드 풀 + 빌드 시간 범위 밖에서 전달된 객체 건너뛰기
+# S3 대신 로컬 디렉터리를 사용하고, 객체 요청마다 네트워크 지연(기본 20ms)을 흉내냄
+#
+# 사용법: python benchmark/cloudtrail_scan.py [객체 수,...] [요청 지연 ms]
+#   예: python benchmark/cloudtrail_scan.py 100,400,1600 20
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import cloudtrail_scan
+
+ACCOUNT_ID = "123456789012"
+BUCKET = "cloudtrail-logs-bench"
+LOG_PREFIX = f"AWSLogs/{ACCOUNT_ID}/CloudTrail"
+REGIONS = ["ap-northeast-2", "us-east-1"]
+DAY = datetime(2026, 10, 19, tzinfo=timezone.utc)
+# 하루 중 terratest 빌드가 돈 1시간
+WINDOW = (DAY + timedelta(hours=10), DAY + timedelta(hours=11))
+RECORDS_PER_OBJECT = 200
+SOURCES = [("ec2.amazonaws.com", ["RunInstances", "DescribeVpcs", "CreateTags", "DescribeSubnets"]),
+           ("elasticloadbalancing.amazonaws.com", ["CreateLoadBalancer", "DescribeTargetGroups"]),
+           ("rds.amazonaws.com", ["CreateDBInstance", "DescribeDBInstances"]),
+           ("s3.amazonaws.com", ["GetObject", "PutObject", "ListBucket"])]
+
+
+class LocalS3:
+    """list_objects_v2 페이지 나열 / get_object만 흉내내는 로컬 디렉터리 저장소"""
+
+    def __init__(self, root, latency):
+        self.root = root
+        self.latency = latency
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        base = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(os.path.join(base, Prefix)):
+            for name in files:
+                keys.append(os.path.relpath(os.path.join(directory, name), base))
+        keys.sort()
+        for i in range(0, len(keys), 1000):
+            time.sleep(self.latency)
+            yield {"Contents": [
+                {"Key": k, "Size": os.path.getsize(os.path.join(base, k))} for k in keys[i:i + 1000]
+            ]}
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        with open(os.path.join(self.root, Bucket, Key), "rb") as f:
+            return {"Body": io.BytesIO(f.read())}
+
+
+def record(rng, event_time):
+    source, names = rng.choice(SOURCES)
+    if rng.random() < 0.1:
+        arn = f"{cloudtrail_scan.role_arn_prefix(ACCOUNT_ID)}/AWSCodeBuild-{rng.randrange(10**6)}"
+        agent = "APN/1.0 HashiCorp/1.0 Terraform/1.9.0"
+    else:
+        arn = f"arn:aws:sts::{ACCOUNT_ID}:assumed-role/other-role/session"
+        agent = "aws-cli/2.15.0"
+    return {
+        "eventTime": event_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "eventSource": source,
+        "eventName": rng.choice(names),
+        "userIdentity": {"arn": arn},
+        "userAgent": agent
+    }
+
+
+def make_fixtures(root, objects, seed=7):
+    """하루 동안 고르게 전달된 객체 N개 (리전 번갈아) 생성"""
+    rng = random.Random(seed)
+    for i in range(objects):
+        region = REGIONS[i % len(REGIONS)]
+        delivered = DAY + timedelta(minutes=(1440 * i) // objects)
+        records = [record(rng, delivered - timedelta(seconds=rng.randrange(300))) for _ in range(RECORDS_PER_OBJECT)]
+        name = f"{ACCOUNT_ID}_CloudTrail_{region}_{delivered.strftime('%Y%m%dT%H%M')}Z_{i:06d}.json.gz"
+        path = os.path.join(root, BUCKET, LOG_PREFIX, region, DAY.strftime("%Y/%m/%d"), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, "wt") as f:
+            json.dump({"Records": records}, f)
+
+
+def measure(s3, window, workers):
+    start = time.perf_counter()
+    result = cloudtrail_scan.scan(s3, BUCKET, LOG_PREFIX, REGIONS, [DAY.strftime("%Y/%m/%d")], ACCOUNT_ID,
+                                  window=window, max_workers=workers)
+    return time.perf_counter() - start, result
+
+
+def main():
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "100,400,1600").split(",")]
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    print(f"{'objects':>8}{'MB':>8}{'serial':>9}{'pooled':>9}{'window':>9}{'read':>7}{'apis':>6}  (초, 요청 지연 {latency * 1000:.0f}ms)")
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix="cloudtrail-scan-bench-")
+        try:
+            make_fixtures(root, size)
+            s3 = LocalS3(root, latency)
+            serial, full = measure(s3, None, 1)
+            pooled, pooled_result = measure(s3, None, cloudtrail_scan.MAX_WORKERS)
+            windowed, windowed_result = measure(s3, WINDOW, cloudtrail_scan.MAX_WORKERS)
+            assert pooled_result["events"] == full["events"]
+            print(f"{size:8}{full['bytes'] / 1024 / 1024:8.1f}{serial:9.2f}{pooled:9.2f}{windowed:9.2f}"
+                  f"{windowed_result['objects']:7}{len(windowed_result['events']):6}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# GitHub 업로드 방식 비교 (로컬 GitHub API 대역 서버 benchmark/github_stub.py 사용): 파일 수별로
+#   contents : 기존 11단계 방식 (파일마다 get_contents + update_file/create_file → 파일마다 커밋)
+#   publish  : github_publisher (blob 병렬 업로드 + 트리/커밋 1개)
+#   again    : 같은 파일로 다시 publish (ETag 304 + blob SHA 비교 → 커밋 없음)
+#   race     : ref 갱신 직전에 다른 커밋이 2번 끼어드는 경우 (fast-forward 거부 → 재시도)
+#   empty    : 커밋이 없는 새 저장소 (contents API로 첫 커밋 → 나머지는 커밋 1개)
+# 요청 수는 rate limit에 잡히는 요청(304 제외) 기준
+#
+# 사용법: python benchmark/github_publish.py [파일 수,...] [요청 지연 ms]
+#   예: python benchmark/github_publish.py 5,20,80 30
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+sys.path.insert(1, os.path.dirname(__file__))
+import github_stub
+
+try:
+    import requests
+    import github_publisher
+except ImportError:
+    requests = None
+
+TOKEN = "ghp_local_stub"
+
+
+def make_files(count, revision=0):
+    return {
+        f"modules/module_{i % 8}/resource_{i:03d}.tf":
+            f'resource "aws_s3_bucket" "b{i}" {{\n  bucket = "bench-{i}-{revision}"\n}}\n'.encode("utf-8")
+        for i in range(count)
+    }
+
+
+def upload_contents(base_url, repo, files, branch="main"):
+    """기존 11단계 방식: 파일마다 조회 후 수정/생성"""
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TOKEN}"
+    for path, content in files.items():
+        url = f"{base_url}/repos/{repo}/contents/{path}"
+        body = {"message": f"Update {path}", "content": base64.b64encode(content).decode("ascii"), "branch": branch}
+        existing = session.get(url, params={"ref": branch})
+        if existing.status_code == 200:
+            body["sha"] = existing.json()["sha"]
+        session.put(url, json=body).raise_for_status()
+
+
+def measure(server, action):
+    before_requests, before_304 = server.stats.requests, server.stats.not_modified
+    start = time.perf_counter()
+    result = action()
+    seconds = time.perf_counter() - start
+    requests_made = server.stats.requests - before_requests
+    not_modified = server.stats.not_modified - before_304
+    return seconds, requests_made - not_modified, not_modified, result
+
+
+def main():
+    if requests is None:
+        print("⚠️ requests가 없어 측정 생략 (pip install requests)")
+        return 0
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "5,20,80").split(",")]
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 30) / 1000
+    server, base_url = github_stub.serve(latency=latency)
+
+    print(f"{'files':>6}  {'mode':<9}{'sec':>7}{'reqs':>6}{'304':>5}{'commits':>8}{'tries':>6}  (요청 지연 {latency * 1000:.0f}ms)")
+    for size in sizes:
+        files = make_files(size)
+
+        repo = f"bench/contents-{size}"
+        seconds, reqs, cached, _ = measure(server, lambda: upload_contents(base_url, repo, files))
+        state = server.repos[repo]
+        assert {p: c for p, c in state.files("main").items() if p in files} == files
+        print(f"{size:6}  {'contents':<9}{seconds:7.2f}{reqs:6}{cached:5}{state.commit_count('main') - 1:8}{'-':>6}")
+
+        repo = f"bench/publish-{size}"
+        client = github_publisher.GitHubClient(TOKEN, repo, base_url)
+        for mode, content, interfere in (("publish", files, 0), ("again", files, 0),
+                                         ("race", make_files(size, revision=1), 2)):
+            server.repos.setdefault(repo, github_stub.Repository())
+            state = server.repos[repo]
+            state.interfere = interfere
+            commits_before = state.commit_count("main")
+            seconds, reqs, cached, result = measure(
+                server, lambda: github_publisher.publish(client, content, f"Publish {size} files", "main")
+            )
+            assert {p: c for p, c in state.files("main").items() if p in content} == content
+            commits = state.commit_count("main") - commits_before - interfere
+            print(f"{size:6}  {mode:<9}{seconds:7.2f}{reqs:6}{cached:5}{commits:8}{result['attempts']:6}")
+
+        repo = f"bench/empty-{size}"
+        state = server.repos[repo] = github_stub.Repository(empty=True)
+        client = github_publisher.GitHubClient(TOKEN, repo, base_url)
+        seconds, reqs, cached, result = measure(
+            server, lambda: github_publisher.publish(client, files, f"Publish {size} files", "main")
+        )
+        assert state.files("main") == files
+        print(f"{size:6}  {'empty':<9}{seconds:7.2f}{reqs:6}{cached:5}{state.commit_count('main'):8}{result['attempts']:6}")
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# 로컬 GitHub API 대역 서버 (github_publisher / 11단계 동작 확인용, 메모리 저장소)
+#   GET  /repos/{owner}/{repo}                        저장소 정보 (default_branch)
+#   GET  /repos/{owner}/{repo}/git/ref/heads/{branch} 브랜치 ref
+#   POST /repos/{owner}/{repo}/git/refs               브랜치 생성 (이미 있으면 422)
+#   PATCH /repos/{owner}/{repo}/git/refs/heads/{b}    ref 갱신 (force=false면 fast-forward만, 아니면 422)
+#   GET  /repos/{owner}/{repo}/git/commits/{sha}      커밋 / POST .../git/commits 커밋 생성
+#   GET  /repos/{owner}/{repo}/git/trees/{sha}        트리(경로 평탄화) / POST .../git/trees 트리 생성 (base_tree)
+#   POST /repos/{owner}/{repo}/git/blobs              blob 생성 (SHA는 git과 동일)
+#   GET/PUT /repos/{owner}/{repo}/contents/{path}     파일 단위 API (기존 11단계 방식 비교용, PUT마다 커밋 1개)
+# - GET 응답에 ETag, If-None-Match가 같으면 304 (rate limit 미차감)
+# - 요청마다 지연(latency)을 넣어 네트워크 왕복을 흉내냄
+# - interfere=N: 다음 N번의 ref 갱신 직전에 다른 커밋을 끼워 넣어 경합 재현
+# - Repository(empty=True): 커밋이 없는 새 저장소 (Git Data API는 409, contents PUT으로 첫 커밋 생성)
+#
+# 사용법: python benchmark/github_stub.py [포트] [요청 지연 ms]
+import base64
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATE_LIMIT = 5000
+_ROUTE = re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)(?P<rest>/.*)?$")
+
+
+def _sha(kind, data):
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode("utf-8") + data).hexdigest()
+
+
+class Repository:
+    """한 저장소의 객체(blob / 평탄화한 트리 / 커밋)와 브랜치"""
+
+    def __init__(self, default_branch="main", empty=False):
+        self.lock = threading.Lock()
+        self.default_branch = default_branch
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.interfere = 0
+        if not empty:
+            tree = self._put_tree({"README.md": self._put_blob(b"# stub\n")})
+            self.refs[default_branch] = self._put_commit("Initial commit", tree, [])
+
+    @property
+    def empty(self):
+        return not self.refs
+
+    def _put_blob(self, content):
+        sha = _sha("blob", content)
+        self.blobs[sha] = content
+        return sha
+
+    def _put_tree(self, entries):
+        sha = _sha("tree", json.dumps(entries, sort_keys=True).encode("utf-8"))
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _put_commit(self, message, tree, parents):
+        body = json.dumps({"message": message, "tree": tree, "parents": parents, "at": time.time()}).encode("utf-8")
+        sha = _sha("commit", body)
+        self.commits[sha] = {"message": message, "tree": tree, "parents": parents}
+        return sha
+
+    def _descends(self, commit, ancestor):
+        stack = [commit]
+        while stack:
+            current = stack.pop()
+            if current == ancestor:
+                return True
+            stack.extend(self.commits.get(current, {}).get("parents", []))
+        return False
+
+    def commit_files(self, branch, files, message):
+        """브랜치 head 위에 파일을 바로 커밋 (다른 작성자 / 파일 단위 API, 브랜치가 없으면 첫 커밋)"""
+        head = self.refs.get(branch)
+        entries = dict(self.trees[self.commits[head]["tree"]]) if head else {}
+        for path, content in files.items():
+            entries[path] = self._put_blob(content)
+        self.refs[branch] = self._put_commit(message, self._put_tree(entries), [head] if head else [])
+        return self.refs[branch]
+
+    def files(self, branch):
+        tree = self.trees[self.commits[self.refs[branch]]["tree"]]
+        return {path: self.blobs[sha] for path, sha in tree.items()}
+
+    def commit_count(self, branch):
+        count, current = 0, self.refs[branch]
+        while current:
+            count += 1
+            parents = self.commits[current]["parents"]
+            current = parents[0] if parents else None
+        return count
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.by_method = {}
+
+    def count(self, method, status):
+        with self.lock:
+            self.requests += 1
+            self.by_method[method] = self.by_method.get(method, 0) + 1
+            if status == 304:
+                self.not_modified += 1
+
+    @property
+    def rate_limited(self):
+        # GitHub처럼 304는 rate limit에서 빼지 않음
+        return self.requests - self.not_modified
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "GitHubStub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- 응답 ---
+    def _send(self, status, payload=None, etag=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        stats = self.server.stats
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        stats.count(self.command, status)
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Remaining", str(max(0, RATE_LIMIT - stats.rate_limited)))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _route(self):
+        time.sleep(self.server.latency)
+        if not self.headers.get("Authorization"):
+            self._send(401, {"message": "Requires authentication"})
+            return None, None, None
+        url = urlparse(self.path)
+        match = _ROUTE.match(url.path)
+        if not match:
+            self._send(404, {"message": "Not Found"})
+            return None, None, None
+        repo = self.server.repos.setdefault(match.group("repo"), Repository())
+        return repo, match.group("rest") or "", parse_qs(url.query)
+
+    @staticmethod
+    def _etag(kind, key):
+        return f'"{hashlib.sha1(f"{kind}:{key}".encode("utf-8")).hexdigest()}"'
+
+    # --- 메서드 ---
+    def do_GET(self):
+        repo, rest, query = self._route()
+        if repo is None:
+            return
+        with repo.lock:
+            if rest == "":
+                self._send(200, {"full_name": urlparse(self.path).path[len("/repos/"):], "default_branch": repo.default_branch},
+                           etag=self._etag("repo", repo.default_branch))
+            elif rest.startswith("/git/") and repo.empty:
+                self._send(409, {"message": "Git Repository is empty."})
+            elif rest.startswith("/git/ref/heads/"):
+                branch = rest[len("/git/ref/heads/"):]
+                if branch not in repo.refs:
+                    self._send(404, {"message": "Not Found"})
+                else:
+                    sha = repo.refs[branch]
+                    self._send(200, {"ref": f"refs/heads/{branch}", "object": {"sha": sha, "type": "commit"}},
+                               etag=self._etag("ref", sha))
+            elif rest.startswith("/git/commits/"):
+                sha = rest[len("/git/commits/"):]
+                commit = repo.commits.get(sha)
+                if not commit:
+                    self._send(404, {"message": "Not Found"})
+                else:
+                    self._send(200, {"sha": sha, "message": commit["message"], "tree": {"sha": commit["tree"]},
+                                     "parents": [{"sha": p} for p in commit["parents"]]}, etag=self._etag("commit", sha))
+            elif rest.startswith("/git/trees/"):
+                sha = rest[len("/git/trees/"):]
+                tree = repo.trees.get(sha)
+                if tree is None:
+                    self._send(404, {"message": "Not Found"})
+                else:
+                    entries = [{"path": p, "mode": "100644", "type": "blob", "sha": s} for p, s in sorted(tree.items())]
+                    self._send(200, {"sha": sha, "tree": entries, "truncated": False}, etag=self._etag("tree", sha))
+            elif rest.startswith("/contents/"):
+                path = rest[len("/contents/"):]
+                branch = query.get("ref", [repo.default_branch])[0]
+                tree = repo.trees[repo.commits[repo.refs[branch]]["tree"]] if branch in repo.refs else {}
+                if path not in tree:
+                    self._send(404, {"message": "Not Found"})
+                else:
+                    self._send(200, {"path": path, "sha": tree[path], "encoding": "base64",
+                                     "content": base64.b64encode(repo.blobs[tree[path]]).decode("ascii")})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        repo, rest, _ = self._route()
+        if repo is None:
+            return
+        body = self._json()
+        with repo.lock:
+            if rest.startswith("/git/") and repo.empty:
+                self._send(409, {"message": "Git Repository is empty."})
+            elif rest == "/git/blobs":
+                content = base64.b64decode(body["content"]) if body.get("encoding") == "base64" else body["content"].encode("utf-8")
+                self._send(201, {"sha": repo._put_blob(content)})
+            elif rest == "/git/trees":
+                entries = dict(repo.trees.get(body.get("base_tree"), {}))
+                for entry in body["tree"]:
+                    if entry.get("sha") is None:
+                        entries.pop(entry["path"], None)
+                    elif entry["sha"] not in repo.blobs:
+                        return self._send(422, {"message": f"Invalid tree entry: {entry['path']}"})
+                    else:
+                        entries[entry["path"]] = entry["sha"]
+                self._send(201, {"sha": repo._put_tree(entries)})
+            elif rest == "/git/commits":
+                if body["tree"] not in repo.trees or any(p not in repo.commits for p in body["parents"]):
+                    return self._send(422, {"message": "Invalid tree or parent"})
+                self._send(201, {"sha": repo._put_commit(body["message"], body["tree"], body["parents"])})
+            elif rest == "/git/refs":
+                branch = body["ref"][len("refs/heads/"):]
+                if branch in repo.refs:
+                    return self._send(422, {"message": "Reference already exists"})
+                repo.refs[branch] = body["sha"]
+                self._send(201, {"ref": body["ref"], "object": {"sha": body["sha"], "type": "commit"}})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+    def do_PATCH(self):
+        repo, rest, _ = self._route()
+        if repo is None:
+            return
+        body = self._json()
+        if not rest.startswith("/git/refs/heads/"):
+            return self._send(404, {"message": "Not Found"})
+        branch = rest[len("/git/refs/heads/"):]
+        with repo.lock:
+            if branch not in repo.refs:
+                return self._send(422, {"message": "Reference does not exist"})
+            if repo.interfere > 0:
+                repo.interfere -= 1
+                repo.commit_files(branch, {"OTHER.md": f"other writer {time.time()}\n".encode("utf-8")}, "Other writer")
+            if not body.get("force") and not repo._descends(body["sha"], repo.refs[branch]):
+                return self._send(422, {"message": "Update is not a fast forward"})
+            repo.refs[branch] = body["sha"]
+            self._send(200, {"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"], "type": "commit"}})
+
+    def do_PUT(self):
+        repo, rest, _ = self._route()
+        if repo is None:
+            return
+        body = self._json()
+        if not rest.startswith("/contents/"):
+            return self._send(404, {"message": "Not Found"})
+        path = rest[len("/contents/"):]
+        with repo.lock:
+            branch = body.get("branch", repo.default_branch)
+            if branch not in repo.refs and not (repo.empty and branch == repo.default_branch):
+                return self._send(404, {"message": f"Branch {branch} not found"})
+            tree = repo.trees[repo.commits[repo.refs[branch]]["tree"]] if branch in repo.refs else {}
+            if path in tree and body.get("sha") != tree[path]:
+                return self._send(409, {"message": f"{path} does not match {body.get('sha')}"})
+            sha = repo.commit_files(branch, {path: base64.b64decode(body["content"])}, body["message"])
+            self._send(200 if path in tree else 201, {"commit": {"sha": sha}, "content": {"path": path}})
+
+
+def serve(port=0, latency=0.0):
+    """백그라운드 스레드로 서버 시작 → (server, base_url). server.repos / server.stats로 상태 확인"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.repos = {}
+    server.stats = Stats()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 0) / 1000
+    server, base_url = serve(port, latency)
+    print(f"✅ GitHub API 대역 서버: {base_url} (GITHUB_API_URL로 지정)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
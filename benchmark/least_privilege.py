@@ -0,0 +1,252 @@
+# 9/10단계 최소 권한 조회 규모 측정: 합성 CloudTrail 로그(benchmark/cloudtrail_corpus.py) 양을 늘려가며
+#   athena  : 9단계 build_query SQL을 원본 gzip JSON에 실행 (partition projection처럼 리전/날짜 경로만 읽음)
+#   scan    : cloudtrail_scan.scan 직접 조회 (스레드 풀 + 전달 시각으로 객체 건너뛰기)
+#   compact : cloudtrail_compaction.unload_sql로 만든 Parquet에 cloudtrail_compaction.query SQL 실행
+#             (변환 비용은 compact-build로 따로 표시, 9compact_cloudtrail_logs가 미리 해두는 작업)
+# 각 경로는 새 프로세스에서 실행해서 시간 / 읽은 바이트 / 최대 메모리(RSS 증가분, duckdb 네이티브 메모리 포함)를 측정하고
+# 결과 API 집합을 생성기의 정답과 비교, 10단계처럼 IAM 정책까지 만듦
+# Athena 대신 내장 엔진 duckdb 사용 (없으면 SQL 경로 생략), 9단계 모듈을 불러오므로 boto3 필요
+#
+# 사용법: python benchmark/least_privilege.py [하루 이벤트 수,...] [S3 요청 지연 ms]
+#   예: python benchmark/least_privilege.py 20000,80000,320000 20
+import glob
+import importlib
+import importlib.util
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import cloudtrail_compaction
+import cloudtrail_scan
+import iam_action_catalog
+
+# 9단계 모듈은 import 시 boto3 클라이언트를 만들기만 함 (요청 없음)
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+try:
+    handler = importlib.import_module("9run_athena_query_from_cloudtrail")
+except ImportError:
+    handler = None
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+def _load(name, file_name):
+    # benchmark 모듈 중 lambda 모듈과 이름이 겹치는 것은 경로로 불러옴
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(__file__), file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+corpus_module = _load("cloudtrail_corpus", "cloudtrail_corpus.py")
+LocalS3 = _load("cloudtrail_scan_benchmark", "cloudtrail_scan.py").LocalS3
+
+# Athena 원본 테이블(9단계 TABLE_DDL)에서 쿼리가 쓰는 필드
+RECORDS_TYPE = ("STRUCT(eventTime VARCHAR, eventSource VARCHAR, eventName VARCHAR, awsRegion VARCHAR, "
+                "userIdentity STRUCT(type VARCHAR, arn VARCHAR), userAgent VARCHAR)[]")
+# 합성 로그 규모에 맞춘 행 그룹 크기 (Athena UNLOAD는 파일 크기 기준으로 나눔)
+ROW_GROUP_SIZE = 16384
+_UNLOAD = re.compile(r"UNLOAD \((.*)\)\s*TO '([^']+)'", re.S)
+
+
+def partition_files(root, corpus, region, days):
+    """partition projection처럼 (리전, 날짜) 경로의 객체만"""
+    files = []
+    for day in days:
+        files += sorted(glob.glob(os.path.join(root, corpus["bucket"], corpus["log_prefix"], region, day, "*.json.gz")))
+    return files
+
+
+def raw_view(con, files, log_bucket, region):
+    """9단계 원본 테이블과 같은 이름/열의 뷰 (주어진 객체만 읽음)"""
+    file_list = ", ".join(f"'{f}'" for f in files)
+    con.execute(f"""
+    CREATE OR REPLACE VIEW {handler.ATHENA_TABLE} AS
+    SELECT
+      '{log_bucket}' AS log_bucket,
+      '{region}' AS region,
+      regexp_extract(filename, '(\\d{{4}}/\\d{{2}}/\\d{{2}})/[^/]*$', 1) AS day,
+      r.eventTime AS eventtime,
+      r.eventSource AS eventsource,
+      r.eventName AS eventname,
+      r.awsRegion AS awsregion,
+      struct_pack(type := r.userIdentity.type, arn := r.userIdentity.arn) AS useridentity,
+      r.userAgent AS useragent
+    FROM (
+      SELECT unnest(Records) AS r, filename
+      FROM read_json([{file_list}], columns = {{'Records': '{RECORDS_TYPE}'}}, format = 'auto', filename = true)
+    )
+    """)
+
+
+def compact_target(root, location):
+    """UNLOAD 대상 s3:// 경로 → 로컬 Parquet 파일"""
+    path = os.path.join(root, "s3", location[len("s3://"):])
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, "data.parquet")
+
+
+def compact_files(root, log_bucket, region, days):
+    files = []
+    for day in days:
+        files += sorted(glob.glob(os.path.join(
+            root, "s3", cloudtrail_compaction.COMPACT_BUCKET, cloudtrail_compaction.data_prefix(log_bucket, region, day), "*.parquet"
+        )))
+    return files
+
+
+def compact_view(con, files, log_bucket, region):
+    file_list = ", ".join(f"'{f}'" for f in files)
+    con.execute(f"""
+    CREATE OR REPLACE VIEW {cloudtrail_compaction.COMPACT_TABLE} AS
+    SELECT *, '{log_bucket}' AS log_bucket, '{region}' AS region,
+           regexp_extract(filename, '(\\d{{4}}/\\d{{2}}/\\d{{2}})/[^/]*$', 1) AS day
+    FROM read_parquet([{file_list}], filename = true)
+    """)
+
+
+def scanned_row_groups(con, files, window):
+    """eventtime min/max가 조회 범위와 겹치는 행 그룹의 압축 크기 합 (Athena의 Parquet 스캔 바이트에 해당)"""
+    start, end = (t.strftime("%Y-%m-%d %H:%M:%S") for t in window)
+    total = 0
+    for path in files:
+        groups = {}
+        for group, column, low, high, size in con.execute(
+            "SELECT row_group_id, path_in_schema, stats_min_value, stats_max_value, total_compressed_size "
+            "FROM parquet_metadata(?)", [path]
+        ).fetchall():
+            entry = groups.setdefault(group, {"bytes": 0, "range": None})
+            entry["bytes"] += size
+            if column == "eventtime":
+                entry["range"] = (low, high)
+        for entry in groups.values():
+            low, high = entry["range"] or (None, None)
+            if low is None or (low[:19] <= end and high[:19] >= start):
+                total += entry["bytes"]
+    return total
+
+
+def window_of(corpus):
+    window = handler.parse_window(corpus["build_window"])
+    return window, handler.window_days(*window)
+
+
+def run_athena(root, corpus, latency):
+    window, days = window_of(corpus)
+    con = duckdb.connect()
+    events, scanned = set(), 0
+    for region in corpus["regions"]:
+        files = partition_files(root, corpus, region, days)
+        if not files:
+            continue
+        raw_view(con, files, corpus["bucket"], region)
+        events |= set(con.execute(handler.build_query(corpus["bucket"], region, days, window)).fetchall())
+        scanned += sum(os.path.getsize(f) for f in files)
+    con.close()
+    return events, scanned
+
+
+def run_scan(root, corpus, latency):
+    window, days = window_of(corpus)
+    result = cloudtrail_scan.scan(LocalS3(root, latency), corpus["bucket"], corpus["log_prefix"], corpus["regions"],
+                                  days, corpus["account_id"], window)
+    return result["events"], result["bytes"]
+
+
+def run_compact_build(root, corpus, latency):
+    """9compact_cloudtrail_logs의 UNLOAD를 duckdb COPY로 실행 (SELECT 부분은 unload_sql 그대로)"""
+    _, days = window_of(corpus)
+    con = duckdb.connect()
+    # Athena(Trino) 함수 → duckdb
+    con.execute("CREATE MACRO from_iso8601_timestamp(s) AS strptime(s, '%Y-%m-%dT%H:%M:%SZ')")
+    written = 0
+    for region in corpus["regions"]:
+        for day in days:
+            files = partition_files(root, corpus, region, [day])
+            if not files:
+                continue
+            raw_view(con, files, corpus["bucket"], region)
+            select, location = _UNLOAD.search(
+                cloudtrail_compaction.unload_sql(handler.ATHENA_TABLE, corpus["bucket"], region, day)
+            ).groups()
+            target = compact_target(root, location)
+            con.execute(f"COPY ({select}) TO '{target}' (FORMAT PARQUET, COMPRESSION SNAPPY, ROW_GROUP_SIZE {ROW_GROUP_SIZE})")
+            written += os.path.getsize(target)
+    con.close()
+    return set(), written
+
+
+def run_compact(root, corpus, latency):
+    window, days = window_of(corpus)
+    arn_prefix = cloudtrail_scan.role_arn_prefix(corpus["account_id"])
+    con = duckdb.connect()
+    events, scanned = set(), 0
+    for region in corpus["regions"]:
+        files = compact_files(root, corpus["bucket"], region, days)
+        if not files:
+            continue
+        compact_view(con, files, corpus["bucket"], region)
+        events |= set(con.execute(cloudtrail_compaction.query(corpus["bucket"], region, days, window, arn_prefix)).fetchall())
+        scanned += scanned_row_groups(con, files, window)
+    con.close()
+    return events, scanned
+
+
+PATHS = {"athena": run_athena, "scan": run_scan, "compact-build": run_compact_build, "compact": run_compact}
+SQL_PATHS = {"athena", "compact-build", "compact"}
+
+
+def run_path(path, root, corpus, latency):
+    """새 프로세스 안에서 실행: 모듈 import 이후의 RSS 증가분을 최대 메모리로 봄"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    events, scanned = PATHS[path](root, corpus, latency)
+    # 10단계와 같은 변환 (event_source, event_name → 액션 → 정책)
+    policy = iam_action_catalog.policy(cloudtrail_scan.actions(events)) if events else None
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"seconds": seconds, "bytes": scanned, "rss_kb": max(0, peak - baseline), "events": events,
+            "statements": len(policy["Statement"]) if policy else 0}
+
+
+def main():
+    if handler is None:
+        print("⚠️ 9단계 모듈을 불러오지 못해 측정 생략 (boto3 필요)")
+        return 0
+    if duckdb is None:
+        print("⚠️ duckdb가 없어 athena / compact 경로 생략 (pip install duckdb)")
+
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "20000,80000,320000").split(",")]
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    paths = [p for p in PATHS if duckdb is not None or p not in SQL_PATHS]
+    context = multiprocessing.get_context("spawn")
+
+    print(f"{'events':>8}{'objects':>8}{'rawMB':>7}  {'path':<14}{'sec':>8}{'readMB':>8}{'rssMB':>7}{'apis':>6}  ok"
+          f"  (S3 요청 지연 {latency * 1000:.0f}ms)")
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix="least-privilege-bench-")
+        try:
+            corpus = corpus_module.generate(root, size, margin_seconds=handler.WINDOW_MARGIN_SECONDS)
+            for path in paths:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_path, path, root, corpus, latency).result()
+                ok = "-" if path == "compact-build" else ("✅" if result["events"] == corpus["expected"] else "❌")
+                print(f"{corpus['records']:8}{corpus['objects']:8}{corpus['bytes'] / 1024 / 1024:7.1f}  {path:<14}"
+                      f"{result['seconds']:8.2f}{result['bytes'] / 1024 / 1024:8.2f}{result['rss_kb'] / 1024:7.1f}"
+                      f"{len(result['events']):6}  {ok}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
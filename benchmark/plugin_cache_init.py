@@ -0,0 +1,83 @@
+# terraform init 시간 측정: plugin 캐시 없음(cold) vs 캐시 복원(warm)
+# S3 대신 로컬 디렉터리를 캐시 저장소로 사용 (PLUGIN_CACHE_URI=/로컬/경로)
+#
+# 사용법: python benchmark/plugin_cache_init.py [반복 횟수]
+# 필요: terraform CLI, 최초 1회 provider 다운로드를 위한 네트워크
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import plugin_cache
+
+SAMPLE_TF = """
+terraform {
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 6.0"
+    }
+  }
+}
+
+provider "aws" {
+  region = "ap-northeast-2"
+}
+"""
+
+
+def run_build(cache_uri, work_root):
+    """buildspec과 같은 순서(restore → init → save)로 실행하고 init 시간(초)을 반환"""
+    tf_dir = tempfile.mkdtemp(dir=work_root)
+    plugin_root = tempfile.mkdtemp(dir=work_root)
+    with open(os.path.join(tf_dir, "terraform.tf"), "w") as f:
+        f.write(SAMPLE_TF)
+    script_path = os.path.join(tf_dir, plugin_cache.SCRIPT_NAME)
+    with open(script_path, "w") as f:
+        f.write(plugin_cache.script())
+
+    env = dict(
+        os.environ,
+        PLUGIN_CACHE_URI=cache_uri,
+        PLUGIN_CACHE_ROOT=plugin_root,
+        TF_PLUGIN_CACHE_DIR=os.path.join(plugin_root, "terraform"),
+        TFLINT_PLUGIN_DIR=os.path.join(plugin_root, "tflint"),
+        TF_IN_AUTOMATION="1"
+    )
+    subprocess.run(["sh", script_path, "restore", tf_dir], env=env, check=True)
+    start = time.perf_counter()
+    subprocess.run(["terraform", "init", "-input=false", "-no-color"], cwd=tf_dir, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    subprocess.run(["sh", script_path, "save", tf_dir], env=env, check=True)
+    return elapsed
+
+
+def main():
+    if not shutil.which("terraform"):
+        print("terraform CLI가 없어 측정할 수 없습니다.")
+        return 1
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    work_root = tempfile.mkdtemp(prefix="plugin-cache-bench-")
+    try:
+        # 라운드마다 빈 캐시로 시작 → 캐시 없는 빌드 시간 / 채워진 캐시로 다음 빌드 시간
+        cold, warm = [], []
+        for _ in range(rounds):
+            cache_dir = tempfile.mkdtemp(dir=work_root)
+            cold.append(run_build(cache_dir, work_root))
+            warm.append(run_build(cache_dir, work_root))
+
+        print(f"{'':6}{'min':>8}{'avg':>8}{'max':>8}  (terraform init, 초)")
+        for name, values in [("cold", cold), ("warm", warm)]:
+            print(f"{name:6}{min(values):8.2f}{sum(values) / len(values):8.2f}{max(values):8.2f}")
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
 import boto3
 import os
 import json
-import csv
-import io
+import action_index
+import iam_action_catalog
 
 s3 = boto3.client("s3")
 sts = boto3.client("sts")
@@ -32,44 +32,49 @@ def lambda_handler(event, context):
     day = event["query_date"]["day"]
     account_id = os.environ.get("ACCOUNT_ID", sts.get_caller_identity()["Account"])
 
+    # Step Functions Athena 태스크(리전별 쿼리)가 넘긴 스캔 통계
+    for stats in event.get("athena_stats") or []:
+        print(f"📊 Athena {stats['query_execution_id']}: 스캔 {stats['data_scanned_bytes'] / 1024 / 1024:.2f} MB, "
+              f"엔진 실행 {stats['engine_execution_ms']} ms")
+
     bucket, prefix = extract_bucket_and_prefix(s3_path)
 
     search_prefix = prefix.rstrip("/") + "/query-temp/"
-    athena_files  = list_athena_results(bucket, search_prefix)
-    if not athena_files:
+
+    # 사용자/서비스별 누적 인덱스에 이번에 새로 생긴 결과 CSV만 반영
+    indexed = action_index.update(s3, user_id, service_name, bucket, search_prefix)
+    if not indexed["actions"]:
         raise Exception("Athena 결과 파일을 찾을 수 없습니다.")
+    print(f"📚 액션 인덱스: 새 결과 {indexed['new_results']}개, 추가 API {len(indexed['added'])}개, "
+          f"누적 {len(indexed['actions'])}개")
+    actions = set(indexed["actions"])
 
-    actions = set()
-    for key in athena_files:
-        content = read_csv_from_s3(bucket, key)
-        for row in content:
-            src = row.get("event_source")
-            name = row.get("event_name")
-            if src and name:
-                service = src.split(".")[0]
-                actions.add(f"{service}:{name}")
+    # 5단계가 plan.json으로 미리 만든 예측과 비교 → 예측에 없던 호출은 정책에 추가
+    policy_prefix = f"{service_name}/infra/output/policy"
+    predicted = load_json(user_id, f"{policy_prefix}/predicted_actions.json")
+    if predicted is not None:
+        comparison = iam_action_catalog.diff(predicted["actions"], actions)
+        s3.put_object(
+            Bucket=user_id,
+            Key=f"{policy_prefix}/iam_policy_diff.json",
+            Body=json.dumps({**comparison, "unknown_types": predicted["unknown_types"]}, indent=2)
+        )
+        print(f"🔍 예측 vs 관측: 일치 {comparison['matched']}개, 예측 누락 {len(comparison['missing'])}개, "
+              f"미사용 {len(comparison['unused'])}개")
+        actions |= set(predicted["actions"])
 
-    MANDATORY_ACTIONS = {"ec2:CreateTags", "cloudwatch:PutDashboard", "ec2:DescribeInstanceStatus", "secretsmanager:GetSecretValue"}
-    raw_actions = actions.copy()  # 원본 유지
-    actions.update(MANDATORY_ACTIONS)
+    policy = iam_action_catalog.policy(actions)
 
-    policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Action": sorted(list(actions)),
-                "Resource": "*"
-            }
-        ]
-    }
-
-    # policy 내용 s3에 저장
-    s3.put_object(
-        Bucket=user_id,
-        Key=f"{service_name}/infra/output/policy/iam_policy.json",
-        Body=json.dumps(policy, indent=2)
-    )
+    # 정책 내용이 바뀐 경우에만 s3에 저장 (5단계 예측 정책 / 이전 실행 결과와 같으면 생략)
+    if policy != load_json(user_id, f"{policy_prefix}/iam_policy.json"):
+        s3.put_object(
+            Bucket=user_id,
+            Key=f"{policy_prefix}/iam_policy.json",
+            Body=json.dumps(policy, indent=2)
+        )
+        print(f"✅ IAM 정책 갱신: API {len(policy['Statement'][0]['Action'])}개")
+    else:
+        print("♻️ IAM 정책 변경 없음, 저장 생략")
 
     return {
         "statusCode": 200,
@@ -100,16 +105,8 @@ def extract_bucket_and_prefix(s3_uri):
     prefix = parts[1] + "/" if len(parts) > 1 else ""
     return bucket, prefix
 
-def list_athena_results(bucket, prefix):
-    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    return [
-        obj["Key"]
-        for obj in response.get("Contents", [])
-        if obj["Key"].endswith(".csv")
-    ]
-
-def read_csv_from_s3(bucket, key):
-    obj = s3.get_object(Bucket=bucket, Key=key)
-    body = obj["Body"].read().decode("utf-8")
-    reader = csv.DictReader(io.StringIO(body))
-    return list(reader)
+def load_json(bucket, key):
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return None
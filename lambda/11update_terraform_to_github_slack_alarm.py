@@ -1,12 +1,12 @@
 import boto3
 import os
 import zipfile
-from github import Github
 from datetime import datetime
 import json
 import urllib.request
 import requests
 import shutil
+import github_publisher
 
 def lambda_handler(event, context):
     # project_id
@@ -135,43 +135,33 @@ def lambda_handler(event, context):
     print("받아온 branch:", branch)
 
     # --- GitHub 연결 및 파일 업로드 ---
+    # Git Data API로 변경된 파일만 blob 병렬 업로드 → 트리/커밋 1개 (파일마다 조회/커밋하지 않음)
     try:
-        g = Github(github_token)
-        print(github_token)
-        repo = g.get_repo(repo_path)
+        repo_path = github_publisher.repo_path(github_repo_url)
+        client = github_publisher.GitHubClient(github_token, repo_path)
         # S3에서 파일 다운로드
         s3 = boto3.client("s3")
         local_tf_path = "/tmp/main.tf"
         s3.download_file(bucket, object_key, local_tf_path)
 
         extract_dir = "/tmp/tf-files"
+        # 웜 컨테이너에 이전 실행(다른 사용자)의 파일이 남아 같이 커밋되지 않도록 비움
+        shutil.rmtree(extract_dir, ignore_errors=True)
         os.makedirs(extract_dir, exist_ok=True)
         shutil.copy(local_tf_path, os.path.join(extract_dir, "main.tf"))
 
-        # GitHub에 파일 업로드 (존재하면 update, 없으면 create)
-        for root, dirs, files in os.walk(extract_dir):
-            for file in files:
-                full_path = os.path.join(root, file)
-                with open(full_path, "r") as f:
-                    content = f.read()
-                relative_path = os.path.relpath(full_path, extract_dir).replace("\\", "/")
-                try:
-                    existing_file = repo.get_contents(relative_path, ref=branch)
-                    repo.update_file(
-                        path=relative_path,
-                        message=f"Update {relative_path} via Lambda at {datetime.utcnow().isoformat()}",
-                        content=content,
-                        sha=existing_file.sha,
-                        branch=branch
-                    )
-                except Exception:
-                    repo.create_file(
-                        path=relative_path,
-                        message=f"Create {relative_path} via Lambda at {datetime.utcnow().isoformat()}",
-                        content=content,
-                        branch=branch
-                    )
-        print("GitHub push 완료")
+        files = github_publisher.read_tree(extract_dir)
+        result = github_publisher.publish(
+            client,
+            files,
+            message=f"Update {', '.join(sorted(files))} via Lambda at {datetime.utcnow().isoformat()}",
+            branch=branch
+        )
+        if result["changed"]:
+            print(f"GitHub push 완료: {result['commit']} (변경 {len(result['changed'])}개, 시도 {result['attempts']}회)")
+        else:
+            print("변경된 파일 없음 → 커밋 생략")
+        print(f"GitHub API 요청 {result['requests']}회 (304 {result['not_modified']}회)")
     except Exception as e:
         print(f"[ERROR] GitHub 업로드 실패: {e}")
         return {
@@ -3,6 +3,9 @@ import json
 import re
 import datetime
 from botocore.config import Config
+import convergence
+import plugin_cache
+import stack_pool
 
 def lambda_handler(event, context):
     s3 = boto3.client('s3')
@@ -270,6 +273,7 @@ In every generated Terraform code, always include the following IAM roles and po
 
 8. Output Rules
 - Output one code block per file
+- Always include `output "alb_dns_name"` with the ALB DNS name in outputs.tf
 - Use `for_each` where applicable (e.g., Route53 CNAME records)
 - Avoid placeholders — use realistic values or derive them from input
 
@@ -277,6 +281,10 @@ Your goal is to produce complete, deployable Terraform code for the given infras
 
 """
 
+    # terratest 웜 풀을 쓰면 기본 네트워크를 오버라이드 변수로 받을 수 있게 규칙 추가
+    if stack_pool.POOL_ENABLED:
+        prompt += stack_pool.prompt_rules(SERVICE_NAME)
+
     # Bedrock API 요청 body
     body = {
         "anthropic_version": "bedrock-2023-05-31",
@@ -341,31 +349,50 @@ Your goal is to produce complete, deployable Terraform code for the given infras
     src_buildspec_key = "buildspec.yml"  # 원본 위치
     dst_buildspec_key = f"{parsed_bucket}/{SERVICE_NAME}/{now_str}/{src_buildspec_key}"  # .tf 파일과 같은 prefix로 저장
 
-    buildspec_content = """
+    cache_env = plugin_cache.env_variables()
+    buildspec_content = f"""
     version: 0.2
 
+    env:
+        variables:
+            PLUGIN_CACHE_URI: "{cache_env['PLUGIN_CACHE_URI']}"
+            PLUGIN_CACHE_ROOT: "{cache_env['PLUGIN_CACHE_ROOT']}"
+            TF_PLUGIN_CACHE_DIR: "{cache_env['TF_PLUGIN_CACHE_DIR']}"
+            TFLINT_PLUGIN_DIR: "{cache_env['TFLINT_PLUGIN_DIR']}"
+
     phases:
         pre_build:
             commands:
             - echo "Copying tf files from s3://$S3_BUCKET/$S3_PREFIX"
-            - aws s3 cp s3://$S3_BUCKET/$S3_PREFIX ./ --recursive --exclude "*" --include "*.tf"
+            - aws s3 cp s3://$S3_BUCKET/$S3_PREFIX ./ --recursive --exclude "*" --include "*.tf" --include "{plugin_cache.SCRIPT_NAME}"
+            - sh {plugin_cache.SCRIPT_NAME} restore .
 
         build:
             commands:
             - echo "---------- terraform init --------------" > error.log
+            - INIT_START=$(date +%s)
             - terraform init >> error.log 2>&1 || true
+            - echo "terraform_init_seconds=$(( $(date +%s) - INIT_START ))" | tee init-metrics.txt
             - echo "---------- terraform validate --------------" >> error.log
             - terraform validate >> error.log 2>&1 || true
             - echo "---------- tflint --------------" >> error.log
+            - tflint --init > /dev/null 2>&1 || true
             - tflint >> error.log 2>&1 || true
             - echo "---------- terraform plan --------------" >> error.log
             - terraform plan -out=plan.out >> error.log 2>&1 || true
+            - terraform show -json plan.out > plan.json 2>/dev/null || echo '{{}}' > plan.json
             - echo "========== error.log =========="
             - cat error.log
 
+        post_build:
+            commands:
+            - sh {plugin_cache.SCRIPT_NAME} save . || true
+
     artifacts:
         files:
             - error.log
+            - init-metrics.txt
+            - plan.json
             - "*.tf"
     """
 
@@ -379,6 +406,17 @@ Your goal is to produce complete, deployable Terraform code for the given infras
 
     print(f"✅ buildspec.yml 파일 저장 완료 → s3://{output_bucket}/{key}")
 
+    # provider/plugin 캐시 스크립트도 같은 prefix에 저장
+    s3.put_object(
+        Bucket=output_bucket,
+        Key=f"{parsed_bucket}/{SERVICE_NAME}/{now_str}/{plugin_cache.SCRIPT_NAME}",
+        Body=plugin_cache.script().encode('utf-8'),
+        ContentType='text/plain'
+    )
+
+    # 새 코드가 생성되었으므로 이전 실행의 수렴 이력 초기화
+    convergence.reset_history(s3, "terraform-artifacts-bucket-12", f"{parsed_bucket}/{SERVICE_NAME}/{now_str}")
+
     return {
         "Records": [
             {
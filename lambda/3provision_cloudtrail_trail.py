@@ -0,0 +1,18 @@
+import json
+import cloudtrail_setup
+
+# 코드 생성(3단계)과 병렬로 실행되는 CloudTrail 준비 람다
+# terratest(6단계) 시점에는 마커만 확인하면 되도록 버킷/트레일을 미리 만들어 둠
+def lambda_handler(event, context):
+    print("📥 입력 이벤트:", json.dumps(event, indent=2, ensure_ascii=False))
+
+    object_key = event['Records'][0]['s3']['object']['key']
+    USER_NAME = object_key.split('/')[0]
+
+    trail_bucket, trail_name = cloudtrail_setup.ensure_provisioned(USER_NAME)
+
+    return {
+        "user_id": USER_NAME.lower(),
+        "trail_bucket": trail_bucket,
+        "trail_name": trail_name
+    }
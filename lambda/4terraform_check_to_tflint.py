@@ -1,9 +1,13 @@
 import boto3
 import datetime
+import json
+import token_registry
+import validation_cache
 
 def lambda_handler(event, context):
     s3 = boto3.client('s3')
 
+    task_token = event["TaskToken"]
     s3_info = event['Records'][0]['s3']
     bucket = s3_info['bucket']['name']
     object_key = s3_info['object']['key']
@@ -25,6 +29,73 @@ def lambda_handler(event, context):
     CODEBUILD_PROJECT = "infra-terraform-invalidation"
     codebuild = boto3.client('codebuild')
 
+    # 빌드 완료 후 error.log를 분석할 5단계 입력 (콜백 시 그대로 전달됨)
+    output = {
+        "Records": [
+            {
+                "s3": {
+                    "bucket": { "name": f"{artifact_bucket}" },
+                    "object": { "key": f"{prefix}/{CODEBUILD_PROJECT}/error.log" }
+                }
+            },
+            {
+                "s3": {
+                    "bucket": { "name": f"{artifact_bucket}" },
+                    "object": { "key": f"{prefix}/{CODEBUILD_PROJECT}/{FILE_NAME}" }
+                }
+            }
+        ],
+        "retry_count": retry_count,
+        "project_id": event.get("project_id"),
+        "step_id": event.get("step_id"),
+        "token": event.get("token")
+    }
+
+    # 검증 결과 캐시 조회: 같은 코드 + 같은 툴체인이면 빌드 없이 이전 error.log 재사용
+    # 캐시는 최선 노력(best-effort): 키 계산 / 조회 / 복원 중 무엇이든 실패하면 기존처럼 빌드 실행
+    cache_key = None
+    cache_hit = False
+    try:
+        tf_code = s3.get_object(Bucket=bucket, Key=f"{prefix}/{FILE_NAME}")['Body'].read().decode('utf-8')
+        buildspec = s3.get_object(Bucket=bucket, Key=f"{prefix}/buildspec.yml")['Body'].read().decode('utf-8')
+        cache_key = validation_cache.cache_key(tf_code, buildspec)
+
+        if validation_cache.lookup(s3, cache_key):
+            print(f"♻️ 검증 캐시 적중 → s3://{validation_cache.CACHE_BUCKET}/{cache_key}")
+            # 빌드 아티팩트와 같은 위치에 error.log / terraform.tf를 둬서 5단계가 그대로 읽게 함
+            validation_cache.restore(s3, cache_key, artifact_bucket, f"{prefix}/{CODEBUILD_PROJECT}/error.log")
+            # IAM 정책 예측용 plan.json (이 변경 이전에 저장된 캐시 항목에는 없음)
+            try:
+                validation_cache.restore(
+                    s3, validation_cache.sibling_key(cache_key, "plan.json"),
+                    artifact_bucket, f"{prefix}/{CODEBUILD_PROJECT}/plan.json"
+                )
+            except s3.exceptions.ClientError:
+                s3.delete_object(Bucket=artifact_bucket, Key=f"{prefix}/{CODEBUILD_PROJECT}/plan.json")
+            s3.put_object(
+                Bucket=artifact_bucket,
+                Key=f"{prefix}/{CODEBUILD_PROJECT}/{FILE_NAME}",
+                Body=tf_code.encode('utf-8')
+            )
+            cache_hit = True
+    except Exception as e:
+        print(f"⚠️ 검증 캐시 사용 불가, CodeBuild로 진행: {e}")
+
+    if cache_hit:
+        output["cache_hit"] = True
+        boto3.client('stepfunctions').send_task_success(
+            taskToken=task_token,
+            output=json.dumps(output)
+        )
+        return {
+            "message": "♻️ 검증 캐시 적중, CodeBuild 생략",
+            "retry_count": retry_count
+        }
+
+    # 캐시 미스: 빌드 완료 후 5단계에서 error.log를 이 키로 저장
+    if cache_key:
+        output["validation_cache_key"] = cache_key
+
     response = codebuild.start_build(
         projectName=CODEBUILD_PROJECT,
         environmentVariablesOverride=[
@@ -42,21 +113,14 @@ def lambda_handler(event, context):
         }
     )
 
+    build_id = response["build"]["id"]
+    print(f"🚀 CodeBuild 시작됨: {build_id}")
+
+    # TaskToken 저장 → 빌드 종료 이벤트(EventBridge)에서 7단계 람다가 콜백
+    token_registry.registry().put(build_id, task_token, output)
+    print(f"✅ TaskToken 저장 완료 → {build_id}")
+
     return {
-        "Records": [
-            {
-                "s3": {
-                    "bucket": { "name": f"{artifact_bucket}" },
-                    "object": { "key": f"{prefix}/{CODEBUILD_PROJECT}/error.log" }
-                }
-            },
-            {
-                "s3": {
-                    "bucket": { "name": f"{artifact_bucket}" },
-                    "object": { "key": f"{prefix}/{CODEBUILD_PROJECT}/{FILE_NAME}" }
-                }
-            }
-        ],
+        "message": f"✅ CodeBuild 시작됨: {build_id}",
         "retry_count": retry_count
     }
-
@@ -1,6 +1,34 @@
 import boto3
 import json
+import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import convergence
+import iam_action_catalog
+import log_digest
+import validation_cache
+
+ARTIFACT_BUCKET = "terraform-artifacts-bucket-12"
+SOURCE_BUCKET = "s3-terraform-12"
+CODEBUILD_PROJECT = "infra-terraform-invalidation"
+MODEL_ID = "apac.anthropic.claude-sonnet-4-20250514-v1:0"
+
+# 추측(speculative) 수정: 1이면 기존처럼 후보 1개만 생성
+FIX_CANDIDATES = int(os.environ.get("FIX_CANDIDATES", "1"))
+FIX_PARALLEL_BUILDS = int(os.environ.get("FIX_PARALLEL_BUILDS", "2"))
+FIX_BUILD_WAIT_SECONDS = int(os.environ.get("FIX_BUILD_WAIT_SECONDS", "600"))
+FIX_BUILD_POLL_SECONDS = 10
+
+# 후보마다 temperature와 프롬프트 관점을 다르게 줌
+CANDIDATE_TEMPERATURES = [0, 0.4, 0.7, 1.0]
+CANDIDATE_FRAMINGS = [
+    "",
+    "Make the smallest possible change that resolves each error and keep every other line unchanged.",
+    "Re-check every reference and dependency in the whole code, not only the lines named in the log.",
+    "If an argument or block is not supported by AWS provider ~> 6.0, replace it with the supported equivalent."
+]
+REQUIRED_VARIABLES = ["region", "db_name", "db_username", "db_password", "domain_name"]
 
 def lambda_handler(event, context):
     s3 = boto3.client('s3')
@@ -23,11 +51,15 @@ def lambda_handler(event, context):
     error_log_key = f"{full_key}/error.log"
     retry_count = event.get("retry_count", 0)
 
+    # 수렴 이력은 실행(사용자/서비스/날짜) 단위로 아티팩트 버킷에 저장
+    history_prefix = f"{parsed_bucket}/{SERVICE_NAME}/{DATE}"
+    history = convergence.load_history(s3, ARTIFACT_BUCKET, history_prefix)
+
     try:
-        response = s3.get_object(Bucket=bucket, Key=error_log_key)
-        error_log = response['Body'].read().decode('utf-8')
+        # error.log를 스트리밍으로 한 번만 훑어 에러 여부 / 지문 / 실패 위치만 수집
+        log_scan = log_digest.scan(s3, bucket, error_log_key)
 
-        if "error" not in error_log.lower():
+        if not log_scan["has_error"]:
             print("✅ error.log에 에러 없음. 수정 없이 그대로 저장합니다.")
 
             # 원본 terraform.tf 경로 (소스)
@@ -37,25 +69,19 @@ def lambda_handler(event, context):
             response = s3.get_object(Bucket=bucket, Key=source_key)
             content = response['Body'].read()
 
-            return {
-                "Records": [
-                    {
-                        "s3": {
-                            "bucket": { "name": bucket },
-                            "object": { "key": source_key }
-                        }
-                    }
-                ],
-                "error_present": False,
-                "retry_count": retry_count
-            }
+            convergence.record_iteration(
+                history, convergence.STAGE_STATIC, convergence.code_hash(content.decode('utf-8')),
+                [], convergence.CONVERGED, "에러 없음"
+            )
+            convergence.save_history(s3, ARTIFACT_BUCKET, history_prefix, history)
 
     except s3.exceptions.NoSuchKey:
         print("❌ error.log가 존재하지 않음.")
         return {
             "error": "error.log not found",
             "error_present": True,
-            "retry_count": retry_count
+            "retry_count": retry_count,
+            "convergence_decision": convergence.UNKNOWN
         }
 
     except Exception as e:
@@ -63,11 +89,32 @@ def lambda_handler(event, context):
         return {
             "error": str(e),
             "error_present": True,
-            "retry_count": retry_count
+            "retry_count": retry_count,
+            "convergence_decision": convergence.UNKNOWN
+        }
+
+    # 부가 작업(검증 캐시 저장 / IAM 정책 예측)은 판단이 끝난 뒤에 실행, 실패해도 로그만 남김
+    cache_validation_result(s3, event, bucket, full_key, error_log_key, log_scan)
+
+    if not log_scan["has_error"]:
+        write_predicted_policy(s3, bucket, full_key, parsed_bucket, SERVICE_NAME)
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": { "name": bucket },
+                        "object": { "key": source_key }
+                    }
+                }
+            ],
+            "error_present": False,
+            "retry_count": retry_count,
+            "convergence_decision": convergence.CONVERGED
         }
 
     print("⚠️ error.log에 에러 발견. .tf 파일들 분석 시작")
     tf_contents = ""
+    tf_code = ""
 
     tf_files = s3.list_objects_v2(Bucket=bucket, Prefix=full_key)
     for obj in tf_files.get('Contents', []):
@@ -76,6 +123,34 @@ def lambda_handler(event, context):
             file_data = s3.get_object(Bucket=bucket, Key=key)
             content = file_data['Body'].read().decode('utf-8')
             tf_contents += f"# File: {key}\n{content}\n\n"
+            tf_code += content
+
+    # 수렴 판단: 같은 코드 반복 / 진동 / 에러 정체면 Bedrock 호출 없이 바로 중단
+    validated_hash = convergence.code_hash(tf_code)
+    errors = log_scan["fingerprints"]
+    decision, reason = convergence.assess(history, convergence.STAGE_STATIC, validated_hash, errors)
+    print(f"🔁 수렴 판단: {decision} ({reason})")
+
+    if decision != convergence.CONTINUE:
+        convergence.record_iteration(history, convergence.STAGE_STATIC, validated_hash, errors, decision, reason)
+        convergence.save_history(s3, ARTIFACT_BUCKET, history_prefix, history)
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": { "name": bucket },
+                        "object": { "key": f"{full_key}/terraform.tf" }
+                    }
+                }
+            ],
+            "error_present": True,
+            "retry_count": retry_count,
+            "convergence_decision": decision,
+            "convergence_reason": reason
+        }
+
+    # 프롬프트에는 로그 전체 대신 실패 구간 + 끝부분만 담은 요약을 사용
+    error_log = log_digest.digest(s3, log_scan)
 
     # Claude 프롬프트
     prompt = f"""
@@ -111,13 +186,165 @@ def lambda_handler(event, context):
         """
 
 
+    if FIX_CANDIDATES <= 1:
+        fixed_code = invoke_fix(bedrock, prompt, temperature=0)
+        fix_hash = convergence.code_hash(fixed_code)
+        if fixed_code.strip():
+            decision, reason = convergence.assess_fix(history, convergence.STAGE_STATIC, validated_hash, fix_hash)
+        else:
+            decision, reason = convergence.STALLED, f"{convergence.STAGE_STATIC}: 수정 코드가 비어 있음"
+    else:
+        # 후보 N개를 동시에 생성 → 프로세스 내 검사 → 상위 후보만 CodeBuild 병렬 검증 (먼저 통과한 후보 채택)
+        candidates = generate_candidates(bedrock, prompt, FIX_CANDIDATES)
+        survivors = screen_candidates(candidates, history, validated_hash)
+        print(f"🧪 후보 {len(candidates)}개 생성, 검사 통과 {len(survivors)}개")
+        if not survivors:
+            # 빈 코드 / 구조 이상 / 이미 실패한 코드만 남음: 검증으로 넘기지 않고 중단
+            fixed_code, fix_hash = "", None
+            decision, reason = rejection_decision(candidates)
+        else:
+            source_prefix = f"{parsed_bucket}/{SERVICE_NAME}/{DATE}"
+            winner = race_candidate_builds(s3, survivors[:FIX_PARALLEL_BUILDS], source_prefix, context)
+            if winner and winner["passed"]:
+                print(f"🏁 후보 #{winner['index']} 정적 검증 통과 → 채택")
+                promote_candidate(s3, winner, source_prefix, full_key)
+                convergence.record_iteration(
+                    history, convergence.STAGE_STATIC, validated_hash, errors, convergence.CONTINUE,
+                    f"후보 #{winner['index']} 채택", winner["hash"]
+                )
+                convergence.record_iteration(
+                    history, convergence.STAGE_STATIC, winner["hash"], [], convergence.CONVERGED, "에러 없음"
+                )
+                convergence.save_history(s3, ARTIFACT_BUCKET, history_prefix, history)
+                write_predicted_policy(s3, ARTIFACT_BUCKET, full_key, parsed_bucket, SERVICE_NAME)
+                return {
+                    "Records": [
+                        {
+                            "s3": {
+                                "bucket": { "name": bucket },
+                                "object": { "key": f"{full_key}/terraform.tf" }
+                            }
+                        }
+                    ],
+                    "error_present": False,
+                    "retry_count": retry_count + 1,
+                    "convergence_decision": convergence.CONVERGED
+                }
+            # 통과한 후보가 없으면 에러가 가장 적은 후보로 다음 반복 진행
+            best = winner or survivors[0]
+            fixed_code = best["code"]
+            fix_hash = best["hash"]
+            decision, reason = convergence.CONTINUE, f"후보 #{best['index']} (에러 {len(best.get('errors', []))}건)로 계속 수정"
+
+    # 수정 코드가 이미 실패한 코드라면 빌드를 돌리지 않고 중단
+    print(f"🔁 수정 코드 판단: {decision} ({reason})")
+    convergence.record_iteration(history, convergence.STAGE_STATIC, validated_hash, errors, decision, reason, fix_hash)
+    convergence.save_history(s3, ARTIFACT_BUCKET, history_prefix, history)
+
+    if decision != convergence.CONTINUE:
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": { "name": bucket },
+                        "object": { "key": f"{full_key}/terraform.tf" }
+                    }
+                }
+            ],
+            "error_present": True,
+            "retry_count": retry_count,
+            "convergence_decision": decision,
+            "convergence_reason": reason
+        }
+
+    # 저장 경로 및 파일명
+    output_key = f"{parsed_bucket}/{SERVICE_NAME}/{DATE}/terraform.tf"
+
+    s3.put_object(
+        Bucket=SOURCE_BUCKET,
+        Key=output_key,
+        Body=fixed_code.encode('utf-8')
+    )
+
+    return {
+        "Records": [
+            {
+                "s3": {
+                    "bucket": { "name": "s3-terraform-12" },
+                    "object": { "key": output_key }
+                }
+            }
+        ],
+        "error_present": True,
+        "retry_count": retry_count + 1,
+        "convergence_decision": decision,
+        "convergence_reason": reason
+    }
+
+
+# --- 🔧 Helper Functions ---
+def cache_validation_result(s3, event, bucket, full_key, error_log_key, log_scan):
+    """4단계에서 넘겨준 캐시 키로 검증 결과 저장 (빌드가 정상 종료된 경우만, 실패해도 진행)
+
+    명령마다 || true라 빌드는 항상 성공하므로, 일시적 / init 실패가 보이면 저장하지 않음
+    """
+    cache_key = event.get("validation_cache_key")
+    if not cache_key or event.get("build_status", "SUCCEEDED") != "SUCCEEDED":
+        return
+    try:
+        validation_cache.store_result(
+            s3, cache_key, bucket, error_log_key, log_scan["has_error"], plan_key=f"{full_key}/plan.json"
+        )
+    except Exception as e:
+        print(f"⚠️ 검증 캐시 저장 실패 (무시): {e}")
+
+
+def write_predicted_policy(s3, bucket, full_key, user_bucket, service_name):
+    """정적 검증을 통과한 plan.json으로 최소 권한 정책 생성 (실패해도 검증 결과에는 영향 없음)"""
+    try:
+        return _write_predicted_policy(s3, bucket, full_key, user_bucket, service_name)
+    except Exception as e:
+        print(f"⚠️ IAM 정책 예측 실패 (무시): {e}")
+        return None
+
+
+def _write_predicted_policy(s3, bucket, full_key, user_bucket, service_name):
+    """정적 검증을 통과한 plan.json으로 최소 권한 정책을 바로 생성 (CloudTrail 검증은 나중에 비동기로)"""
+    policy_prefix = f"{service_name}/infra/output/policy"
+    try:
+        plan = json.loads(s3.get_object(Bucket=bucket, Key=f"{full_key}/plan.json")['Body'].read())
+        prediction = iam_action_catalog.predict(plan)
+    except s3.exceptions.NoSuchKey:
+        prediction = None
+    if not prediction or not prediction["resources"]:
+        # 이전 실행의 예측이 10단계 비교에 쓰이지 않도록 삭제
+        print("⚠️ plan.json이 없거나 리소스 변경 없음, IAM 정책 예측 생략")
+        s3.delete_object(Bucket=user_bucket, Key=f"{policy_prefix}/predicted_actions.json")
+        return None
+
+    s3.put_object(
+        Bucket=user_bucket,
+        Key=f"{policy_prefix}/iam_policy.json",
+        Body=json.dumps(iam_action_catalog.policy(prediction["actions"]), indent=2)
+    )
+    # 10단계가 CloudTrail 관측 결과와 비교할 예측 원본
+    s3.put_object(
+        Bucket=user_bucket,
+        Key=f"{policy_prefix}/predicted_actions.json",
+        Body=json.dumps(prediction, indent=2)
+    )
+    print(f"🔮 IAM 정책 예측: 리소스 {prediction['resources']}개 → API {len(prediction['actions'])}개"
+          f" (카탈로그에 없는 타입: {', '.join(prediction['unknown_types']) or '없음'})")
+    return prediction
+
+
+def invoke_fix(bedrock, prompt, temperature=0):
     body = {
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": 8182,
         "top_k": 250,
         "stop_sequences": [],
-        "temperature": 0,
-        "top_p": 0,
+        "temperature": temperature,
         "messages": [
             {
                 "role": "user",
@@ -130,9 +357,11 @@ def lambda_handler(event, context):
             }
         ]
     }
+    if temperature == 0:
+        body["top_p"] = 0
 
     response = bedrock.invoke_model(
-        modelId="apac.anthropic.claude-sonnet-4-20250514-v1:0",
+        modelId=MODEL_ID,
         contentType="application/json",
         accept="application/json",
         body=json.dumps(body)
@@ -140,26 +369,146 @@ def lambda_handler(event, context):
 
     response_body = json.loads(response['body'].read())
     fixed_code = response_body["content"][0]["text"]
-    fixed_code = re.sub(r"```[a-z]*\n|\n```", "", fixed_code).strip()
+    return re.sub(r"```[a-z]*\n|\n```", "", fixed_code).strip()
 
-    # 저장 경로 및 파일명
-    output_key = f"{parsed_bucket}/{SERVICE_NAME}/{DATE}/terraform.tf"
 
-    s3.put_object(
-        Bucket="s3-terraform-12",
-        Key=output_key,
-        Body=fixed_code.encode('utf-8')
-    )
+def generate_candidates(bedrock, prompt, count):
+    def _generate(index):
+        temperature = CANDIDATE_TEMPERATURES[index % len(CANDIDATE_TEMPERATURES)]
+        framing = CANDIDATE_FRAMINGS[index % len(CANDIDATE_FRAMINGS)]
+        try:
+            code = invoke_fix(bedrock, f"{prompt}\n{framing}" if framing else prompt, temperature)
+        except Exception as e:
+            print(f"⚠️ 후보 #{index} 생성 실패: {e}")
+            code = ""
+        return {"index": index, "temperature": temperature, "code": code, "hash": convergence.code_hash(code)}
 
-    return {
-        "Records": [
-            {
-                "s3": {
-                    "bucket": { "name": "s3-terraform-12" },
-                    "object": { "key": output_key }
-                }
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(_generate, range(count)))
+
+
+def screen_candidates(candidates, history, validated_hash):
+    """빌드 없이 걸러낼 수 있는 후보를 제거하고 문제 수가 적은 순으로 정렬"""
+    survivors = []
+    seen = set()
+    for candidate in candidates:
+        code = candidate["code"]
+        if not code or candidate["hash"] in seen:
+            continue
+        seen.add(candidate["hash"])
+        if code.count("{") != code.count("}") or 'resource "' not in code:
+            print(f"❌ 후보 #{candidate['index']} 제외: HCL 구조 이상")
+            continue
+        decision, reason = convergence.assess_fix(history, convergence.STAGE_STATIC, validated_hash, candidate["hash"])
+        if decision != convergence.CONTINUE:
+            print(f"❌ 후보 #{candidate['index']} 제외: {reason}")
+            candidate["rejection"] = (decision, reason)
+            continue
+        candidate["issues"] = [v for v in REQUIRED_VARIABLES if f'variable "{v}"' not in code]
+        survivors.append(candidate)
+    return sorted(survivors, key=lambda c: (len(c["issues"]), c["index"]))
+
+
+def rejection_decision(candidates):
+    """검사를 통과한 후보가 없을 때의 수렴 판단 (이미 실패한 코드로 제외된 후보가 있으면 그 판단)"""
+    for candidate in candidates:
+        if "rejection" in candidate:
+            return candidate["rejection"]
+    return convergence.STALLED, f"{convergence.STAGE_STATIC}: 후보 {len(candidates)}개가 모두 비었거나 HCL 구조 이상"
+
+
+def race_candidate_builds(s3, candidates, source_prefix, context):
+    """후보별 정적 검증 빌드를 병렬 실행하고 먼저 통과한 후보를 반환
+
+    통과한 후보가 없으면 끝난 후보 중 에러 지문이 가장 적은 후보를 반환
+    """
+    codebuild = boto3.client('codebuild')
+    buildspec = s3.get_object(Bucket=SOURCE_BUCKET, Key=f"{source_prefix}/buildspec.yml")['Body'].read().decode('utf-8')
+    pending = {}
+    for candidate in candidates:
+        prefix = f"{source_prefix}/candidates/{candidate['index']}"
+        s3.put_object(Bucket=SOURCE_BUCKET, Key=f"{prefix}/terraform.tf", Body=candidate["code"].encode('utf-8'))
+        for file_name in ["buildspec.yml", "plugin_cache.sh"]:
+            s3.copy_object(
+                Bucket=SOURCE_BUCKET,
+                Key=f"{prefix}/{file_name}",
+                CopySource={"Bucket": SOURCE_BUCKET, "Key": f"{source_prefix}/{file_name}"}
+            )
+        response = codebuild.start_build(
+            projectName=CODEBUILD_PROJECT,
+            environmentVariablesOverride=[
+                {'name': 'S3_BUCKET', 'value': SOURCE_BUCKET, 'type': 'PLAINTEXT'},
+                {'name': 'S3_PREFIX', 'value': prefix, 'type': 'PLAINTEXT'}
+            ],
+            sourceTypeOverride='S3',
+            sourceLocationOverride=f'{SOURCE_BUCKET}/{prefix}/',
+            artifactsOverride={
+                "type": "S3",
+                "location": ARTIFACT_BUCKET,
+                "path": prefix,
+                "packaging": "NONE",
+                "name": ""
             }
-        ],
-        "error_present": True,
-        "retry_count": retry_count + 1
-    }
+        )
+        candidate["prefix"] = prefix
+        pending[response["build"]["id"]] = candidate
+        print(f"🚀 후보 #{candidate['index']} 빌드 시작: {response['build']['id']}")
+
+    deadline = time.time() + FIX_BUILD_WAIT_SECONDS
+    if context is not None:
+        deadline = min(deadline, time.time() + context.get_remaining_time_in_millis() / 1000 - 60)
+
+    finished = []
+    while pending and time.time() < deadline:
+        time.sleep(FIX_BUILD_POLL_SECONDS)
+        builds = codebuild.batch_get_builds(ids=list(pending))["builds"]
+        for build in builds:
+            if build["buildStatus"] == "IN_PROGRESS":
+                continue
+            candidate = pending.pop(build["id"])
+            log_key = f"{candidate['prefix']}/{CODEBUILD_PROJECT}/error.log"
+            try:
+                log_scan = log_digest.scan(s3, ARTIFACT_BUCKET, log_key)
+            except s3.exceptions.NoSuchKey:
+                print(f"⚠️ 후보 #{candidate['index']} error.log 없음 ({build['buildStatus']})")
+                continue
+            if build["buildStatus"] == "SUCCEEDED":
+                # 떨어진 후보가 다음 반복에서 다시 검증되면 캐시로 바로 결과를 받음
+                try:
+                    validation_cache.store_result(
+                        s3, validation_cache.cache_key(candidate["code"], buildspec), ARTIFACT_BUCKET, log_key,
+                        log_scan["has_error"], plan_key=f"{candidate['prefix']}/{CODEBUILD_PROJECT}/plan.json"
+                    )
+                except Exception as e:
+                    print(f"⚠️ 후보 #{candidate['index']} 검증 캐시 저장 실패 (무시): {e}")
+            candidate["passed"] = not log_scan["has_error"]
+            candidate["errors"] = log_scan["fingerprints"]
+            finished.append(candidate)
+            if candidate["passed"]:
+                for build_id in pending:
+                    codebuild.stop_build(id=build_id)
+                return candidate
+
+    for build_id in pending:
+        codebuild.stop_build(id=build_id)
+    if not finished:
+        return None
+    return min(finished, key=lambda c: (len(c["errors"]), c["index"]))
+
+
+def promote_candidate(s3, candidate, source_prefix, full_key):
+    # 채택된 후보를 원래 경로(소스/아티팩트)로 복사해 이후 단계가 그대로 사용하게 함
+    s3.put_object(Bucket=SOURCE_BUCKET, Key=f"{source_prefix}/terraform.tf", Body=candidate["code"].encode('utf-8'))
+    for file_name in ["error.log", "terraform.tf", "plan.json"]:
+        try:
+            s3.copy_object(
+                Bucket=ARTIFACT_BUCKET,
+                Key=f"{full_key}/{file_name}",
+                CopySource={"Bucket": ARTIFACT_BUCKET, "Key": f"{candidate['prefix']}/{CODEBUILD_PROJECT}/{file_name}"}
+            )
+        except s3.exceptions.ClientError as e:
+            if file_name != "plan.json":
+                raise
+            # plan.json은 정책 예측용 부가 파일: 없으면 이전 반복의 plan.json이 쓰이지 않도록 삭제
+            print(f"⚠️ 후보 #{candidate['index']} plan.json 복사 실패 (정책 예측 생략): {e}")
+            s3.delete_object(Bucket=ARTIFACT_BUCKET, Key=f"{full_key}/plan.json")
@@ -0,0 +1,174 @@
+import boto3
+import json
+import time
+import plugin_cache
+import stack_pool
+import zip_artifact
+
+# EventBridge 스케줄(예: 5분마다)로 실행되는 terratest 웜 풀 관리 람다
+# 1) PROVISIONING 빌드가 끝난 스택 → outputs.json 읽어서 READY
+# 2) 반납된(RECLAIMING) 스택 → 테스트 리소스 destroy 빌드 시작 / 끝나면 READY (실패 시 BROKEN)
+# 3) 임대 시간이 초과된 스택 → 강제 반납
+# 4) 살아있는 스택 수가 STACK_POOL_SIZE보다 적으면 새 스택 apply 빌드 시작
+s3 = boto3.client('s3')
+codebuild = boto3.client('codebuild')
+
+CODEBUILD_PROJECT = "terraform-terratest-codebuild"
+
+PROVISION_BUILDSPEC = """
+version: 0.2
+env:
+  shell: bash
+phases:
+  pre_build:
+    commands:
+      - sh {script} restore .
+      - terraform init -input=false
+  build:
+    commands:
+      - terraform apply -auto-approve -input=false -var "stack_id=$STACK_ID"
+      - terraform output -json > outputs.json
+      - aws s3 cp outputs.json s3://$POOL_BUCKET/$OUTPUTS_KEY
+  post_build:
+    commands:
+      - sh {script} save . || true
+"""
+
+# 풀 스택(VPC 등)은 그대로 두고, 임대 중 배포한 테스트 리소스 state만 destroy
+RECLAIM_BUILDSPEC = """
+version: 0.2
+env:
+  shell: bash
+phases:
+  pre_build:
+    commands:
+      - sh {script} restore . || true
+      - terraform init -input=false
+  build:
+    commands:
+      - terraform destroy -auto-approve -input=false
+"""
+
+
+def _env(values):
+    return [{"name": k, "value": v, "type": "PLAINTEXT"} for k, v in values.items()]
+
+
+def start_provision(record):
+    stack_id = record["stack_id"]
+    bundle_key = f"{stack_pool.POOL_PREFIX}/stacks/{stack_id}/base.zip"
+    backend = f"""
+terraform {{
+  backend "s3" {{
+    bucket         = "{stack_pool.POOL_BUCKET}"
+    key            = "{stack_pool.state_key(stack_id)}.base"
+    dynamodb_table = "terraform-lock-table"
+    region         = "ap-northeast-2"
+  }}
+}}
+"""
+    zip_artifact.upload_zip(s3, stack_pool.POOL_BUCKET, bundle_key, [
+        ("base.tf", stack_pool.BASE_STACK_TF.strip().encode("utf-8")),
+        ("backend.tf", backend.strip().encode("utf-8")),
+        (plugin_cache.SCRIPT_NAME, plugin_cache.script().encode("utf-8"))
+    ])
+    response = codebuild.start_build(
+        projectName=CODEBUILD_PROJECT,
+        sourceTypeOverride='S3',
+        sourceLocationOverride=f'{stack_pool.POOL_BUCKET}/{bundle_key}',
+        buildspecOverride=PROVISION_BUILDSPEC.format(script=plugin_cache.SCRIPT_NAME),
+        environmentVariablesOverride=_env({
+            "STACK_ID": stack_id,
+            "POOL_BUCKET": stack_pool.POOL_BUCKET,
+            "OUTPUTS_KEY": f"{stack_pool.POOL_PREFIX}/stacks/{stack_id}/outputs.json",
+            **plugin_cache.env_variables()
+        })
+    )
+    return response["build"]["id"]
+
+
+def start_reclaim(record):
+    stack_id = record["stack_id"]
+    response = codebuild.start_build(
+        projectName=CODEBUILD_PROJECT,
+        sourceTypeOverride='S3',
+        sourceLocationOverride=f'{stack_pool.POOL_BUCKET}/{stack_pool.lease_bundle_key(stack_id)}',
+        buildspecOverride=RECLAIM_BUILDSPEC.format(script=plugin_cache.SCRIPT_NAME),
+        environmentVariablesOverride=_env(plugin_cache.env_variables())
+    )
+    return response["build"]["id"]
+
+
+def build_statuses(build_ids):
+    if not build_ids:
+        return {}
+    builds = codebuild.batch_get_builds(ids=build_ids)["builds"]
+    return {b["id"]: b for b in builds}
+
+
+def lambda_handler(event, context):
+    now = time.time()
+    stacks = stack_pool.list_stacks(s3)
+    builds = build_statuses([r["build_id"] for r, _ in stacks if r.get("build_id")])
+
+    for record, etag in stacks:
+        stack_id, status = record["stack_id"], record["status"]
+        build = builds.get(record.get("build_id"))
+        build_status = build["buildStatus"] if build else None
+
+        if status == stack_pool.PROVISIONING and build_status and build_status != "IN_PROGRESS":
+            seconds = now - record["created_at"]
+            if build_status == "SUCCEEDED":
+                outputs = json.loads(s3.get_object(
+                    Bucket=stack_pool.POOL_BUCKET, Key=f"{stack_pool.POOL_PREFIX}/stacks/{stack_id}/outputs.json"
+                )["Body"].read())
+                outputs = {name: value["value"] for name, value in outputs.items()}
+                stack_pool.transition(s3, record, etag, stack_pool.READY, event="provision", seconds=seconds, outputs=outputs)
+                print(f"✅ 풀 스택 준비 완료: {stack_id} ({seconds:.0f}s)")
+            else:
+                stack_pool.transition(s3, record, etag, stack_pool.BROKEN, event="provision_failed", seconds=seconds)
+                print(f"❌ 풀 스택 생성 실패: {stack_id} ({build_status})")
+
+        elif status == stack_pool.LEASED and now - record.get("leased_at", now) > stack_pool.LEASE_TIMEOUT_SECONDS:
+            stack_pool.release(s3, stack_id, reason="lease_timeout")
+
+        elif status == stack_pool.RECLAIMING and not record.get("build_id"):
+            # 한 스택의 회수 시작 실패로 나머지 스택 관리가 멈추지 않도록 (다음 실행에서 다시 시도)
+            try:
+                build_id = start_reclaim(record)
+            except Exception as e:
+                print(f"⚠️ 풀 스택 회수 시작 실패: {stack_id} ({e})")
+                continue
+            stack_pool.transition(s3, record, etag, stack_pool.RECLAIMING, build_id=build_id)
+            print(f"🧹 풀 스택 회수 시작: {stack_id} → {build_id}")
+
+        elif status == stack_pool.RECLAIMING and build_status and build_status != "IN_PROGRESS":
+            seconds = now - record.get("reclaim_started_at", now)
+            if build_status == "SUCCEEDED":
+                stack_pool.transition(s3, record, etag, stack_pool.READY, event="reclaim", seconds=seconds, build_id=None, lessee=None)
+                print(f"♻️ 풀 스택 회수 완료: {stack_id} ({seconds:.0f}s)")
+            else:
+                stack_pool.transition(s3, record, etag, stack_pool.BROKEN, event="reclaim_failed", seconds=seconds)
+                print(f"❌ 풀 스택 회수 실패: {stack_id} ({build_status})")
+
+    # 부족한 만큼 새 스택 생성 (BROKEN은 수동 정리 대상이라 개수에서 제외)
+    alive = [r for r, _ in stack_pool.list_stacks(s3) if r["status"] != stack_pool.BROKEN]
+    for _ in range(max(0, stack_pool.POOL_SIZE - len(alive))):
+        record, etag = stack_pool.new_stack(s3)
+        try:
+            build_id = start_provision(record)
+        except Exception:
+            stack_pool.transition(s3, record, etag, stack_pool.BROKEN, event="provision_failed")
+            raise
+        stack_pool.transition(s3, record, etag, stack_pool.PROVISIONING, build_id=build_id)
+        print(f"🆕 풀 스택 생성 시작: {record['stack_id']} → {build_id}")
+
+    summary = stack_pool.summary(stack_pool.list_stacks(s3))
+    s3.put_object(
+        Bucket=stack_pool.POOL_BUCKET,
+        Key=f"{stack_pool.POOL_PREFIX}/metrics.json",
+        Body=json.dumps(summary, indent=2).encode("utf-8"),
+        ContentType="application/json"
+    )
+    print("📊 풀 상태:", json.dumps(summary, ensure_ascii=False))
+    return summary
@@ -1,75 +1,231 @@
 import boto3
+import hashlib
 import os
-import zipfile
 import json
+import re
+import cloudtrail_setup
+import plugin_cache
+import preflight
+import stack_pool
+import token_registry
+import zip_artifact
 
 s3 = boto3.client('s3')
 codebuild = boto3.client('codebuild')
-cloudtrail = boto3.client('cloudtrail')
-region = os.environ.get("AWS_REGION", "ap-northeast-2")
-account_id = boto3.client("sts").get_caller_identity()["Account"]
+stepfunctions = boto3.client('stepfunctions')
 
-# ✅ 버킷 없으면 자동 생성 + 정책 부착
-def create_bucket_if_not_exists(bucket_name: str, region: str, account_id: str):
-    try:
-        s3.head_bucket(Bucket=bucket_name)
-        print(f"✅ S3 버킷 이미 존재함: {bucket_name}")
-        return
-    except s3.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] != "404":
-            raise
-        print(f"🆕 S3 버킷 생성 중: {bucket_name}")
-        s3.create_bucket(
-            Bucket=bucket_name,
-            CreateBucketConfiguration={"LocationConstraint": region}
-        )
+# 사전 점검(한도 / 이름 충돌) 사용 여부
+PREFLIGHT_ENABLED = os.environ.get("PREFLIGHT_ENABLED", "true").lower() == "true"
 
-    # CloudTrail 로그 저장용 버킷 정책 설정
-    policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Sid": "AWSCloudTrailAclCheck",
-                "Effect": "Allow",
-                "Principal": {"Service": "cloudtrail.amazonaws.com"},
-                "Action": "s3:GetBucketAcl",
-                "Resource": f"arn:aws:s3:::{bucket_name}"
-            },
-            {
-                "Sid": "AWSCloudTrailWrite",
-                "Effect": "Allow",
-                "Principal": {"Service": "cloudtrail.amazonaws.com"},
-                "Action": "s3:PutObject",
-                "Resource": f"arn:aws:s3:::{bucket_name}/AWSLogs/{account_id}/*",
-                "Condition": {
-                    "StringEquals": {
-                        "s3:x-amz-acl": "bucket-owner-full-control"
-                    }
-                }
-            }
-        ]
+# 빌드 중 실행 로그를 S3 청크로 올리는 주기 (초)
+LIVE_LOG_INTERVAL = int(os.environ.get("LIVE_LOG_INTERVAL", "30"))
+
+# 엔드포인트 헬스 체크: 엔드포인트별 최대 대기 시간 / 실패 시 테스트 실패 처리 여부
+PROBE_TIMEOUT_SECONDS = int(os.environ.get("PROBE_TIMEOUT_SECONDS", "600"))
+PROBE_FAIL_ON_UNHEALTHY = os.environ.get("PROBE_FAIL_ON_UNHEALTHY", "false").lower() == "true"
+
+# 미리 컴파일한 terratest 바이너리 저장 위치 (템플릿 해시 / go.sum 해시 기준)
+TERRATEST_BIN_URI = os.environ.get("TERRATEST_BIN_URI", "s3://terraform-artifacts-bucket-12/terratest-bin")
+TERRATEST_VERSION = os.environ.get("TERRATEST_VERSION", "v0.46.16")
+
+GO_TEST_TEMPLATE = """
+package test
+
+import (
+  "crypto/tls"                              // SNI(ServerName) 지정용
+  "encoding/json"                           // probe_targets.json / 결과 리포트
+  "io"                                      // 응답 본문 버리기
+  "net/http"                                // HTTP 요청용 표준 패키지
+  "os"                                      // 파일 읽기/쓰기
+  "strings"
+  "sync"                                    // 엔드포인트 동시 점검
+  "testing"                                 // Go의 테스트 프레임워크 패키지
+  "time"                                    // 백오프 / 소요 시간
+
+  "github.com/gruntwork-io/terratest/modules/terraform"  // Terratest Terraform 모듈
+)
+
+// 람다가 terraform.tf(route53 레코드 / target group health_check 경로)에서 만들어 주는 점검 대상
+type probeConfig struct {
+  Hosts           []string `json:"hosts"`
+  Paths           []string `json:"paths"`
+  TimeoutSeconds  int      `json:"timeout_seconds"`
+  InitialBackoff  float64  `json:"initial_backoff_seconds"`
+  MaxBackoff      float64  `json:"max_backoff_seconds"`
+  FailOnUnhealthy bool     `json:"fail_on_unhealthy"`
+}
+
+type probeResult struct {
+  Host                 string  `json:"host"`
+  Path                 string  `json:"path"`
+  Healthy              bool    `json:"healthy"`
+  Attempts             int     `json:"attempts"`
+  Status               int     `json:"status"`
+  TimeToHealthySeconds float64 `json:"time_to_healthy_seconds"`
+  LastError            string  `json:"last_error,omitempty"`
+}
+
+// terraform output에서 ALB DNS 이름 찾기 (alb_dns_name 우선, 없으면 *.elb.amazonaws.com 값)
+func albDNSName(t *testing.T, options *terraform.Options) string {
+  outputs := terraform.OutputAll(t, options)
+  if value, ok := outputs["alb_dns_name"].(string); ok && value != "" {
+    return value
+  }
+  for _, value := range outputs {
+    if s, ok := value.(string); ok && strings.HasSuffix(s, ".elb.amazonaws.com") {
+      return s
     }
+  }
+  return ""
+}
 
-    s3.put_bucket_policy(
-        Bucket=bucket_name,
-        Policy=json.dumps(policy)
-    )
-    print(f"✅ S3 버킷 정책 설정 완료: {bucket_name}")
+// Route 53 전파를 기다리지 않고 ALB로 직접 요청 (Host 헤더 + SNI는 서비스 도메인), 지수 백오프로 재시도
+func probe(alb string, host string, path string, cfg probeConfig) probeResult {
+  client := &http.Client{
+    Timeout:   10 * time.Second,
+    Transport: &http.Transport{TLSClientConfig: &tls.Config{ServerName: host}},
+    CheckRedirect: func(req *http.Request, via []*http.Request) error {
+      return http.ErrUseLastResponse
+    },
+  }
+  result := probeResult{Host: host, Path: path}
+  start := time.Now()
+  deadline := start.Add(time.Duration(cfg.TimeoutSeconds) * time.Second)
+  backoff := time.Duration(cfg.InitialBackoff * float64(time.Second))
+  maxBackoff := time.Duration(cfg.MaxBackoff * float64(time.Second))
+
+  for {
+    result.Attempts++
+    req, _ := http.NewRequest("GET", "https://"+alb+path, nil)
+    req.Host = host
+    resp, err := client.Do(req)
+    if err == nil {
+      io.Copy(io.Discard, resp.Body)
+      resp.Body.Close()
+      result.Status = resp.StatusCode
+      // 응답 코드가 2xx 또는 3xx면(성공 또는 리다이렉트) 정상
+      if resp.StatusCode >= 200 && resp.StatusCode < 400 {
+        result.Healthy = true
+        result.TimeToHealthySeconds = time.Since(start).Seconds()
+        return result
+      }
+      result.LastError = resp.Status
+    } else {
+      result.LastError = err.Error()
+    }
+    if time.Now().Add(backoff).After(deadline) {
+      return result
+    }
+    time.Sleep(backoff)
+    backoff *= 2
+    if backoff > maxBackoff {
+      backoff = maxBackoff
+    }
+  }
+}
+
+func TestInfraDeployment(t *testing.T) {
+  // Terraform 실행 옵션(디렉터리 위치 등) 지정
+  options := &terraform.Options{
+    TerraformDir: "../",
+  }
+
+  // 테스트 종료 후 Terraform 리소스 자동 정리(destroy)
+  //defer terraform.Destroy(t, options)
+
+  // Terraform 코드 init + apply (인프라 배포)
+  terraform.InitAndApply(t, options)
+
+  cfg := probeConfig{TimeoutSeconds: 600, InitialBackoff: 2, MaxBackoff: 30}
+  if raw, err := os.ReadFile("probe_targets.json"); err == nil {
+    json.Unmarshal(raw, &cfg)
+  }
+
+  alb := albDNSName(t, options)
+  if alb == "" {
+    t.Logf("terraform output에서 ALB DNS 이름을 찾지 못해 헬스 체크를 생략합니다.")
+    return
+  }
+
+  // 모든 (서브도메인, 헬스 체크 경로) 조합을 동시에 점검
+  var wg sync.WaitGroup
+  var mu sync.Mutex
+  results := []probeResult{}
+  for _, host := range cfg.Hosts {
+    for _, path := range cfg.Paths {
+      wg.Add(1)
+      go func(host string, path string) {
+        defer wg.Done()
+        result := probe(alb, host, path, cfg)
+        mu.Lock()
+        results = append(results, result)
+        mu.Unlock()
+      }(host, path)
+    }
+  }
+  wg.Wait()
+
+  unhealthy := 0
+  for _, r := range results {
+    if r.Healthy {
+      t.Logf("✅ %s%s: %d, %.1fs 만에 정상 (%d회 시도)", r.Host, r.Path, r.Status, r.TimeToHealthySeconds, r.Attempts)
+    } else {
+      unhealthy++
+      t.Logf("❌ %s%s: %d회 시도 후 실패 (마지막 오류: %s)", r.Host, r.Path, r.Attempts, r.LastError)
+    }
+  }
+  if report, err := json.MarshalIndent(results, "", "  "); err == nil {
+    os.WriteFile("probe-report.json", report, 0644)
+  }
+
+  // 성공하지 못한 엔드포인트가 있는 경우
+  if unhealthy > 0 {
+    if cfg.FailOnUnhealthy {
+      t.Errorf("%d/%d 엔드포인트가 %d초 안에 정상 응답하지 않았습니다.", unhealthy, len(results), cfg.TimeoutSeconds)
+    } else {
+      t.Logf("%d/%d 엔드포인트가 %d초 안에 정상 응답하지 않았습니다.", unhealthy, len(results), cfg.TimeoutSeconds)
+    }
+  }
+}
+
+"""
 
-# ✅ CloudTrail 트레일 생성
-def create_cloudtrail_trail_if_not_exists(trail_name: str, s3_bucket_name: str):
-    try:
-        cloudtrail.get_trail(Name=trail_name)
-        print(f"🔁 CloudTrail 트레일 이미 존재함: {trail_name}")
-    except cloudtrail.exceptions.TrailNotFoundException:
-        print(f"🆕 CloudTrail 트레일 생성 중: {trail_name}")
-        cloudtrail.create_trail(
-            Name=trail_name,
-            S3BucketName=s3_bucket_name,
-            IsMultiRegionTrail=True
-        )
-        cloudtrail.start_logging(Name=trail_name)
-        print(f"✅ CloudTrail 트레일 생성 및 로깅 시작됨: {trail_name}")
+
+def probe_targets(tf_code):
+    """terraform.tf의 route53 레코드 이름 / target group health_check 경로 → 점검 대상 (probe_targets.json)"""
+    domain = re.search(r'variable\s+"domain_name"\s*\{[^}]*?default\s*=\s*"([^"]+)"', tf_code)
+    domain = domain.group(1) if domain else "bboaws.shop"
+
+    hosts = []
+    for block in re.finditer(r'resource\s+"aws_route53_record"\s+"[\w-]+"\s*\{(.*?)\n\}', tf_code, re.DOTALL):
+        name = re.search(r'^\s*name\s*=\s*"([^"]+)"', block.group(1), re.MULTILINE)
+        if not name:
+            continue
+        host = name.group(1).replace("${var.domain_name}", domain)
+        # each.key 등 정적으로 알 수 없는 이름 / ACM 검증 레코드(_xxx)는 제외
+        if "${" not in host and not host.startswith("_") and host not in hosts:
+            hosts.append(host)
+
+    paths = []
+    for block in re.finditer(r'health_check\s*\{(.*?)\}', tf_code, re.DOTALL):
+        path = re.search(r'^\s*path\s*=\s*"([^"]+)"', block.group(1), re.MULTILINE)
+        if path and path.group(1) not in paths:
+            paths.append(path.group(1))
+
+    return {
+        "hosts": hosts or [domain],
+        "paths": paths or ["/"],
+        "timeout_seconds": PROBE_TIMEOUT_SECONDS,
+        "initial_backoff_seconds": 2,
+        "max_backoff_seconds": 30,
+        "fail_on_unhealthy": PROBE_FAIL_ON_UNHEALTHY
+    }
+
+
+def template_hash():
+    # main_test.go 템플릿 + terratest 버전이 같으면 같은 바이너리를 재사용
+    content = GO_TEST_TEMPLATE.strip() + TERRATEST_VERSION
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
 
 def lambda_handler(event, context):
     print("📥 입력 이벤트:", json.dumps(event, indent=2, ensure_ascii=False))
@@ -83,198 +239,235 @@ def lambda_handler(event, context):
     parts = object_key.split("/")
     USER_NAME, SERVICE_NAME, DATE, FOLDER_NAME, *_ = parts
 
-    # ✅ 사용자 기반 CloudTrail 버킷 & 트레일 동적 생성
-    trail_bucket = f"cloudtrail-logs-{USER_NAME.lower()}"
-    trail_name = f"terraform-deploy-trail-{USER_NAME.lower()}"
-    create_bucket_if_not_exists(trail_bucket, region, account_id)
-    create_cloudtrail_trail_if_not_exists(trail_name, trail_bucket)
+    # ✅ 사용자 기반 CloudTrail 버킷 & 트레일 (코드 생성 단계에서 미리 준비됨, 여기서는 확인만)
+    trail_bucket, trail_name = cloudtrail_setup.ensure_provisioned(USER_NAME)
 
     terratest_output = "terratest-output.txt"
     CODEBUILD_PROJECT = "terraform-terratest-codebuild"
     full_prefix = f"{USER_NAME}/{SERVICE_NAME}/{DATE}"
     zip_s3_key = f"{full_prefix}/{FOLDER_NAME}/terraform.zip"
     output_txt = f"{full_prefix}/{CODEBUILD_PROJECT}/{terratest_output}"
-
-    # 임시 디렉토리 생성
-    local_base_dir = "/tmp/terraform-code"
-    os.makedirs(f"{local_base_dir}/test", exist_ok=True)
+    output_json = f"{full_prefix}/{CODEBUILD_PROJECT}/terratest-output.json"
+    live_prefix = f"{full_prefix}/{CODEBUILD_PROJECT}/live"
 
     # buildspec.yml 생성
+    cache_env = plugin_cache.env_variables()
     buildspec_content = f"""
 version: 0.2
 env:
+  shell: bash
   variables:
     S3_BUCKET: "{bucket}"
     S3_KEY: "{zip_s3_key}"
     ERROR_LOG_KEY: "{output_txt}"
+    REPORT_KEY: "{output_json}"
+    LIVE_PREFIX: "{live_prefix}"
+    PROBE_REPORT_KEY: "{full_prefix}/{CODEBUILD_PROJECT}/probe-report.json"
+    LIVE_INTERVAL: "{LIVE_LOG_INTERVAL}"
+    TERRATEST_BIN_URI: "{TERRATEST_BIN_URI}"
+    TERRATEST_VERSION: "{TERRATEST_VERSION}"
+    TEMPLATE_HASH: "{template_hash()}"
+    PLUGIN_CACHE_URI: "{cache_env['PLUGIN_CACHE_URI']}"
+    PLUGIN_CACHE_ROOT: "{cache_env['PLUGIN_CACHE_ROOT']}"
+    TF_PLUGIN_CACHE_DIR: "{cache_env['TF_PLUGIN_CACHE_DIR']}"
+    TFLINT_PLUGIN_DIR: "{cache_env['TFLINT_PLUGIN_DIR']}"
 phases:
   pre_build:
     commands:
       - echo "📦 S3에서 terraform.zip 다운로드"
       - aws s3 cp s3://$S3_BUCKET/$S3_KEY terraform.zip
       - unzip terraform.zip -d terraform-code
+      - sh {plugin_cache.SCRIPT_NAME} restore .
+      - INIT_START=$(date +%s)
+      - terraform init -input=false > init.log 2>&1 || cat init.log
+      - echo "terraform_init_seconds=$(( $(date +%s) - INIT_START ))" | tee init-metrics.txt
       - cd test
-      - go mod init terratest || true
-      - go mod tidy
+      - |
+        # 템플릿 해시 → go.sum → go.sum 해시 순으로 캐시된 테스트 바이너리 조회, 없으면 한 번만 컴파일 후 업로드
+        BIN_PREFIX="$TERRATEST_BIN_URI/$TEMPLATE_HASH"
+        if aws s3 cp --only-show-errors "$BIN_PREFIX/go.sum" go.sum 2>/dev/null \\
+          && aws s3 cp --only-show-errors "$BIN_PREFIX/$(sha256sum go.sum | cut -c1-16)/terratest.test" terratest.test 2>/dev/null; then
+          echo "♻️ 캐시된 terratest 바이너리 사용"
+        else
+          echo "🔨 terratest 바이너리 컴파일"
+          rm -f go.sum
+          go mod init terratest || true
+          go get github.com/gruntwork-io/terratest@$TERRATEST_VERSION
+          go mod tidy
+          go test -c -o terratest.test
+          GO_SUM_HASH=$(sha256sum go.sum | cut -c1-16)
+          aws s3 cp --only-show-errors terratest.test "$BIN_PREFIX/$GO_SUM_HASH/terratest.test"
+          aws s3 cp --only-show-errors go.sum "$BIN_PREFIX/go.sum"
+        fi
+        chmod +x terratest.test
   build:
     commands:
       - echo "🚀 Terratest 실행 중"
       - |
-        if ! go test -timeout 200m -v 2>&1 | tee terratest-output.txt; then
+        # 실행 로그 증가분을 주기적으로 S3 청크로 업로드 (워치독이 빌드 도중에 읽음)
+        LIVE_URI="s3://$S3_BUCKET/$LIVE_PREFIX/${{CODEBUILD_BUILD_ID##*:}}"
+        touch terratest-output.txt
+        (
+          OFFSET=0; N=0
+          while true; do
+            sleep "$LIVE_INTERVAL"
+            SIZE=$(stat -c %s terratest-output.txt)
+            if [ "$SIZE" -gt "$OFFSET" ]; then
+              tail -c +$((OFFSET + 1)) terratest-output.txt | head -c $((SIZE - OFFSET)) > live-chunk.txt
+              if aws s3 cp --only-show-errors live-chunk.txt "$LIVE_URI/chunk-$(printf %06d $N).txt"; then
+                N=$((N + 1)); OFFSET=$SIZE
+              fi
+            fi
+          done
+        ) &
+        echo $! > live-streamer.pid
+      - |
+        # test2json으로 go test -json 이벤트를 기록하고, 사람이 읽는 로그(Output 필드)는 따로 저장
+        set -o pipefail
+        if ! go tool test2json -t -p terratest ./terratest.test -test.v=test2json -test.timeout 200m 2>&1 \
+          | tee terratest-output.json \
+          | python3 -u -c 'import json,sys
+        for l in sys.stdin:
+            try: sys.stdout.write(json.loads(l).get("Output") or "")
+            except ValueError: sys.stdout.write(l)' \
+          | tee terratest-output.txt; then
           echo "❌ 테스트 실패"
           exit 1
-      - aws s3 cp test/terratest-output.txt s3://$S3_BUCKET/$ERROR_LOG_KEY
+        fi
+  post_build:
+    commands:
+      - kill $(cat $CODEBUILD_SRC_DIR/test/live-streamer.pid) 2>/dev/null || true
+      - aws s3 cp $CODEBUILD_SRC_DIR/test/terratest-output.txt s3://$S3_BUCKET/$ERROR_LOG_KEY || true
+      - aws s3 cp $CODEBUILD_SRC_DIR/test/terratest-output.json s3://$S3_BUCKET/$REPORT_KEY || true
+      - aws s3 cp $CODEBUILD_SRC_DIR/test/probe-report.json s3://$S3_BUCKET/$PROBE_REPORT_KEY || true
+      - cd $CODEBUILD_SRC_DIR && sh {plugin_cache.SCRIPT_NAME} save . || true
 artifacts:
-  files:50.75 
-    - {terratest_output}
+  files:
+    - test/{terratest_output}
+    - test/terratest-output.json
+    - test/probe-report.json
+    - init-metrics.txt
 
 """
-    with open(f"{local_base_dir}/buildspec.yml", "w") as f:
-        f.write(buildspec_content.strip())
-
-    # main_test.go 생성
-    go_content = """
-package test
-
-import (
-  "testing"                                 // Go의 테스트 프레임워크 패키지
-  "github.com/gruntwork-io/terratest/modules/terraform"  // Terratest Terraform 모듈
-  "net/http"                                // HTTP 요청용 표준 패키지
-  "io/ioutil"                               // 응답 본문 읽기용 패키지
-  "time"                                    // sleep 등 시간 관련 함수
-)
-
-func TestInfraDeployment(t *testing.T) {
-  // Terraform 실행 옵션(디렉터리 위치 등) 지정
-  options := &terraform.Options{
-    TerraformDir: "../",
-  }
-
-  // 테스트 종료 후 Terraform 리소스 자동 정리(destroy)
-  //defer terraform.Destroy(t, options)
-  
-  // Terraform 코드 init + apply (인프라 배포)
-  terraform.InitAndApply(t, options)
-
-  // 테스트할 대상 URL 지정 (직접 입력)
-  url := "https://www.bboaws.shop/login"
-
-  // HTTP 응답 및 에러, 바디 저장 변수 선언
-  var resp *http.Response
-  var err error
-  var body []byte
-
-  // 최대 시도 횟수 지정 (10번까지 재시도)
-  maxRetries := 10
-  // 성공 여부 플래그
-  success := false
-
-  // 1 ~ maxRetries까지 반복
-  for i := 1; i <= maxRetries; i++ {
-    // HTTP GET 요청 전송
-    resp, err = http.Get(url)
-    // 에러가 없고, 응답 코드가 2xx 또는 3xx면(성공 또는 리다이렉트)
-    if err == nil && resp.StatusCode >= 200 && resp.StatusCode < 400 {
-      // 응답 Body를 나중에 Close (메모리 누수 방지)
-      defer resp.Body.Close()
-      // 응답 Body 전체 읽기
-      body, _ = ioutil.ReadAll(resp.Body)
-      // 응답 코드 로그 출력
-      t.Logf("시도 %d: 응답 코드: %d", i, resp.StatusCode)
-      // 응답 본문 로그 출력
-      t.Logf("응답 본문: %s", string(body))
-      // 성공 플래그 true로
-      success = true
-      // 즉시 반복문 종료
-      break
-    }
-    // resp가 nil이 아닐 때(에러가 있더라도), Body 닫기(자원 해제)
-    if resp != nil {
-      resp.Body.Close()
-    }
-    // 실패 로그 출력(에러 및 응답 코드)
-    t.Logf("시도 %d: 실패 (err: %v, status: %v). 3초 후 재시도...", i, err, func() int {
-      if resp != nil {
-        return resp.StatusCode
-      }
-      return 0
-    }())
-    // 3초 대기 후 재시도
-    time.Sleep(3 * time.Second)
-  }
-
-  // 성공하지 못한 경우 테스트 실패 처리
-  if !success {
-    t.Logf("최대 %d번 시도했으나, %s에 성공적으로 접속하지 못했습니다.", maxRetries, url)
-  }
-}
-
-"""
-    with open(f"{local_base_dir}/test/main_test.go", "w") as f:
-        f.write(go_content.strip())
-
-    # terraform.tf 다운로드
-    s3.download_file(
-        Bucket=bucket,
-        Key=object_key,
-        Filename=f"{local_base_dir}/terraform.tf"
-    )
+    # 웜 풀 스택 임대 (생성 코드가 pool_* 오버라이드 변수를 지원할 때만)
+    lease = None
+    tf_code = s3.get_object(Bucket=bucket, Key=object_key)['Body'].read().decode('utf-8')
+    if stack_pool.POOL_ENABLED:
+        if stack_pool.supports_override(tf_code):
+            lease = stack_pool.lease(s3, lessee=full_prefix)
+        else:
+            print("🏊 생성 코드에 풀 오버라이드 변수가 없어 임대하지 않음")
+
+    # 풀 스택에 붙는 테스트는 별도 state에 기록 (회수 시 테스트 리소스만 destroy)
+    if lease:
+        backend_bucket, backend_key = stack_pool.POOL_BUCKET, stack_pool.state_key(lease["stack_id"])
+    else:
+        backend_bucket, backend_key = USER_NAME, f"{SERVICE_NAME}/infra/tfstate/terraform.tfstate"
+
+    # 사전 점검: 계정 한도 / 고정 이름 충돌이면 apply 없이 수 초 안에 실패 처리
+    # 점검 자체가 실패하면(클라이언트 생성 / state 조회 등) 임대를 붙잡은 채 중단하지 않고 점검 없이 진행
+    result = None
+    if PREFLIGHT_ENABLED:
+        try:
+            result = preflight.run(
+                tf_code,
+                preflight.aws_adapter(os.environ.get("AWS_REGION", "ap-northeast-2")),
+                state=preflight.load_state(s3, backend_bucket, backend_key),
+                # 임대한 풀 스택이 제공하는 네트워크 리소스는 새로 만들지 않음
+                skip_types=("aws_vpc", "aws_internet_gateway", "aws_eip", "aws_nat_gateway") if lease else ()
+            )
+            print(result["diagnostic"])
+        except Exception as e:
+            print(f"⚠️ 사전 점검 실행 실패, 점검 없이 진행: {e}")
+        if result and not result["ok"]:
+            if lease:
+                stack_pool.release(s3, lease["stack_id"], reason="preflight_failed")
+            stepfunctions.send_task_failure(
+                taskToken=task_token,
+                error="PreflightFailed",
+                cause=result["diagnostic"][:32000]
+            )
+            return {
+                "message": "❌ 사전 점검 실패, CodeBuild 실행 안함",
+                "preflight": result["problems"],
+                "RetryCount": retry_count
+            }
 
     terraform_backend_file = f"""
 terraform {{
   backend "s3" {{
-    bucket = "{USER_NAME}"
-    key    = "{SERVICE_NAME}/infra/tfstate/terraform.tfstate"
+    bucket = "{backend_bucket}"
+    key    = "{backend_key}"
     dynamodb_table = "terraform-lock-table"
     region = "ap-northeast-2"
   }}
 }}
 """
-    with open(f"{local_base_dir}/backend.tf", "w") as f:
-        f.write(terraform_backend_file.strip())
-
-    # terraform.zip 생성
-    zip_path = "/tmp/terraform.zip"
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(local_base_dir):
-            for file in files:
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, start=local_base_dir)
-                zipf.write(abs_path, arcname=rel_path)
-
-    print(f"✅ terraform.zip 생성 완료 → {zip_path}")
-
-    # S3 업로드
-    s3.upload_file(Filename=zip_path, Bucket=bucket, Key=zip_s3_key)
-    print(f"✅ S3 업로드 완료 → s3://{bucket}/{zip_s3_key}")
-
-    # CodeBuild 실행
-    response = codebuild.start_build(
-        projectName=CODEBUILD_PROJECT,
-        environmentVariablesOverride=[
-            {"name": "S3_BUCKET", "value": bucket, "type": "PLAINTEXT"},
-            {"name": "S3_KEY", "value": zip_s3_key, "type": "PLAINTEXT"}
-        ],
-        sourceTypeOverride='S3',
-        sourceLocationOverride=f'{bucket}/{zip_s3_key}'
-    )
+
+    entries = [
+        ("buildspec.yml", buildspec_content.strip().encode("utf-8")),
+        ("test/main_test.go", GO_TEST_TEMPLATE.strip().encode("utf-8")),
+        ("test/probe_targets.json", json.dumps(probe_targets(tf_code), indent=2).encode("utf-8")),
+        ("terraform.tf", zip_artifact.S3Source(bucket, object_key)),
+        ("backend.tf", terraform_backend_file.strip().encode("utf-8")),
+        (plugin_cache.SCRIPT_NAME, plugin_cache.script().encode("utf-8"))
+    ]
+    if lease:
+        entries.append((stack_pool.OVERRIDE_FILE, json.dumps(stack_pool.override_variables(lease), indent=2).encode("utf-8")))
+
+    try:
+        # terraform.zip 생성 + 업로드 (/tmp 사용 없이 메모리/S3 본문을 바로 스트리밍)
+        bundle = zip_artifact.upload_zip(s3, bucket, zip_s3_key, entries)
+        if bundle["uploaded"]:
+            print(f"✅ S3 업로드 완료 → s3://{bucket}/{zip_s3_key} (재사용 엔트리 {bundle['reused_entries']}개)")
+        else:
+            print(f"♻️ 번들 내용 변경 없음, 업로드 생략 → s3://{bucket}/{zip_s3_key}")
+        if lease:
+            stack_pool.attach_bundle(s3, lease, bucket, zip_s3_key)
+
+        # 이전 실행의 테스트 출력 삭제: 이번 빌드가 출력을 못 남기면 8단계가 지난 결과를 읽지 않고 실패로 처리
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": output_txt}, {"Key": output_json}], "Quiet": True})
+
+        # CodeBuild 실행
+        response = codebuild.start_build(
+            projectName=CODEBUILD_PROJECT,
+            environmentVariablesOverride=[
+                {"name": "S3_BUCKET", "value": bucket, "type": "PLAINTEXT"},
+                {"name": "S3_KEY", "value": zip_s3_key, "type": "PLAINTEXT"}
+            ],
+            sourceTypeOverride='S3',
+            sourceLocationOverride=f'{bucket}/{zip_s3_key}'
+        )
+    except Exception:
+        # 빌드를 시작하지 못하면 임대한 스택을 바로 반납
+        if lease:
+            stack_pool.release(s3, lease["stack_id"], reason="start_failed")
+        raise
 
     build_id = response["build"]["id"].split("/")[-1]
     print(f"🚀 CodeBuild 시작됨: {build_id}")
 
-    # TaskToken S3 저장
-    token_bucket = os.environ["TOKEN_S3_BUCKET"]
-    token_key = f"task-token-store/{build_id}.json"
+    # 8단계가 빌드 시작/종료 시각(CloudTrail 조회 범위)을 찾을 수 있도록 빌드 ID 기록
     s3.put_object(
-        Bucket=token_bucket,
-        Key=token_key,
-        Body=json.dumps({
-            "task_token": task_token,
-            "input": {"Records": event["Records"]}
-        })
+        Bucket=bucket,
+        Key=f"{full_prefix}/{CODEBUILD_PROJECT}/build.json",
+        Body=json.dumps({"build_id": build_id}).encode("utf-8"),
+        ContentType="application/json"
     )
 
-    print(f"✅ TaskToken 저장 완료 → s3://{token_bucket}/{token_key}")
+    # TaskToken 저장 → 빌드 종료 이벤트(EventBridge)에서 7단계 람다가 콜백
+    # 워치독이 실시간 로그 청크를 찾고 부분 로그를 저장할 위치
+    token_input = {
+        "Records": event["Records"],
+        "artifact_bucket": bucket,
+        "live_prefix": live_prefix,
+        "error_log_key": output_txt,
+        "report_key": output_json
+    }
+    if lease:
+        token_input["stack_id"] = lease["stack_id"]
+    token_registry.registry().put(build_id, task_token, token_input)
+    print(f"✅ TaskToken 저장 완료 → {build_id}")
     year, month, day = DATE[:4], DATE[4:6], DATE[6:8]
 
 
@@ -282,11 +475,12 @@ terraform {{
       "message": f"✅ CodeBuild 시작됨: terraform-terratest-codebuild:{build_id}",
       "user_id": USER_NAME.lower(),
       "log_bucket": trail_bucket,
-      "log_prefix": f"AWSLogs/{account_id}/CloudTrail",
+      "log_prefix": cloudtrail_setup.log_location(USER_NAME)[1],
       "query_date": {
           "year": year,
           "month": month,
           "day": day
       },
-      "RetryCount": retry_count
+      "RetryCount": retry_count,
+      "stack_id": lease["stack_id"] if lease else None
     }
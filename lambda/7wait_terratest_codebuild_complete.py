@@ -1,20 +1,36 @@
 import boto3    # AWS 리소스(서비스)를 제어하기 위한 AWS 공식 Python 라이브러리
 import json     # JSON 데이터 처리를 위한 파이썬 표준 라이브러리
-import os       # 환경변수 및 파일 경로 작업용 파이썬 표준 라이브러리
+import token_registry  # TaskToken 저장소 (DynamoDB / S3 / 메모리)
+import stack_pool      # terratest 웜 풀 (임대 스택 반납)
 
-# S3와 Step Functions에 접근할 수 있는 boto3 클라이언트 객체 생성
-s3 = boto3.client("s3")
+# Step Functions에 접근할 수 있는 boto3 클라이언트 객체 생성
 stepfunctions = boto3.client("stepfunctions")
 
-def lambda_handler(event, context):
-    # 함수가 호출될 때 넘어오는 이벤트 내용을 로그로 출력 (트러블슈팅에 매우 중요!)
-    print("📥 입력 이벤트:", json.dumps(event, indent=2, ensure_ascii=False))
+# 프로젝트명이 없는 이벤트(수동 콜백 등)는 기존처럼 terratest 빌드로 간주
+TERRATEST_PROJECT = "terraform-terratest-codebuild"
+# 콜백 대상이 되는 빌드 종료 상태 (IN_PROGRESS 등은 I/O 없이 바로 무시)
+TERMINAL_STATUSES = ("SUCCEEDED", "STOPPED", "FAILED", "TIMED_OUT", "FAULT")
+
+def release_stack(original_input):
+    """웜 풀 스택을 임대한 terratest 빌드면 반납 → 관리 람다가 비동기로 회수
 
+    콜백 후에 실행: 반납 실패가 콜백을 막지 않음 (반납 못 한 스택은 임대 시간 초과로 회수됨)
+    """
+    if not original_input.get("stack_id"):
+        return
+    try:
+        stack_pool.release(boto3.client("s3"), original_input["stack_id"])
+    except Exception as e:
+        print(f"⚠️ 풀 스택 반납 실패 (임대 시간 초과 시 회수): {original_input['stack_id']} ({e})")
+
+def lambda_handler(event, context):
     # EventBridge(빌드 상태 변경 알림)로부터 호출된 경우: event에 "detail" 키가 있음
     if "detail" in event:
         detail = event["detail"]
         # CodeBuild 빌드 작업의 고유 ID 추출 (앞에 prefix가 있을 수 있으므로 맨 뒤값 사용)
         build_id = detail["build-id"].split(":")[-1]
+        # 정적 검증(infra-terraform-invalidation) / 동적 검증(terraform-terratest-codebuild) 빌드 모두 처리
+        project_name = detail.get("project-name", TERRATEST_PROJECT)
         # 빌드의 상태값 추출 ("SUCCEEDED", "FAILED", "STOPPED" 등)
         build_status = detail.get("build-status")
         # CodeBuild의 빌드 로그(CloudWatch Log 링크)
@@ -22,28 +38,33 @@ def lambda_handler(event, context):
     else:
         # Step Function이 단순하게 콜백하는 경우 (디버깅 등): 별도 키로 접근
         build_id = event.get("BuildId") or event.get("build_id")
+        project_name = event.get("project_name", TERRATEST_PROJECT)
         build_status = event.get("build_status")
         logs_link = event.get("logs_url", "")
 
-    # Step Function의 TaskToken을 저장한 S3 버킷명 (환경변수로 세팅되어야 함)
-    token_store_bucket = os.environ["TOKEN_S3_BUCKET"]
-    # S3에서 TaskToken을 저장한 파일의 경로 (빌드 ID 기반)
-    token_key = f"task-token-store/terraform-terratest-codebuild:{build_id}.json"
+    # (1) 빌드가 아직 진행 중인 상태라면 토큰 조회 없이 바로 종료
+    if build_status not in TERMINAL_STATUSES:
+        print(f"⏭️ {project_name}:{build_id} 상태 {build_status}, 콜백 안함")
+        return {"message": "⏭️ 종료 상태 아님", "build_id": build_id, "build_status": build_status}
 
-    print("📌 추출된 build_id:", build_id)
-    print("📌 추출된 bucket:", token_store_bucket)
-    print("📌 조회할 S3 Key:", token_key)
+    # 함수가 호출될 때 넘어오는 이벤트 내용을 로그로 출력 (종료 이벤트만, 트러블슈팅용)
+    print("📥 입력 이벤트:", json.dumps(event, indent=2, ensure_ascii=False))
+
+    # 토큰 저장소 키는 4/6단계에서 저장한 전체 빌드 ID ("프로젝트명:uuid")
+    full_build_id = f"{project_name}:{build_id}"
+    print("📌 추출된 build_id:", full_build_id)
+
+    # (2) 토큰을 PENDING → CLAIMED로 조건부 전환 (같은 종료 이벤트가 중복 전달돼도 한 번만 콜백)
+    registry = token_registry.registry()
+    record = registry.claim(full_build_id)
+    if record is None:
+        print(f"♻️ 이미 처리됐거나 만료/미등록된 토큰: {full_build_id}")
+        return {"message": "♻️ 이미 콜백 처리됨", "build_id": build_id, "build_status": build_status}
 
-    # (1) S3에서 해당 TaskToken 파일을 다운로드하여, 파일 내용을 파싱(복원)
-    obj = s3.get_object(Bucket=token_store_bucket, Key=token_key)
-    content = json.loads(obj["Body"].read())
     # Step Function에서 사용할 TaskToken (이 값이 있어야 콜백 가능!)
-    task_token = content["task_token"]
+    task_token = record["task_token"]
     # Step Function의 원본 입력(Records, retry_count 등, 재시도 로직에 필요)
-    # Step Function의 원본 입력(Records, retry_count 등, 재시도 로직에 필요)
-    original_input = content.get("input", {})
-
-    print("📦 원본 input:", original_input)
+    original_input = record.get("input", {})
 
     # 각 항목을 개별 변수로 추출
     retry_count = original_input.get("RetryCount", 0)
@@ -52,18 +73,6 @@ def lambda_handler(event, context):
     token = original_input.get("token")
     records = original_input.get("Records")
 
-    # 확인용 로그
-    print("RetryCount:", retry_count)
-    print("project_id:", project_id)
-    print("step_id:", step_id)
-    print("token:", token)
-    print("Records:", json.dumps(records, indent=2))
-
-    # (2) 빌드가 아직 진행 중인 상태라면 아무 작업도 하지 않고 종료
-    if build_status not in ["SUCCEEDED", "STOPPED", "FAILED"]:
-        print("아직 빌드가 끝난 상태가 아님, 콜백 안함")
-        return
-
     # (3) Step Function으로 반환할 payload 구성
     output_payload = {
         "build_id": build_id,
@@ -77,24 +86,32 @@ def lambda_handler(event, context):
         "Records": records
     }
 
-
     # (4) Step Function에 콜백!
     #  - 성공/실패 구분 없이 모두 send_task_success로 보냄
     #    (분기 처리는 Step Function의 Choice 상태에서 수행)
-    if build_status == "SUCCEEDED":
-        # 빌드가 정상적으로 완료된 경우
+    try:
         stepfunctions.send_task_success(
             taskToken=task_token,
             output=json.dumps(output_payload)
         )
+    except (stepfunctions.exceptions.TaskTimedOut,
+            stepfunctions.exceptions.TaskDoesNotExist,
+            stepfunctions.exceptions.InvalidToken) as e:
+        # 이미 끝난(타임아웃/중단) 실행의 토큰: 다시 보낼 필요 없음
+        print(f"⚠️ 콜백 대상 실행이 이미 종료됨: {e}")
+        release_stack(original_input)
+        return {"message": "⚠️ 토큰 만료", "build_id": build_id, "build_status": build_status}
+    except Exception:
+        # 일시적 오류: 토큰을 되돌려서 EventBridge 재시도 때 다시 처리
+        registry.release(full_build_id)
+        raise
+
+    release_stack(original_input)
+
+    if build_status == "SUCCEEDED":
         print("✅ Step Function 성공 처리 완료")
     else:
-        # 빌드가 실패(FAILED) 또는 중단(STOPPED)된 경우
-        # 여기서도 일단 send_task_success로 보내야 Step Function에서 재시도 분기가 가능함
-        stepfunctions.send_task_success(
-            taskToken=task_token,
-            output=json.dumps(output_payload)
-        )
+        # 빌드가 실패(FAILED) 또는 중단(STOPPED)된 경우도 send_task_success로 보내야 재시도 분기가 가능함
         print("⚠️ Step Function 실패/중단 처리 완료")
 
     # 함수 결과 리턴 (로그 목적)
@@ -107,5 +124,5 @@ def lambda_handler(event, context):
         "project_id": project_id,
         "step_id": step_id,
         "token": token,
-        "Records": Records
+        "Records": records
     }
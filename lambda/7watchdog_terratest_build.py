@@ -0,0 +1,144 @@
+import boto3
+import json
+import time
+import build_watchdog
+import stack_pool
+import token_registry
+import zip_artifact
+
+# EventBridge 스케줄(1분마다)로 실행되는 terratest 빌드 워치독
+# - 콜백 대기 중인(PENDING) terratest 빌드의 실시간 로그 청크를 이어서 읽고
+# - 멈춘 빌드는 stop_build → 부분 로그를 terratest-output.txt로 저장 → 7단계 대신 바로 콜백
+#   (나중에 오는 STOPPED 이벤트는 토큰이 이미 CLAIMED라서 7단계에서 무시됨)
+# - 상태는 WATCHDOG_STOPPED: terratest 스텝 함수가 재시도 없이 끝내고 부분 로그를 8단계로 넘김
+s3 = boto3.client("s3")
+codebuild = boto3.client("codebuild")
+stepfunctions = boto3.client("stepfunctions")
+
+TERRATEST_PROJECT = "terraform-terratest-codebuild"
+# 멈춘 apply를 같은 코드로 다시 돌리지 않도록 일반 실패(FAILED)와 구분되는 상태
+WATCHDOG_STOPPED = "WATCHDOG_STOPPED"
+
+
+def chunk_prefix(live_prefix, build_id):
+    return f"{live_prefix}/{build_id.split(':')[-1]}/"
+
+
+def load_state(bucket, prefix):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=prefix + "watchdog.json")
+    except s3.exceptions.NoSuchKey:
+        return build_watchdog.new_state()
+    return json.loads(obj["Body"].read())
+
+
+def new_chunks(bucket, prefix, after):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix + "chunk-", StartAfter=after or ""):
+        for item in page.get("Contents", []):
+            yield item["Key"]
+
+
+def write_partial_log(bucket, prefix, key, problems):
+    """청크를 순서대로 이어 붙이고 워치독 에러 블록을 덧붙여 error log 위치에 저장"""
+    def _chunks():
+        for chunk_key in new_chunks(bucket, prefix, ""):
+            yield s3.get_object(Bucket=bucket, Key=chunk_key)["Body"].read()
+        yield b"\n" + build_watchdog.failure_log(problems).encode("utf-8")
+
+    writer = zip_artifact.S3MultipartWriter(s3, bucket, key)
+    try:
+        for data in _chunks():
+            writer.write(data)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def check(record, now):
+    build_id = record["build_id"]
+    original_input = record["input"]
+    bucket = original_input.get("artifact_bucket")
+    live_prefix = original_input.get("live_prefix")
+    if not bucket or not live_prefix:
+        return None
+    prefix = chunk_prefix(live_prefix, build_id)
+
+    state = load_state(bucket, prefix)
+    for key in new_chunks(bucket, prefix, state["last_chunk"]):
+        # 청크 경계에서 잘린 줄(멀티바이트 문자 포함)은 다음 청크와 이어 붙여서 처리
+        data = state.get("partial", "").encode("latin-1") + s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        cut = data.rfind(b"\n") + 1
+        state["partial"] = data[cut:].decode("latin-1")
+        build_watchdog.observe(state, data[:cut].decode("utf-8", errors="replace"), now)
+        state["last_chunk"] = key
+    if state["last_output_at"] is None:
+        # 아직 청크가 없으면(빌드 준비 중) 첫 관찰 시각부터 정지 시간을 셈
+        state["last_output_at"] = now
+    s3.put_object(Bucket=bucket, Key=prefix + "watchdog.json", Body=json.dumps(state).encode("utf-8"))
+
+    problems = build_watchdog.stuck(state, now)
+    if not problems:
+        return None
+
+    # 다른 워치독 실행 / 7단계와 경합하지 않도록 토큰을 먼저 확보
+    registry = token_registry.registry()
+    claimed = registry.claim(build_id)
+    if claimed is None:
+        return None
+
+    for problem in problems:
+        print(f"⏱️ {build_id}: {problem['message']}")
+    try:
+        codebuild.stop_build(id=build_id)
+    except codebuild.exceptions.InvalidInputException as e:
+        # 이미 끝난 빌드: 7단계 이벤트가 처리하도록 토큰을 되돌림
+        print(f"⚠️ 빌드 중지 실패 (이미 종료됨): {e}")
+        registry.release(build_id)
+        return None
+
+    # 웜 풀 스택을 임대한 빌드면 7단계 대신 여기서 반납
+    if original_input.get("stack_id"):
+        try:
+            stack_pool.release(s3, original_input["stack_id"], reason="watchdog_stop")
+        except Exception as e:
+            print(f"⚠️ 풀 스택 반납 실패 (임대 시간 초과 시 회수): {original_input['stack_id']} ({e})")
+
+    try:
+        write_partial_log(bucket, prefix, original_input["error_log_key"], problems)
+        # 이전 실행의 JSON 결과가 남아 있으면 8단계가 잘못 읽으므로 삭제 (부분 텍스트 로그 기준으로 분석)
+        s3.delete_object(Bucket=bucket, Key=original_input["report_key"])
+    except Exception:
+        # 부분 로그 저장 실패 시 STOPPED 이벤트를 받은 7단계가 콜백하도록 토큰을 되돌림
+        registry.release(build_id)
+        raise
+
+    output_payload = {
+        "build_id": build_id.split(":")[-1],
+        "build_status": WATCHDOG_STOPPED,
+        "logs_url": "",
+        **original_input,
+        "Records": original_input.get("Records"),
+        "watchdog": problems
+    }
+    try:
+        stepfunctions.send_task_success(taskToken=claimed["task_token"], output=json.dumps(output_payload))
+    except (stepfunctions.exceptions.TaskTimedOut,
+            stepfunctions.exceptions.TaskDoesNotExist,
+            stepfunctions.exceptions.InvalidToken) as e:
+        print(f"⚠️ 콜백 대상 실행이 이미 종료됨: {e}")
+    print(f"🛑 멈춘 빌드 중지 + 부분 로그 전달: {build_id}")
+    return {"build_id": build_id, "problems": problems}
+
+
+def lambda_handler(event, context):
+    now = time.time()
+    stopped = []
+    for record in token_registry.registry().list_pending():
+        if not record["build_id"].startswith(f"{TERRATEST_PROJECT}:"):
+            continue
+        result = check(record, now)
+        if result:
+            stopped.append(result)
+    return {"message": f"✅ 워치독 점검 완료 (중지 {len(stopped)}건)", "stopped": stopped}
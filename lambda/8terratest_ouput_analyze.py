@@ -2,6 +2,30 @@
 import boto3
 import json
 import os
+from datetime import datetime, timezone
+import cloudtrail_setup
+import convergence
+import log_digest
+import terratest_report
+
+# 일시적 실패(스로틀링, 최종 일관성, DNS/ACM 대기 등)는 LLM 수정 없이 같은 코드로 최대 N번까지 재배포
+TRANSIENT_RETRY_LIMIT = int(os.environ.get("TRANSIENT_RETRY_LIMIT", "2"))
+# 테스트 출력이 없을 때(pre_build 실패, 워치독 중지 등) 수렴 판단에 쓰는 에러 지문
+MISSING_OUTPUT = "terratest-output-missing"
+
+
+def build_window(s3, codebuild, bucket, key):
+    """6단계가 기록한 terratest 빌드 ID → 빌드 시작/종료 시각 (9단계 CloudTrail eventTime 범위)"""
+    try:
+        build_id = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())["build_id"]
+    except s3.exceptions.NoSuchKey:
+        return None
+    builds = codebuild.batch_get_builds(ids=[build_id])["builds"]
+    if not builds:
+        return None
+    build = builds[0]
+    end = build.get("endTime") or datetime.now(timezone.utc)
+    return {"build_id": build_id, "start": build["startTime"].isoformat(), "end": end.isoformat()}
 
 
 def lambda_handler(event, context):
@@ -21,6 +45,8 @@ def lambda_handler(event, context):
 
     parts = object_key.split("/")
     USER_NAME, SERVICE_NAME, DATE, *_ = parts
+    # 9단계 CloudTrail 조회 위치 (공유 트레일 모드면 공유 버킷 + 트레일 키 prefix)
+    log_bucket, log_prefix = cloudtrail_setup.log_location(USER_NAME, os.environ.get("ACCOUNT_ID", "798172178824"))
 
     error_count = event.get('error_count', 0)
 
@@ -32,27 +58,52 @@ def lambda_handler(event, context):
 
     tf_key = static_base_prefix + "terraform.tf"
     terratest_key = dynamic_base_prefix + "terratest-output.txt"
+    report_key = dynamic_base_prefix + "terratest-output.json"
 
     print(f"terraform 코드: {tf_key}")
     print(f"teratest 결과물: {terratest_key}")
 
-    terratest_obj = s3.get_object(Bucket=bucket, Key=terratest_key)
-    terratest_content = terratest_obj['Body'].read().decode('utf-8')
+    # terratest 로그는 매우 클 수 있으므로 스트리밍으로 훑어 에러 여부 / 지문 / 실패 위치만 수집
+    # 6단계가 빌드 전에 이전 출력을 지우므로, 없으면 이번 빌드가 테스트 출력을 남기지 못한 것 (go get / go test -c 실패 등)
+    try:
+        log_scan = log_digest.scan(s3, bucket, terratest_key, ignore=("go-multierror",))
+    except s3.exceptions.NoSuchKey:
+        print(f"⚠️ 테스트 로그 없음: {terratest_key}")
+        log_scan = None
+
+    # go test -json 이벤트로 테스트 결과 / 리소스별 실패 / 일시적 실패 여부 판단
+    try:
+        report_obj = s3.get_object(Bucket=bucket, Key=report_key)
+        report = terratest_report.parse(line for _, line in log_digest.iter_lines(report_obj["Body"]))
+    except s3.exceptions.NoSuchKey:
+        # 테스트가 끝까지 돌지 못함 (워치독 중지 포함): 코드 실패로 보고 텍스트 로그 기준으로 분석
+        print(f"⚠️ 테스트 결과(JSON) 없음: {report_key}")
+        report = None
 
     final_tf_key = f"{SERVICE_NAME}/infra/output/terraform.tf"
     tf_obj = s3.get_object(Bucket=bucket, Key=tf_key)
     tf_content = tf_obj['Body'].read().decode('utf-8')
 
-    terratest_content_lower = terratest_content.lower()
-    if "error" in terratest_content_lower:
-        error_lines = [
-            line for line in terratest_content_lower.splitlines() if "error" in line
-        ]
-        error_present = any(("go-multierror" not in line) for line in error_lines)
+    if report is not None:
+        error_present = not report["passed"]
+        failure_class = terratest_report.failure_class(report)
+        print(f"🧪 테스트 결과: {'통과' if report['passed'] else '실패'} ({failure_class})")
+        for failure in report["failures"]:
+            print(f"  - [{failure['class']}] {failure['address']}: {failure['message']}")
     else:
-        error_present = False
+        error_present = True
+        failure_class = terratest_report.CODE
+
+    # 수렴 이력 (5단계와 같은 이력 파일을 동적 단계로 이어서 기록)
+    history_prefix = f"{USER_NAME}/{SERVICE_NAME}/{DATE}"
+    history = convergence.load_history(s3, bucket, history_prefix)
+    deployed_hash = convergence.code_hash(tf_content)
 
     if not error_present:
+        convergence.record_iteration(
+            history, convergence.STAGE_DYNAMIC, deployed_hash, [], convergence.CONVERGED, "에러 없음"
+        )
+        convergence.save_history(s3, bucket, history_prefix, history)
         s3.put_object(Bucket=USER_NAME, Key=final_tf_key, Body=tf_content.encode('utf-8'))
 
         return {
@@ -67,11 +118,16 @@ def lambda_handler(event, context):
             "status": "success",
             "error_present": False,
             "error_count": error_count,
+            "convergence_decision": convergence.CONVERGED,
+            "failure_class": failure_class,
             "message": "테라폼 테스트가 성공적으로 완료되었습니다.",
             "user_id": USER_NAME,
             "service_name": SERVICE_NAME,
-            "log_bucket": f"cloudtrail-logs-{USER_NAME}",
-            "log_prefix": f"AWSLogs/{os.environ.get('ACCOUNT_ID', '798172178824')}/CloudTrail",
+            "log_bucket": log_bucket,
+            "log_prefix": log_prefix,
+            "build_window": build_window(
+                s3, boto3.client('codebuild'), bucket, dynamic_base_prefix + "build.json"
+            ),
             "query_date": {
                 "year": DATE[:4],
                 "month": DATE[4:6],
@@ -79,6 +135,82 @@ def lambda_handler(event, context):
             }
         }
 
+    # JSON 결과가 있으면 리소스 주소 기준 지문 사용 (에러 문자열이 없는 실패도 포함)
+    if report is not None and report["failures"]:
+        errors = sorted(f["fingerprint"] for f in report["failures"])
+    else:
+        errors = (log_scan["fingerprints"] if log_scan else []) or [MISSING_OUTPUT]
+
+    # 실패가 모두 일시적이면 코드는 그대로 두고 재배포만 (Bedrock 호출 / 정적 검증 생략)
+    streak = convergence.transient_streak(history, convergence.STAGE_DYNAMIC)
+    if failure_class == terratest_report.TRANSIENT and streak < TRANSIENT_RETRY_LIMIT:
+        reason = f"{convergence.STAGE_DYNAMIC}: 일시적 실패, 같은 코드로 재배포 ({streak + 1}/{TRANSIENT_RETRY_LIMIT})"
+        print(f"🔁 {reason}")
+        convergence.record_iteration(
+            history, convergence.STAGE_DYNAMIC, deployed_hash, errors, convergence.TRANSIENT, reason
+        )
+        convergence.save_history(s3, bucket, history_prefix, history)
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": bucket},
+                        "object": {"key": tf_key}
+                    }
+                }
+            ],
+            "status": "transient_retry",
+            "error_present": True,
+            "error_count": error_count,
+            "convergence_decision": convergence.TRANSIENT,
+            "convergence_reason": reason,
+            "failure_class": failure_class,
+            "failed_resources": [f["address"] for f in report["failures"] if f["address"]],
+            "message": "일시적 실패로 판단되어 같은 코드로 재배포함.",
+            "user_id": USER_NAME,
+            "service_name": SERVICE_NAME
+        }
+
+    # 같은 코드 재배포 / 진동 / 에러 정체면 Bedrock 호출 없이 바로 중단
+    decision, reason = convergence.assess(history, convergence.STAGE_DYNAMIC, deployed_hash, errors)
+    print(f"🔁 수렴 판단: {decision} ({reason})")
+
+    if decision != convergence.CONTINUE:
+        convergence.record_iteration(history, convergence.STAGE_DYNAMIC, deployed_hash, errors, decision, reason)
+        convergence.save_history(s3, bucket, history_prefix, history)
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": bucket},
+                        "object": {"key": tf_key}
+                    }
+                }
+            ],
+            "status": "not_converging",
+            "error_present": True,
+            "error_count": error_count,
+            "convergence_decision": decision,
+            "convergence_reason": reason,
+            "failure_class": failure_class,
+            "message": "수정이 수렴하지 않아 재시도를 중단함.",
+            "user_id": USER_NAME,
+            "service_name": SERVICE_NAME
+        }
+
+    # 프롬프트에는 로그 전체 대신 실패 구간 + 끝부분만 담은 요약을 사용
+    if log_scan is not None:
+        terratest_content = log_digest.digest(s3, log_scan)
+    else:
+        terratest_content = (
+            "No test output was produced: the build failed before the tests ran "
+            "(go module download or test binary compilation)."
+        )
+    if report is not None and report["failures"]:
+        terratest_content = (
+            "Failing resources:\n" + terratest_report.summary(report) + "\n\n" + terratest_content
+        )
+
     prompt = f"""
 You are a professional Terraform architect
 Below are the Terraform test results (error) and the Terraform code.
@@ -142,6 +274,37 @@ Only include code blocks for .tf files.
     for filename, code in new_tf_code:
         combined_code += f"// Filename: {filename.strip()}\n{code.strip()}\n\n"
 
+    fix_hash = convergence.code_hash(combined_code)
+    if combined_code.strip():
+        decision, reason = convergence.assess_fix(history, convergence.STAGE_DYNAMIC, deployed_hash, fix_hash)
+    else:
+        decision, reason = convergence.STALLED, f"{convergence.STAGE_DYNAMIC}: 수정 코드가 비어 있음"
+    print(f"🔁 수정 코드 판단: {decision} ({reason})")
+    convergence.record_iteration(history, convergence.STAGE_DYNAMIC, deployed_hash, errors, decision, reason, fix_hash)
+    convergence.save_history(s3, bucket, history_prefix, history)
+
+    # 빈 코드 / 이미 실패한 코드면 마지막 terraform.tf를 덮어쓰지 않고 중단
+    if decision != convergence.CONTINUE:
+        return {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": bucket},
+                        "object": {"key": tf_key}
+                    }
+                }
+            ],
+            "status": "not_converging",
+            "error_present": True,
+            "error_count": error_count,
+            "convergence_decision": decision,
+            "convergence_reason": reason,
+            "failure_class": failure_class,
+            "message": "수정 코드가 비었거나 이미 실패한 코드라 재시도를 중단함.",
+            "user_id": USER_NAME,
+            "service_name": SERVICE_NAME
+        }
+
     s3.put_object(Bucket=bucket, Key=tf_key, Body=combined_code.encode('utf-8'))
 
 #    sfn.start_execution(
@@ -170,12 +333,15 @@ Only include code blocks for .tf files.
         "status": "error_fixed",
         "error_present": True,
         "error_count": error_count + 1,
+        "convergence_decision": decision,
+        "convergence_reason": reason,
+        "failure_class": failure_class,
         "message": "에러가 감지되어 terraform.tf를 수정하여 저장함.",
         "terraform_key": tf_key,
         "user_id": USER_NAME,
         "service_name": SERVICE_NAME,
-        "log_bucket": f"cloudtrail-logs-{USER_NAME}",
-        "log_prefix": f"AWSLogs/{os.environ.get('ACCOUNT_ID', '798172178824')}/CloudTrail",
+        "log_bucket": log_bucket,
+        "log_prefix": log_prefix,
         "query_date": {
             "year": DATE[:4],
             "month": DATE[4:6],
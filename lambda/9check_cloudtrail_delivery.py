@@ -0,0 +1,33 @@
+import boto3
+import json
+from datetime import datetime, timezone
+import cloudtrail_delivery
+
+# Athena 조회 전 CloudTrail 전달 확인 (GetLeastPrivilegeThroughAthena의 첫 단계, Wait 상태와 반복)
+# - 빌드 종료 시각 이후까지 리전별 로그/다이제스트가 전달됐으면 ready
+# - 아니면 예상 전달 지연(이전 실행 측정값)에 맞춘 wait_seconds 반환
+s3 = boto3.client("s3")
+
+REGIONS = ['ap-northeast-2', 'us-east-1']
+
+
+def lambda_handler(event, context):
+    build_window = event.get("build_window")
+    previous = event.get("delivery") or {}
+    if not build_window:
+        # 빌드 시각을 모르면(이전 실행 등) 기존처럼 바로 조회
+        print("⏭️ build_window 없음 → 전달 확인 없이 조회")
+        return {"ready": True, "timed_out": False, "wait_seconds": 0, "attempts": 0}
+
+    build_end = datetime.fromisoformat(build_window["end"]).astimezone(timezone.utc)
+    result = cloudtrail_delivery.check(
+        s3, event["log_bucket"], event["log_prefix"], REGIONS, build_end, previous
+    )
+    print("📬 CloudTrail 전달 상태:", json.dumps(result, ensure_ascii=False))
+    if result["timed_out"]:
+        print(f"⚠️ {cloudtrail_delivery.MAX_WAIT_SECONDS // 60}분 안에 전달 확인 실패, 현재 로그로 조회 진행")
+    elif result["ready"]:
+        print(f"✅ 전달 확인 ({result['attempts']}회, 빌드 종료 후 {result['lag_seconds']}s)")
+    else:
+        print(f"⏳ 전달 대기 → {result['wait_seconds']}s 후 다시 확인")
+    return result
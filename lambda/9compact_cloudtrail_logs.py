@@ -0,0 +1,124 @@
+import boto3
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import cloudtrail_compaction
+import cloudtrail_setup
+
+# EventBridge 스케줄(예: 1시간마다)로 실행되는 CloudTrail Parquet 변환 람다
+# 1) 사용자별 CloudTrail 버킷(준비 마커 기준) x 리전 x 전달이 끝난 지난 날짜마다
+# 2) 상태 없음 / 실패(재시도 한도 내) → UNLOAD 쿼리 시작 후 RUNNING 기록 (완료를 기다리지 않음)
+# 3) RUNNING → 다음 실행에서 쿼리 상태 확인 후 DONE(스캔 통계 포함) / FAILED
+# 9단계는 조회 날짜가 모두 DONE인 리전만 Parquet 테이블로 조회
+s3 = boto3.client("s3")
+athena = boto3.client("athena")
+
+ATHENA_DATABASE = os.environ.get("ATHENA_DATABASE", "default")
+RAW_TABLE = os.environ.get(
+    "ATHENA_TABLE", "cloudtrail_logs_shared" if cloudtrail_setup.SHARED_TRAIL else "cloudtrail_logs_projected"
+)
+PROJECTION_START = os.environ.get("PROJECTION_START", "2025/01/01")
+REGIONS = ['ap-northeast-2', 'us-east-1']
+LOOKBACK_DAYS = int(os.environ.get("COMPACT_LOOKBACK_DAYS", "7"))
+# 자정 이후 이 시간이 지나야 전날 로그 전달이 끝난 것으로 봄
+SETTLE_HOURS = int(os.environ.get("COMPACT_SETTLE_HOURS", "2"))
+MAX_STARTS = int(os.environ.get("COMPACT_MAX_STARTS", "10"))
+MAX_ATTEMPTS = 3
+RESULT_LOCATION = f"s3://{cloudtrail_compaction.COMPACT_BUCKET}/{cloudtrail_compaction.COMPACT_PREFIX}/_athena/"
+
+
+def log_buckets():
+    """CloudTrail 준비 마커에 기록된 로그 버킷 (공유 트레일 버킷은 한 번만)"""
+    buckets = set()
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=cloudtrail_setup.PROVISION_MARKER_BUCKET,
+                                   Prefix=f"{cloudtrail_setup.PROVISION_MARKER_PREFIX}/"):
+        for item in page.get("Contents", []):
+            marker = s3.get_object(Bucket=cloudtrail_setup.PROVISION_MARKER_BUCKET, Key=item["Key"])
+            buckets.add(json.loads(marker["Body"].read())["trail_bucket"])
+    return sorted(buckets)
+
+
+def closed_days(now):
+    """전달이 끝난 최근 LOOKBACK_DAYS일 (yyyy/MM/dd, UTC)"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    first = 1 if now - today >= timedelta(hours=SETTLE_HOURS) else 2
+    return [(today - timedelta(days=i)).strftime("%Y/%m/%d") for i in range(first, first + LOOKBACK_DAYS)]
+
+
+def start_query(sql):
+    return athena.start_query_execution(
+        QueryString=sql,
+        QueryExecutionContext={"Database": ATHENA_DATABASE},
+        ResultConfiguration={"OutputLocation": RESULT_LOCATION},
+        WorkGroup="primary"
+    )["QueryExecutionId"]
+
+
+def ensure_table():
+    try:
+        athena.get_table_metadata(CatalogName="AwsDataCatalog", DatabaseName=ATHENA_DATABASE,
+                                  TableName=cloudtrail_compaction.COMPACT_TABLE)
+    except athena.exceptions.MetadataException:
+        # DDL은 짧게 끝나므로 기다리지 않음 (조회는 DONE 파티션이 생긴 뒤에야 사용)
+        start_query(cloudtrail_compaction.table_ddl(REGIONS, PROJECTION_START))
+        print(f"🆕 Parquet 테이블 생성 시작: {cloudtrail_compaction.COMPACT_TABLE}")
+
+
+def refresh(log_bucket, region, day, state):
+    """RUNNING 파티션의 쿼리 상태 반영"""
+    execution = athena.get_query_execution(QueryExecutionId=state["query_execution_id"])["QueryExecution"]
+    status = execution["Status"]["State"]
+    if status in ("QUEUED", "RUNNING"):
+        return state
+    if status == "SUCCEEDED":
+        statistics = execution.get("Statistics", {})
+        state.update(
+            status=cloudtrail_compaction.DONE,
+            data_scanned_bytes=statistics.get("DataScannedInBytes", 0),
+            engine_execution_ms=statistics.get("EngineExecutionTimeInMillis", 0)
+        )
+        print(f"✅ 변환 완료: {log_bucket} {region} {day} (원본 스캔 {state['data_scanned_bytes'] / 1024 / 1024:.2f} MB)")
+    else:
+        state.update(status=cloudtrail_compaction.FAILED, reason=execution["Status"].get("StateChangeReason", status))
+        print(f"❌ 변환 실패: {log_bucket} {region} {day} ({state['reason']})")
+    cloudtrail_compaction.save_state(s3, log_bucket, region, day, state)
+    return state
+
+
+def lambda_handler(event, context):
+    ensure_table()
+    now = datetime.now(timezone.utc)
+    counts = {"started": 0, "running": 0, "done": 0, "failed": 0}
+
+    for log_bucket in log_buckets():
+        for region in REGIONS:
+            for day in closed_days(now):
+                state = cloudtrail_compaction.load_state(s3, log_bucket, region, day)
+                if state and state["status"] == cloudtrail_compaction.RUNNING:
+                    state = refresh(log_bucket, region, day, state)
+                if state and state["status"] in (cloudtrail_compaction.DONE, cloudtrail_compaction.RUNNING):
+                    counts[state["status"].lower()] += 1
+                    continue
+                attempts = state["attempts"] if state else 0
+                if attempts >= MAX_ATTEMPTS:
+                    counts["failed"] += 1
+                    continue
+                if counts["started"] >= MAX_STARTS:
+                    continue
+
+                # 이전 실패가 남긴 파일 정리 후 UNLOAD 시작
+                cloudtrail_compaction.clear_data(s3, log_bucket, region, day)
+                query_id = start_query(cloudtrail_compaction.unload_sql(RAW_TABLE, log_bucket, region, day))
+                cloudtrail_compaction.save_state(s3, log_bucket, region, day, {
+                    "status": cloudtrail_compaction.RUNNING,
+                    "query_execution_id": query_id,
+                    "attempts": attempts + 1,
+                    "started_at": time.time()
+                })
+                counts["started"] += 1
+                print(f"🗜️ 변환 시작: {log_bucket} {region} {day} → {query_id}")
+
+    print("📊 변환 상태:", json.dumps(counts))
+    return counts
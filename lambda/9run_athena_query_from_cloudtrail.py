@@ -1,14 +1,179 @@
 #[Authority 1] CloudTrail 로그가 저장된 S3 버킷에서 Athena Query를 통해 필요한 요소들만 추출해서 다시 S3로 저장
 import boto3
+import csv
+import io
 import json
 import os
-import time
+import cloudtrail_compaction
+import cloudtrail_scan
+import cloudtrail_setup
+from datetime import datetime, timedelta, timezone
 
 ATHENA_DATABASE = os.environ.get("ATHENA_DATABASE", "default")
-ATHENA_TABLE = os.environ.get("ATHENA_TABLE", "cloudtrail_logs")
+# partition projection 테이블: 파티션 위치를 쿼리 조건으로 계산하므로 ALTER TABLE ADD PARTITION 불필요
+# 공유 트레일은 로그 prefix가 달라(storage.location.template) 별도 테이블 사용
+ATHENA_TABLE = os.environ.get(
+    "ATHENA_TABLE", "cloudtrail_logs_shared" if cloudtrail_setup.SHARED_TRAIL else "cloudtrail_logs_projected"
+)
 ACCOUNT_ID = os.environ.get("ACCOUNT_ID", "798172178824")
+REGIONS = ['ap-northeast-2', 'us-east-1']
+PROJECTION_START = os.environ.get("PROJECTION_START", "2025/01/01")
+# CloudTrail 조회 엔진: athena(Step Functions에서 리전별 쿼리) / scan(람다에서 gzip 객체 직접 읽기)
+CLOUDTRAIL_ENGINE = os.environ.get("CLOUDTRAIL_ENGINE", "athena")
+# CodeBuild 시작/종료 시각과 CloudTrail eventTime 사이의 오차 여유
+WINDOW_MARGIN_SECONDS = int(os.environ.get("WINDOW_MARGIN_SECONDS", "120"))
 
 athena = boto3.client("athena")
+s3 = boto3.client("s3")
+
+# 사용자마다 CloudTrail 버킷이 다르므로 버킷을 injected 파티션 키로 둠 (쿼리의 log_bucket = '...' 조건으로 위치 결정)
+# CloudTrailInputFormat: 파일의 Records 배열을 레코드 단위 행으로 읽음 (json_extract / UNNEST 불필요)
+TABLE_DDL = """
+CREATE EXTERNAL TABLE IF NOT EXISTS {table} (
+  eventversion STRING,
+  useridentity STRUCT<
+    type: STRING,
+    principalid: STRING,
+    arn: STRING,
+    accountid: STRING,
+    invokedby: STRING,
+    accesskeyid: STRING,
+    username: STRING>,
+  eventtime STRING,
+  eventsource STRING,
+  eventname STRING,
+  awsregion STRING,
+  sourceipaddress STRING,
+  useragent STRING,
+  errorcode STRING,
+  errormessage STRING,
+  requestid STRING,
+  eventid STRING,
+  readonly STRING,
+  eventtype STRING,
+  recipientaccountid STRING
+)
+PARTITIONED BY (log_bucket STRING, region STRING, day STRING)
+ROW FORMAT SERDE 'org.apache.hive.hcatalog.data.JsonSerDe'
+STORED AS INPUTFORMAT 'com.amazon.emr.cloudtrail.CloudTrailInputFormat'
+OUTPUTFORMAT 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat'
+LOCATION 's3://{log_bucket}/{log_prefix}/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.log_bucket.type' = 'injected',
+  'projection.region.type' = 'enum',
+  'projection.region.values' = '{regions}',
+  'projection.day.type' = 'date',
+  'projection.day.format' = 'yyyy/MM/dd',
+  'projection.day.range' = '{projection_start},NOW',
+  'projection.day.interval' = '1',
+  'projection.day.interval.unit' = 'DAYS',
+  'storage.location.template' = 's3://${{log_bucket}}/{log_prefix}/${{region}}/${{day}}'
+)
+"""
+
+# 웜 컨테이너에서는 테이블 존재 확인 생략
+_table_ready = False
+
+
+def table_ddl(log_bucket, log_prefix):
+    """테이블이 없을 때만 DDL 반환 (실행은 Step Functions의 Athena 통합 태스크가 담당)"""
+    global _table_ready
+    if _table_ready:
+        return None
+    try:
+        athena.get_table_metadata(CatalogName="AwsDataCatalog", DatabaseName=ATHENA_DATABASE, TableName=ATHENA_TABLE)
+        _table_ready = True
+        return None
+    except athena.exceptions.MetadataException:
+        print(f"🆕 partition projection 테이블 생성 필요: {ATHENA_TABLE}")
+        return TABLE_DDL.format(
+            table=ATHENA_TABLE,
+            log_bucket=log_bucket,
+            log_prefix=log_prefix,
+            regions=",".join(REGIONS),
+            projection_start=PROJECTION_START
+        )
+
+
+def parse_window(build_window):
+    """8단계가 넘긴 terratest 빌드 시작/종료 시각 → (시작, 종료) UTC datetime (여유 포함)"""
+    if not build_window:
+        return None
+    margin = timedelta(seconds=WINDOW_MARGIN_SECONDS)
+    start = datetime.fromisoformat(build_window["start"]).astimezone(timezone.utc) - margin
+    end = datetime.fromisoformat(build_window["end"]).astimezone(timezone.utc) + margin
+    return start, end
+
+
+def window_days(start, end):
+    """CloudTrail 경로의 날짜(UTC) 목록: 자정을 넘긴 빌드는 이틀치"""
+    days, current = [], start.date()
+    while current <= end.date():
+        days.append(current.strftime("%Y/%m/%d"))
+        current += timedelta(days=1)
+    return days
+
+
+def principal(build_window):
+    """조회할 호출 주체 → (ARN prefix, Terraform user agent 호출 포함 여부)
+
+    공유 트레일에는 모든 사용자의 빌드가 섞여 있으므로 빌드 세션 ARN으로 이번 빌드만 고르고,
+    다른 사용자의 Terraform 호출이 섞이지 않도록 user agent 조건은 쓰지 않음
+    """
+    if not cloudtrail_setup.SHARED_TRAIL:
+        return cloudtrail_scan.role_arn_prefix(ACCOUNT_ID), True
+    build_id = (build_window or {}).get("build_id")
+    if build_id:
+        return cloudtrail_scan.session_arn(ACCOUNT_ID, build_id), False
+    return cloudtrail_scan.role_arn_prefix(ACCOUNT_ID), False
+
+
+def build_query(log_bucket, region, days, window=None, arn_prefix=None, match_user_agent=True):
+    arn_prefix = arn_prefix or cloudtrail_scan.role_arn_prefix(ACCOUNT_ID)
+    user_agent_filter = "\n        OR useragent LIKE '%Terraform%'" if match_user_agent else ""
+    day_list = ", ".join(f"'{d}'" for d in days)
+    time_filter = ""
+    if window:
+        start, end = window
+        # eventTime은 ISO 8601(UTC, 초 단위) 문자열이라 문자열 비교로 범위 조건 가능
+        time_filter = (
+            f"\n      AND eventtime BETWEEN '{start.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+            f" AND '{end.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+        )
+    return f"""
+    SELECT DISTINCT
+      eventsource AS event_source,
+      eventname AS event_name
+    FROM {ATHENA_TABLE}
+    WHERE log_bucket = '{log_bucket}'
+      AND region = '{region}'
+      AND day IN ({day_list}){time_filter}
+      AND (
+        useridentity.arn LIKE '{arn_prefix}%'{user_agent_filter}
+      )
+    """
+
+
+def region_query(log_bucket, region, days, window, arn_prefix, match_user_agent):
+    """조회 날짜가 모두 Parquet으로 변환된 리전은 압축 테이블, 아니면 원본 테이블 조회"""
+    if cloudtrail_compaction.compacted(s3, log_bucket, region, days):
+        print(f"🗜️ {region}: Parquet 테이블 조회 ({cloudtrail_compaction.COMPACT_TABLE})")
+        return cloudtrail_compaction.query(log_bucket, region, days, window, arn_prefix, match_user_agent)
+    return build_query(log_bucket, region, days, window, arn_prefix, match_user_agent)
+
+
+def write_scan_result(log_bucket, log_prefix, key, days, window, arn_prefix, match_user_agent):
+    result = cloudtrail_scan.scan(s3, log_bucket, log_prefix, REGIONS, days, ACCOUNT_ID, window,
+                                  arn_prefix=arn_prefix, match_user_agent=match_user_agent)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    writer.writerow(["event_source", "event_name"])
+    writer.writerows(sorted(result["events"]))
+    s3.put_object(Bucket=log_bucket, Key=key, Body=buffer.getvalue().encode("utf-8"), ContentType="text/csv")
+    print(f"✅ CloudTrail 직접 조회 완료: 객체 {result['objects']}개, {result['bytes'] / 1024 / 1024:.2f} MB, "
+          f"레코드 {result['records']}건 → API {len(result['events'])}개 → s3://{log_bucket}/{key}")
+
 
 def lambda_handler(event, context):
     print("📥 입력 이벤트:", json.dumps(event, indent=2, ensure_ascii=False))
@@ -28,43 +193,37 @@ def lambda_handler(event, context):
     month = event["query_date"]["month"]
     day = event["query_date"]["day"]
 
-    regions = ['ap-northeast-2', 'us-east-1']
     result_path = f"s3://{log_bucket}/athena-results/{year}/{month}/{day}/"
 
-    # ✅ 1. 파티션 추가
-    for region in regions:
-        location = f"s3://{log_bucket}/{log_prefix}/{region}/{year}/{month}/{day}/"
-        partition_query = f"""
-        ALTER TABLE {ATHENA_TABLE}
-        ADD IF NOT EXISTS PARTITION (
-          region='{region}',
-          year='{year}',
-          month='{month}',
-          day='{day}'
-        )
-        LOCATION '{location}'
-        """
-        execute_athena_query(partition_query, result_path)
-        print(f"✅ 파티션 추가 완료 for region: {region}")
+    # ✅ terratest 빌드 시간 범위 (Athena 쿼리 / 직접 조회 공통)
+    #    - region / day → 해당 날짜·리전 경로만 읽음 (Athena는 파티션 프루닝)
+    #    - eventtime → 같은 날 다른 실행의 이벤트 제외
+    window = parse_window(event.get("build_window"))
+    if window:
+        days = window_days(*window)
+        print(f"🕒 조회 범위: {window[0].isoformat()} ~ {window[1].isoformat()} ({', '.join(days)})")
+    else:
+        # 빌드 시각을 모르는 경우(이전 실행 등): 기존처럼 하루 전체
+        days = [f"{year}/{month}/{day}"]
+        print(f"🕒 빌드 시각 없음 → 하루 전체 조회: {days[0]}")
+    arn_prefix, match_user_agent = principal(event.get("build_window"))
+    print(f"👤 조회 주체: {arn_prefix}*{' / Terraform user agent' if match_user_agent else ''}")
 
-    # ✅ 2. SELECT DISTINCT 쿼리
-    query = f"""
-    SELECT DISTINCT
-      json_extract_scalar(rec, '$.eventSource') AS event_source,
-      json_extract_scalar(rec, '$.eventName') AS event_name
-    FROM {ATHENA_TABLE}
-    CROSS JOIN UNNEST(CAST(json_extract(line, '$.Records') AS ARRAY<JSON>)) AS t(rec)
-    WHERE year = '{year}'
-      AND month = '{month}'
-      AND day = '{day}'
-      AND region IN ('ap-northeast-2', 'us-east-1')
-      AND (
-        json_extract_scalar(rec, '$.userIdentity.arn') LIKE 'arn:aws:sts::{ACCOUNT_ID}:assumed-role/terraform-terratest-codebuild-role%'
-        OR json_extract_scalar(rec, '$.userAgent') LIKE '%Terraform%'
-      )
-    """
-    execute_athena_query(query, result_path)
-    print("✅ Athena SELECT DISTINCT 쿼리 완료:", result_path)
+    if CLOUDTRAIL_ENGINE == "scan":
+        # 직접 읽기: Athena 결과와 같은 CSV(event_source, event_name)로 저장 → 10단계는 그대로
+        # Step Functions에는 빈 쿼리 목록 / DDL 없음을 넘겨서 Athena 태스크를 건너뜀
+        ddl, queries = None, []
+        result_key = f"athena-results/{year}/{month}/{day}/query-temp/scan-{context.aws_request_id}.csv"
+        write_scan_result(log_bucket, log_prefix, result_key, days, window, arn_prefix, match_user_agent)
+    else:
+        # ✅ partition projection 테이블 (없을 때만 DDL 전달, 파티션 추가 쿼리 없음)
+        ddl = table_ddl(log_bucket, log_prefix)
+        # ✅ 리전별 SELECT DISTINCT 쿼리: 대기(폴링)는 람다가 아니라 Map 안의 athena:startQueryExecution.sync 태스크가 수행
+        queries = [
+            {"region": region, "query": region_query(log_bucket, region, days, window, arn_prefix, match_user_agent)}
+            for region in REGIONS
+        ]
+        print(f"✅ Athena 쿼리 {len(queries)}개 생성 → 결과 위치: {result_path}query-temp/")
 
     return {
         "statusCode": 200,
@@ -76,29 +235,13 @@ def lambda_handler(event, context):
         "log_prefix": log_prefix,
         "service_name": service_name,
         "athena_output_path": result_path,
+        "athena_query_output": f"{result_path}query-temp/",
+        "athena_database": ATHENA_DATABASE,
+        "table_ddl": ddl,
+        "queries": queries,
         "query_date": {
             "year": year,
             "month": month,
             "day": day
         }
     }
-
-def execute_athena_query(query, output_path):
-    response = athena.start_query_execution(
-        QueryString=query,
-        QueryExecutionContext={'Database': ATHENA_DATABASE},
-        ResultConfiguration={'OutputLocation': f"{output_path}query-temp/"},
-        WorkGroup='primary'
-    )
-    execution_id = response['QueryExecutionId']
-
-    # 쿼리 완료까지 대기
-    while True:
-        result = athena.get_query_execution(QueryExecutionId=execution_id)
-        state = result['QueryExecution']['Status']['State']
-        if state in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-            break
-        time.sleep(2)
-
-    if state != 'SUCCEEDED':
-        raise Exception(f"Athena 쿼리 실패: {state}")
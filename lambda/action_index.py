@@ -0,0 +1,120 @@
+import csv
+import json
+import time
+
+import log_digest
+
+# 사용자/서비스별 최소 권한 API 누적 인덱스 ({user_id} 버킷의 {service_name}/infra/output/policy/action_index.json)
+# - 실행/날짜에 걸쳐 관측한 API를 정렬된 목록으로 보관
+# - 결과 경로(athena-results/.../query-temp/)마다 워터마크(마지막으로 반영한 결과의 LastModified + 그 시각의 키)를
+#   기록해서 다음 실행은 새로 생긴 결과 CSV만 읽음 (이전 쿼리 결과 재사용 / 1,000개 제한 없음)
+# - 여러 실행이 동시에 갱신해도 잃지 않도록 ETag 조건부 쓰기 + 재시도
+INDEX_NAME = "action_index.json"
+# 보관할 결과 경로 워터마크 수 (오래된 날짜부터 제거)
+MAX_WATERMARKS = 60
+MAX_ATTEMPTS = 5
+
+
+def index_key(service_name):
+    return f"{service_name}/infra/output/policy/{INDEX_NAME}"
+
+
+def new_index():
+    return {"actions": [], "watermarks": {}, "updated_at": None}
+
+
+def load(s3, bucket, key):
+    """(인덱스, ETag) / 없으면 (빈 인덱스, None)"""
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return new_index(), None
+    return json.loads(obj["Body"].read()), obj["ETag"]
+
+
+def _put(s3, bucket, key, index, etag=None):
+    """etag가 있으면 If-Match, 없으면 새 객체(If-None-Match) 조건부 쓰기. 경합에 지면 False"""
+    condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        s3.put_object(
+            Bucket=bucket, Key=key,
+            Body=json.dumps(index, indent=2).encode("utf-8"), ContentType="application/json", **condition
+        )
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return False
+        raise
+    return True
+
+
+def new_results(s3, bucket, prefix, watermark=None):
+    """워터마크 이후에 생긴 결과 CSV [(LastModified ISO, key)] (오래된 순, 페이지 단위 나열)"""
+    since = (watermark or {}).get("last_modified", "")
+    seen = set((watermark or {}).get("keys", []))
+    found = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            key = item["Key"]
+            if not key.endswith(".csv"):
+                continue
+            modified = item["LastModified"].isoformat()
+            # 같은 시각(초 단위)에 생긴 결과는 키로 구분
+            if modified > since or (modified == since and key not in seen):
+                found.append((modified, key))
+    return sorted(found)
+
+
+def advance(watermark, results):
+    """반영한 결과까지 워터마크 이동"""
+    if not results:
+        return watermark
+    latest = results[-1][0]
+    keys = [key for modified, key in results if modified == latest]
+    if watermark and watermark.get("last_modified") == latest:
+        keys = sorted(set(keys) | set(watermark.get("keys", [])))
+    return {"last_modified": latest, "keys": keys}
+
+
+def read_actions(s3, bucket, key):
+    """결과 CSV를 스트리밍으로 읽어 {"service:EventName"} (event_source, event_name 열)"""
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    actions = set()
+    for row in csv.DictReader(line for _, line in log_digest.iter_lines(body)):
+        source, name = row.get("event_source"), row.get("event_name")
+        if source and name:
+            actions.add(f"{source.split('.')[0]}:{name}")
+    return actions
+
+
+def update(s3, index_bucket, service_name, result_bucket, result_prefix):
+    """새 결과만 읽어 인덱스에 합침 → {"actions", "added", "new_results", "changed"}"""
+    key = index_key(service_name)
+    source = f"{result_bucket}/{result_prefix}"
+    cache = {}
+    for _ in range(MAX_ATTEMPTS):
+        index, etag = load(s3, index_bucket, key)
+        watermark = index["watermarks"].get(source)
+        results = new_results(s3, result_bucket, result_prefix, watermark)
+
+        found = set()
+        for _, result_key in results:
+            # 경합으로 다시 시도할 때 이미 읽은 CSV는 다시 읽지 않음
+            if result_key not in cache:
+                cache[result_key] = read_actions(s3, result_bucket, result_key)
+            found |= cache[result_key]
+
+        added = sorted(found - set(index["actions"]))
+        if not results:
+            return {"actions": index["actions"], "added": [], "new_results": 0, "changed": False}
+
+        index["actions"] = sorted(set(index["actions"]) | found)
+        index["watermarks"][source] = advance(watermark, results)
+        if len(index["watermarks"]) > MAX_WATERMARKS:
+            oldest = sorted(index["watermarks"], key=lambda s: index["watermarks"][s]["last_modified"])
+            for stale in oldest[:len(index["watermarks"]) - MAX_WATERMARKS]:
+                del index["watermarks"][stale]
+        index["updated_at"] = time.time()
+        if _put(s3, index_bucket, key, index, etag):
+            return {"actions": index["actions"], "added": added, "new_results": len(results), "changed": bool(added)}
+    raise Exception(f"❌ 액션 인덱스 갱신 경합 {MAX_ATTEMPTS}회 실패: s3://{index_bucket}/{key}")
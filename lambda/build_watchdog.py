@@ -0,0 +1,113 @@
+import os
+import re
+
+import terratest_report
+
+# terratest 빌드 실시간 감시
+# - 빌드가 terratest-output.txt 증가분을 청크(live/{uuid}/chunk-000000.txt ...)로 S3에 올리면
+#   워치독이 새 청크만 읽어서 진행 중인 terraform 리소스와 경과 시간을 추적
+# - 리소스 타입별 시간 예산을 넘겨도 끝나지 않거나, 로그가 한동안 전혀 늘지 않으면 멈춘 빌드로 판단
+DEFAULT_BUDGET_SECONDS = int(os.environ.get("WATCHDOG_DEFAULT_BUDGET", str(20 * 60)))
+SILENCE_SECONDS = int(os.environ.get("WATCHDOG_SILENCE_SECONDS", str(15 * 60)))
+
+# 리소스 타입별 "진행 없이 기다려도 되는" 최대 시간 (초)
+BUDGETS = {
+    "aws_acm_certificate_validation": 45 * 60,
+    "aws_db_instance": 60 * 60,
+    "aws_rds_cluster": 60 * 60,
+    "aws_rds_cluster_instance": 60 * 60,
+    "aws_dms_replication_instance": 40 * 60,
+    "aws_elasticache_replication_group": 45 * 60,
+    "aws_elasticache_cluster": 40 * 60,
+    "aws_cloudfront_distribution": 45 * 60,
+    "aws_eks_cluster": 30 * 60,
+    "aws_eks_node_group": 30 * 60,
+    "aws_nat_gateway": 15 * 60,
+    "aws_lb": 15 * 60,
+}
+
+_ADDRESS = r"((?:module\.[\w-]+(?:\[[^\]]+\])?\.)*(?:data\.)?[\w-]+\.[\w-]+(?:\[[^\]]+\])?)"
+_START = re.compile(rf"^{_ADDRESS}: (?:Creating|Modifying|Destroying|Reading)\.\.\.")
+_STILL = re.compile(rf"^{_ADDRESS}: Still \w+\.\.\. \[(?:id=[^,\]]*, )?([\dhms.]+) elapsed\]")
+_DONE = re.compile(rf"^{_ADDRESS}: (?:Creation|Modifications|Destruction|Read) complete")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)([hms])")
+
+
+def parse_elapsed(text):
+    """terraform 경과 시간 표기("1h2m30s") → 초"""
+    unit = {"h": 3600, "m": 60, "s": 1}
+    return sum(float(value) * unit[u] for value, u in _DURATION.findall(text))
+
+
+def resource_type(address):
+    """module.x.aws_db_instance.main[0] → aws_db_instance"""
+    parts = re.sub(r"\[[^\]]*\]", "", address).split(".")
+    while parts and parts[0] == "module":
+        parts = parts[2:]
+    if parts and parts[0] == "data":
+        parts = parts[1:]
+    return parts[0] if parts else address
+
+
+def budget(address):
+    return BUDGETS.get(resource_type(address), DEFAULT_BUDGET_SECONDS)
+
+
+def new_state():
+    return {"last_chunk": "", "in_flight": {}, "last_output_at": None, "bytes": 0}
+
+
+def observe(state, text, now):
+    """새 청크 본문을 반영 (in_flight: 주소 → {"elapsed": 마지막으로 본 경과 초, "seen_at": 본 시각})"""
+    in_flight = state["in_flight"]
+    for raw in text.splitlines():
+        line = terratest_report.clean_line(raw)
+        done = _DONE.match(line)
+        if done:
+            in_flight.pop(done.group(1), None)
+            continue
+        still = _STILL.match(line)
+        if still:
+            in_flight[still.group(1)] = {"elapsed": parse_elapsed(still.group(2)), "seen_at": now}
+            continue
+        start = _START.match(line)
+        if start:
+            in_flight[start.group(1)] = {"elapsed": 0, "seen_at": now}
+    if text:
+        state["last_output_at"] = now
+        state["bytes"] += len(text.encode("utf-8"))
+    return state
+
+
+def stuck(state, now):
+    """예산을 넘긴 리소스 / 로그 정지 → [{"address", "elapsed", "budget", "message"}]"""
+    problems = []
+    for address, seen in state["in_flight"].items():
+        elapsed = seen["elapsed"] + (now - seen["seen_at"])
+        limit = budget(address)
+        if elapsed > limit:
+            problems.append({
+                "address": address,
+                "elapsed": round(elapsed),
+                "budget": limit,
+                "message": f"{address}: {elapsed / 60:.0f}분째 완료되지 않음 (예산 {limit // 60}분)"
+            })
+    if state["last_output_at"] is not None and now - state["last_output_at"] > SILENCE_SECONDS:
+        problems.append({
+            "address": None,
+            "elapsed": round(now - state["last_output_at"]),
+            "budget": SILENCE_SECONDS,
+            "message": f"{(now - state['last_output_at']) / 60:.0f}분 동안 로그 출력 없음 (예산 {SILENCE_SECONDS // 60}분)"
+        })
+    return problems
+
+
+def failure_log(problems):
+    """부분 로그 끝에 붙일 terraform 형식 에러 블록 (8단계가 리소스 주소로 집계할 수 있게)"""
+    blocks = []
+    for problem in problems:
+        lines = [f"Error: watchdog stopped build: {problem['message']}", ""]
+        if problem["address"]:
+            lines.append(f"  with {problem['address']},")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+
+# CloudTrail 원본(gzip JSON)을 (사용자 로그 버킷, 리전, 날짜) 단위 Parquet으로 압축 변환
+# - 최소 권한 조회에 필요한 열만 타입을 지정해 저장 (eventtime TIMESTAMP, eventsource, eventname,
+#   useridentity_arn, useragent) → JSON 파싱 없이 필요한 열만 읽음
+# - eventtime 순으로 정렬해서 쓰므로 Parquet 행 그룹 min/max로 빌드 시간 범위 밖 데이터를 건너뜀
+# - 변환은 Athena UNLOAD로 수행 (람다에 Parquet 라이브러리 불필요), 전달이 끝난 지난 날짜만 대상
+# - 파티션별 상태는 데이터 경로 밖 _state/ 아래에 기록 (UNLOAD 대상 경로는 비어 있어야 함)
+COMPACT_BUCKET = os.environ.get("COMPACT_BUCKET", "terraform-artifacts-bucket-12")
+COMPACT_PREFIX = "cloudtrail-compact"
+COMPACT_TABLE = os.environ.get("COMPACT_TABLE", "cloudtrail_logs_compact")
+
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+TABLE_DDL = """
+CREATE EXTERNAL TABLE IF NOT EXISTS {table} (
+  eventtime TIMESTAMP,
+  eventsource STRING,
+  eventname STRING,
+  useridentity_arn STRING,
+  useragent STRING
+)
+PARTITIONED BY (log_bucket STRING, region STRING, day STRING)
+STORED AS PARQUET
+LOCATION 's3://{bucket}/{prefix}/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.log_bucket.type' = 'injected',
+  'projection.region.type' = 'enum',
+  'projection.region.values' = '{regions}',
+  'projection.day.type' = 'date',
+  'projection.day.format' = 'yyyy/MM/dd',
+  'projection.day.range' = '{projection_start},NOW',
+  'projection.day.interval' = '1',
+  'projection.day.interval.unit' = 'DAYS',
+  'storage.location.template' = 's3://{bucket}/{prefix}/${{log_bucket}}/${{region}}/${{day}}/'
+)
+"""
+
+UNLOAD_SQL = """
+UNLOAD (
+  SELECT
+    CAST(from_iso8601_timestamp(eventtime) AS TIMESTAMP) AS eventtime,
+    eventsource,
+    eventname,
+    useridentity.arn AS useridentity_arn,
+    useragent
+  FROM {raw_table}
+  WHERE log_bucket = '{log_bucket}'
+    AND region = '{region}'
+    AND day = '{day}'
+  ORDER BY 1
+)
+TO '{location}'
+WITH (format = 'PARQUET', compression = 'SNAPPY')
+"""
+
+
+def table_ddl(regions, projection_start):
+    return TABLE_DDL.format(
+        table=COMPACT_TABLE, bucket=COMPACT_BUCKET, prefix=COMPACT_PREFIX,
+        regions=",".join(regions), projection_start=projection_start
+    )
+
+
+def data_prefix(log_bucket, region, day):
+    return f"{COMPACT_PREFIX}/{log_bucket}/{region}/{day}/"
+
+
+def state_key(log_bucket, region, day):
+    return f"{COMPACT_PREFIX}/_state/{log_bucket}/{region}/{day}.json"
+
+
+def unload_sql(raw_table, log_bucket, region, day):
+    return UNLOAD_SQL.format(
+        raw_table=raw_table, log_bucket=log_bucket, region=region, day=day,
+        location=f"s3://{COMPACT_BUCKET}/{data_prefix(log_bucket, region, day)}"
+    )
+
+
+def load_state(s3, log_bucket, region, day):
+    try:
+        obj = s3.get_object(Bucket=COMPACT_BUCKET, Key=state_key(log_bucket, region, day))
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(obj["Body"].read())
+
+
+def save_state(s3, log_bucket, region, day, state):
+    state["updated_at"] = time.time()
+    s3.put_object(
+        Bucket=COMPACT_BUCKET, Key=state_key(log_bucket, region, day),
+        Body=json.dumps(state).encode("utf-8"), ContentType="application/json"
+    )
+
+
+def clear_data(s3, log_bucket, region, day):
+    """실패한 UNLOAD가 남긴 파일 삭제 (UNLOAD는 빈 경로에만 쓸 수 있음)"""
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=COMPACT_BUCKET, Prefix=data_prefix(log_bucket, region, day)):
+        keys = [{"Key": item["Key"]} for item in page.get("Contents", [])]
+        if keys:
+            s3.delete_objects(Bucket=COMPACT_BUCKET, Delete={"Objects": keys, "Quiet": True})
+
+
+def compacted(s3, log_bucket, region, days):
+    """해당 리전의 모든 날짜가 변환 완료됐으면 True"""
+    for day in days:
+        state = load_state(s3, log_bucket, region, day)
+        if not state or state["status"] != DONE:
+            return False
+    return True
+
+
+def query(log_bucket, region, days, window, arn_prefix, match_user_agent=True):
+    """9단계 리전별 쿼리의 Parquet 버전 (필요한 열만, eventtime은 TIMESTAMP 비교)"""
+    user_agent_filter = "\n        OR useragent LIKE '%Terraform%'" if match_user_agent else ""
+    day_list = ", ".join(f"'{d}'" for d in days)
+    time_filter = ""
+    if window:
+        start, end = window
+        time_filter = (
+            f"\n      AND eventtime BETWEEN TIMESTAMP '{start.strftime('%Y-%m-%d %H:%M:%S')}'"
+            f" AND TIMESTAMP '{end.strftime('%Y-%m-%d %H:%M:%S')}'"
+        )
+    return f"""
+    SELECT DISTINCT
+      eventsource AS event_source,
+      eventname AS event_name
+    FROM {COMPACT_TABLE}
+    WHERE log_bucket = '{log_bucket}'
+      AND region = '{region}'
+      AND day IN ({day_list}){time_filter}
+      AND (
+        useridentity_arn LIKE '{arn_prefix}%'{user_agent_filter}
+      )
+    """
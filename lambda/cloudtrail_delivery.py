@@ -0,0 +1,134 @@
+import json
+import os
+import re
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+# CloudTrail 전달 완료 확인 (API 호출 후 보통 5~15분 뒤에 S3에 도착)
+# 리전마다 빌드 종료 시각 이후를 덮는 전달 증거가 있으면 조회 가능으로 판단
+#   1) 로그 파일: 파일 이름의 전달 시각이 빌드 종료 + SETTLE_SECONDS 이후인 객체가 있음
+#      (CloudTrail은 시간 순으로 묶어서 전달하므로 그 뒤에 빌드 중 이벤트가 새로 올 가능성은 낮음)
+#   2) 다이제스트 파일: 로그 파일 검증이 켜진 트레일은 이벤트가 없는 리전에도 매시간 다이제스트를 남김
+#      → 다이제스트 시각이 빌드 종료 + SETTLE_SECONDS 이후면 그 리전은 확정
+# 리전별 측정 지연(빌드 종료 → 확인 시각)을 기록해서 다음 폴링 간격을 맞춤
+SETTLE_SECONDS = int(os.environ.get("CLOUDTRAIL_SETTLE_SECONDS", str(5 * 60)))
+MIN_POLL_SECONDS = int(os.environ.get("CLOUDTRAIL_MIN_POLL_SECONDS", "30"))
+MAX_POLL_SECONDS = int(os.environ.get("CLOUDTRAIL_MAX_POLL_SECONDS", "300"))
+# 이 시간이 지나도 확인되지 않으면 그대로 조회 진행 (이벤트가 전혀 없는 리전 등)
+MAX_WAIT_SECONDS = int(os.environ.get("CLOUDTRAIL_MAX_WAIT_SECONDS", str(30 * 60)))
+DEFAULT_LAG_SECONDS = 10 * 60
+LAG_BUCKET = os.environ.get("PROVISION_MARKER_BUCKET", "terraform-artifacts-bucket-12")
+LAG_KEY = "cloudtrail-delivery/lag.json"
+LAG_HISTORY = 100
+
+_STAMP = re.compile(r"_(\d{8}T\d{4,6})Z")
+
+
+def stamp_time(key):
+    """객체 이름의 시각 (로그: yyyymmddThhmm, 다이제스트: yyyymmddThhmmss) → UTC datetime / 없으면 None"""
+    match = _STAMP.search(key.rsplit("/", 1)[-1])
+    if not match:
+        return None
+    value = match.group(1)
+    return datetime.strptime(value, "%Y%m%dT%H%M%S" if len(value) == 15 else "%Y%m%dT%H%M").replace(tzinfo=timezone.utc)
+
+
+def _account(log_prefix):
+    # [트레일 S3KeyPrefix/]AWSLogs/{account}/CloudTrail
+    parts = log_prefix.strip("/").split("/")
+    return parts[parts.index("AWSLogs") + 1]
+
+
+def first_after(s3, bucket, prefix, start_after):
+    """prefix 아래에서 start_after 다음 키 1개 (키가 시각 순이라 목록 1번으로 확인)"""
+    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, StartAfter=start_after, MaxKeys=1)
+    contents = response.get("Contents", [])
+    return contents[0]["Key"] if contents else None
+
+
+def latest_digest(s3, bucket, prefix):
+    """하루 다이제스트 경로에서 가장 늦은 다이제스트 시각 (하루 최대 24개 + 트레일 수)"""
+    latest = None
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            stamp = stamp_time(item["Key"])
+            if stamp and (latest is None or stamp > latest):
+                latest = stamp
+    return latest
+
+
+def region_status(s3, bucket, log_prefix, region, target):
+    """리전이 target 시각까지 전달됐는지 → {"covered", "evidence", "delivered_at"}"""
+    account = _account(log_prefix)
+    day = target.strftime("%Y/%m/%d")
+    base = log_prefix.strip("/")
+
+    logs_prefix = f"{base}/{region}/{day}/"
+    key = first_after(s3, bucket, logs_prefix, f"{logs_prefix}{account}_CloudTrail_{region}_{target.strftime('%Y%m%dT%H%M')}")
+    if key:
+        return {"covered": True, "evidence": "log", "delivered_at": stamp_time(key).isoformat()}
+
+    digest_prefix = f"{base}-Digest/{region}/{day}/"
+    digest = latest_digest(s3, bucket, digest_prefix)
+    if digest and digest >= target:
+        return {"covered": True, "evidence": "digest", "delivered_at": digest.isoformat()}
+    return {"covered": False, "evidence": None, "delivered_at": digest.isoformat() if digest else None}
+
+
+def load_lags(s3):
+    try:
+        return json.loads(s3.get_object(Bucket=LAG_BUCKET, Key=LAG_KEY)["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return []
+
+
+def expected_lag(lags):
+    values = [entry["lag_seconds"] for entry in lags if not entry.get("timed_out")]
+    return statistics.median(values) if values else DEFAULT_LAG_SECONDS
+
+
+def record_lag(s3, lags, entry):
+    """측정한 전달 지연을 최근 LAG_HISTORY개까지 보관"""
+    lags = (lags + [entry])[-LAG_HISTORY:]
+    s3.put_object(Bucket=LAG_BUCKET, Key=LAG_KEY, Body=json.dumps(lags).encode("utf-8"), ContentType="application/json")
+
+
+def next_wait(build_end, now, lag, attempts):
+    """예상 전달 시각까지 남은 시간만큼 대기 / 이미 지났으면 MIN부터 두 배씩"""
+    remaining = (build_end.timestamp() + lag) - now
+    if remaining <= 0:
+        remaining = MIN_POLL_SECONDS * 2 ** min(attempts, 4)
+    return int(max(MIN_POLL_SECONDS, min(MAX_POLL_SECONDS, remaining)))
+
+
+def check(s3, bucket, log_prefix, regions, build_end, previous=None, now=None):
+    """조회 가능 여부 → {"ready", "wait_seconds", "attempts", "started_at", "regions", "lag_seconds", "timed_out"}"""
+    now = now or time.time()
+    previous = previous or {}
+    attempts = previous.get("attempts", 0) + 1
+    started_at = previous.get("started_at", now)
+    target = build_end + timedelta(seconds=SETTLE_SECONDS)
+
+    statuses = {region: region_status(s3, bucket, log_prefix, region, target) for region in regions}
+    ready = all(s["covered"] for s in statuses.values())
+    timed_out = not ready and now - started_at >= MAX_WAIT_SECONDS
+    lags = load_lags(s3)
+    result = {
+        "ready": ready or timed_out,
+        "timed_out": timed_out,
+        "wait_seconds": 0,
+        "attempts": attempts,
+        "started_at": started_at,
+        "regions": statuses,
+        "lag_seconds": round(now - build_end.timestamp())
+    }
+    if ready or timed_out:
+        record_lag(s3, lags, {
+            "at": now, "lag_seconds": result["lag_seconds"], "attempts": attempts, "timed_out": timed_out,
+            "evidence": {region: s["evidence"] for region, s in statuses.items()}
+        })
+    else:
+        result["wait_seconds"] = next_wait(build_end, now, expected_lag(lags), attempts)
+    return result
@@ -0,0 +1,123 @@
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Athena 없이 CloudTrail 로그를 직접 읽어 terratest가 호출한 API 목록을 추출
+# - 한 번의 terratest 실행 범위(리전 x 날짜 경로)는 gzip 객체 수백 개 수준이라
+#   Athena 대기열/시작 지연보다 직접 읽는 편이 빠름
+# - 날짜/리전 경로를 페이지 단위로 나열하고, 객체는 제한된 스레드 풀에서 내려받아 압축 해제
+# - s3 클라이언트는 인자로 받음 (boto3 클라이언트는 스레드 간 공유 가능)
+MAX_WORKERS = int(os.environ.get("CLOUDTRAIL_SCAN_WORKERS", "16"))
+# 파일 이름 시각(전달 시각) 기준으로 빌드 종료 후 이 시간까지 전달된 파일만 읽음 (CloudTrail 전달 지연 여유)
+DELIVERY_SLACK_SECONDS = int(os.environ.get("CLOUDTRAIL_DELIVERY_SLACK", str(60 * 60)))
+CODEBUILD_ROLE = "terraform-terratest-codebuild-role"
+
+# {account}_CloudTrail_{region}_{YYYYMMDDTHHMMZ}_{id}.json.gz
+_DELIVERED_AT = re.compile(r"_CloudTrail_[\w-]+_(\d{8}T\d{4})Z_")
+
+
+def role_arn_prefix(account_id):
+    return f"arn:aws:sts::{account_id}:assumed-role/{CODEBUILD_ROLE}"
+
+
+def session_arn(account_id, build_id):
+    """CodeBuild 빌드 ID(project:uuid) → 빌드가 역할을 맡은 세션 ARN (세션 이름 AWSCodeBuild-{uuid})"""
+    return f"{role_arn_prefix(account_id)}/AWSCodeBuild-{build_id.rsplit(':', 1)[-1]}"
+
+
+def day_prefixes(log_prefix, regions, days):
+    """AWSLogs/{account}/CloudTrail + 리전 + yyyy/mm/dd → 나열할 경로 목록"""
+    return [f"{log_prefix.rstrip('/')}/{region}/{day}/" for region in regions for day in days]
+
+
+def delivered_at(key):
+    """객체 이름의 전달 시각 (yyyymmddThhmm, UTC) / 형식이 다르면 None"""
+    match = _DELIVERED_AT.search(key)
+    return match.group(1) if match else None
+
+
+def list_objects(s3, bucket, prefix, window=None):
+    """경로 아래 .json.gz 객체를 페이지 단위로 나열 (1,000개 넘어도 누락 없음)
+
+    window가 있으면 빌드 시작 전에 전달된 파일(이전 이벤트만 포함)과
+    종료 + 전달 지연 여유 이후 파일은 내려받지 않음
+    """
+    low = high = None
+    if window:
+        start, end = window
+        low = start.strftime("%Y%m%dT%H%M")
+        high = end.timestamp() + DELIVERY_SLACK_SECONDS
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            key = item["Key"]
+            if not key.endswith(".json.gz"):
+                continue
+            stamp = delivered_at(key)
+            if stamp and low and stamp < low:
+                continue
+            if stamp and high and _epoch(stamp) > high:
+                continue
+            yield key, item.get("Size", 0)
+
+
+def _epoch(stamp):
+    return datetime.strptime(stamp, "%Y%m%dT%H%M").replace(tzinfo=timezone.utc).timestamp()
+
+
+def matches(record, arn_prefix, window_text=None, match_user_agent=True):
+    """terratest CodeBuild 역할(또는 빌드 세션) / Terraform user agent 호출 + 빌드 시간 범위"""
+    if window_text:
+        event_time = record.get("eventTime", "")
+        if not window_text[0] <= event_time <= window_text[1]:
+            return False
+    arn = (record.get("userIdentity") or {}).get("arn") or ""
+    if arn.startswith(arn_prefix):
+        return True
+    return match_user_agent and "Terraform" in (record.get("userAgent") or "")
+
+
+def scan_object(s3, bucket, key, arn_prefix, window_text=None, match_user_agent=True):
+    """객체 1개: 스트리밍 압축 해제 → 조건에 맞는 (eventSource, eventName) 집합"""
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    with gzip.GzipFile(fileobj=body) as stream:
+        records = json.load(stream).get("Records", [])
+    found = set()
+    for record in records:
+        if matches(record, arn_prefix, window_text, match_user_agent):
+            found.add((record.get("eventSource", ""), record.get("eventName", "")))
+    return found, len(records)
+
+
+def scan(s3, bucket, log_prefix, regions, days, account_id, window=None, max_workers=MAX_WORKERS,
+         arn_prefix=None, match_user_agent=True):
+    """리전 x 날짜 경로 전체를 읽어 → {"events": {(source, name)}, "objects", "bytes", "records"}
+
+    arn_prefix 기본값은 terratest CodeBuild 역할 전체 (공유 트레일에서는 빌드 세션 ARN을 넘김)
+    """
+    arn_prefix = arn_prefix or role_arn_prefix(account_id)
+    window_text = None
+    if window:
+        window_text = tuple(t.strftime("%Y-%m-%dT%H:%M:%SZ") for t in window)
+
+    keys, total_bytes = [], 0
+    for prefix in day_prefixes(log_prefix, regions, days):
+        for key, size in list_objects(s3, bucket, prefix, window):
+            keys.append(key)
+            total_bytes += size
+
+    events, total_records = set(), 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results = pool.map(lambda k: scan_object(s3, bucket, k, arn_prefix, window_text, match_user_agent), keys)
+        for found, count in results:
+            events |= found
+            total_records += count
+    return {"events": events, "objects": len(keys), "bytes": total_bytes, "records": total_records}
+
+
+def actions(events):
+    """{(ec2.amazonaws.com, RunInstances)} → {"ec2:RunInstances"} (10단계와 같은 변환)"""
+    return {f"{source.split('.')[0]}:{name}" for source, name in events if source and name}
@@ -0,0 +1,190 @@
+import functools
+import json
+import os
+
+import boto3
+
+import cloudtrail_scan
+
+# 사용자별 CloudTrail 버킷 + 트레일 준비 (멱등)
+# - terratest 단계(6)에서 매번 head_bucket/get_trail/put_bucket_policy를 호출하지 않도록
+#   코드 생성 단계와 병렬로 한 번만 준비하고, 사용자별 "provisioned" 마커를 S3에 남김
+# - 마커는 웜 컨테이너 메모리에도 보관해 같은 컨테이너에서는 S3 조회도 생략
+# CLOUDTRAIL_MODE=shared: 사용자마다 트레일을 만들지 않고 공유 트레일 1개 사용 (리전별 트레일 수 제한 회피)
+# - 고급 이벤트 선택기로 terratest CodeBuild 역할의 관리 이벤트만 기록 → 로그 양 / Athena 스캔량 감소
+# - 트레일은 S3 키 prefix를 하나만 가질 수 있어 사용자별 경로로 나눠 쓰지 못함
+#   → 사용자/실행 구분은 9단계 쿼리에서 빌드 세션 ARN(AWSCodeBuild-{빌드 UUID})으로 함
+PROVISION_MARKER_BUCKET = os.environ.get("PROVISION_MARKER_BUCKET", "terraform-artifacts-bucket-12")
+PROVISION_MARKER_PREFIX = "cloudtrail-provisioned"
+region = os.environ.get("AWS_REGION", "ap-northeast-2")
+
+CLOUDTRAIL_MODE = os.environ.get("CLOUDTRAIL_MODE", "per_user")
+SHARED_TRAIL = CLOUDTRAIL_MODE == "shared"
+SHARED_TRAIL_BUCKET = os.environ.get("SHARED_TRAIL_BUCKET", "cloudtrail-logs-terratest-shared")
+SHARED_TRAIL_NAME = os.environ.get("SHARED_TRAIL_NAME", "terraform-deploy-trail-shared")
+SHARED_KEY_PREFIX = "terratest"
+
+s3 = boto3.client('s3')
+cloudtrail = boto3.client('cloudtrail')
+
+_provisioned = set()
+
+
+@functools.lru_cache(maxsize=1)
+def account_id():
+    """계정 ID는 실제로 필요할 때 한 번만 STS로 조회 (콜드 스타트에서 STS 호출 제거)"""
+    return boto3.client("sts").get_caller_identity()["Account"]
+
+
+def trail_names(user):
+    """사용자 기준 (CloudTrail 로그 버킷, 트레일 이름) / 공유 모드는 모든 사용자가 같은 트레일"""
+    if SHARED_TRAIL:
+        return SHARED_TRAIL_BUCKET, SHARED_TRAIL_NAME
+    return f"cloudtrail-logs-{user.lower()}", f"terraform-deploy-trail-{user.lower()}"
+
+
+def key_prefix():
+    """트레일 S3KeyPrefix (없으면 빈 문자열)"""
+    return f"{SHARED_KEY_PREFIX}/" if SHARED_TRAIL else ""
+
+
+def log_location(user, account=None):
+    """9단계 조회 입력 (log_bucket, log_prefix). 버킷/트레일 생성 없이 이름만 계산"""
+    return trail_names(user)[0], f"{key_prefix()}AWSLogs/{account or account_id()}/CloudTrail"
+
+
+def marker_key(user):
+    return f"{PROVISION_MARKER_PREFIX}/{'_shared' if SHARED_TRAIL else user.lower()}.json"
+
+
+def terratest_event_selectors(account_id):
+    """terratest CodeBuild 역할 세션이 호출한 관리 이벤트만 기록 (읽기/쓰기 모두: Describe도 정책에 필요)"""
+    return [{
+        "Name": "terratest-codebuild-management-events",
+        "FieldSelectors": [
+            {"Field": "eventCategory", "Equals": ["Management"]},
+            {"Field": "userIdentity.arn", "StartsWith": [f"{cloudtrail_scan.role_arn_prefix(account_id)}/"]}
+        ]
+    }]
+
+
+# --- 🔧 리소스 생성 ---
+# ✅ 버킷 없으면 자동 생성 + 정책 부착
+def create_bucket_if_not_exists(bucket_name: str, region: str, account_id: str):
+    try:
+        s3.head_bucket(Bucket=bucket_name)
+        print(f"✅ S3 버킷 이미 존재함: {bucket_name}")
+        return
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] != "404":
+            raise
+        print(f"🆕 S3 버킷 생성 중: {bucket_name}")
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={"LocationConstraint": region}
+        )
+
+    # CloudTrail 로그 저장용 버킷 정책 설정
+    policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Sid": "AWSCloudTrailAclCheck",
+                "Effect": "Allow",
+                "Principal": {"Service": "cloudtrail.amazonaws.com"},
+                "Action": "s3:GetBucketAcl",
+                "Resource": f"arn:aws:s3:::{bucket_name}"
+            },
+            {
+                "Sid": "AWSCloudTrailWrite",
+                "Effect": "Allow",
+                "Principal": {"Service": "cloudtrail.amazonaws.com"},
+                "Action": "s3:PutObject",
+                "Resource": f"arn:aws:s3:::{bucket_name}/{key_prefix()}AWSLogs/{account_id}/*",
+                "Condition": {
+                    "StringEquals": {
+                        "s3:x-amz-acl": "bucket-owner-full-control"
+                    }
+                }
+            }
+        ]
+    }
+
+    s3.put_bucket_policy(
+        Bucket=bucket_name,
+        Policy=json.dumps(policy)
+    )
+    print(f"✅ S3 버킷 정책 설정 완료: {bucket_name}")
+
+# ✅ CloudTrail 트레일 생성
+def create_cloudtrail_trail_if_not_exists(trail_name: str, s3_bucket_name: str):
+    try:
+        cloudtrail.get_trail(Name=trail_name)
+        print(f"🔁 CloudTrail 트레일 이미 존재함: {trail_name}")
+    except cloudtrail.exceptions.TrailNotFoundException:
+        print(f"🆕 CloudTrail 트레일 생성 중: {trail_name}")
+        options = {"S3KeyPrefix": SHARED_KEY_PREFIX} if SHARED_TRAIL else {}
+        cloudtrail.create_trail(
+            Name=trail_name,
+            S3BucketName=s3_bucket_name,
+            IsMultiRegionTrail=True,
+            # 다이제스트 파일은 이벤트가 없는 리전에도 매시간 전달됨 → 전달 완료 확인에 사용
+            EnableLogFileValidation=True,
+            **options
+        )
+        if SHARED_TRAIL:
+            put_shared_event_selectors(trail_name)
+        cloudtrail.start_logging(Name=trail_name)
+        print(f"✅ CloudTrail 트레일 생성 및 로깅 시작됨: {trail_name}")
+
+
+def put_shared_event_selectors(trail_name: str):
+    try:
+        cloudtrail.put_event_selectors(TrailName=trail_name, AdvancedEventSelectors=terratest_event_selectors(account_id()))
+        print(f"✅ 고급 이벤트 선택기 설정: {cloudtrail_scan.CODEBUILD_ROLE} 관리 이벤트만 기록")
+    except cloudtrail.exceptions.InvalidEventSelectorsException as e:
+        # 관리 이벤트에 userIdentity.arn 조건을 쓸 수 없는 경우: 관리 이벤트 전체를 기록하고 쿼리의 세션 ARN 조건으로 거름
+        print(f"⚠️ userIdentity.arn 선택기 거부됨 ({e}) → 관리 이벤트 전체 기록")
+        cloudtrail.put_event_selectors(TrailName=trail_name, AdvancedEventSelectors=[{
+            "Name": "management-events",
+            "FieldSelectors": [{"Field": "eventCategory", "Equals": ["Management"]}]
+        }])
+
+
+# --- 🔧 준비 여부 확인 ---
+def _marker_exists(user):
+    try:
+        s3.head_object(Bucket=PROVISION_MARKER_BUCKET, Key=marker_key(user))
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+def ensure_provisioned(user):
+    """사용자 CloudTrail 버킷/트레일이 없으면 만들고 (버킷, 트레일) 반환
+
+    메모리 → S3 마커 순으로 확인하고, 둘 다 없을 때만 AWS 리소스를 확인/생성한 뒤 마커를 기록
+    """
+    trail_bucket, trail_name = trail_names(user)
+    if marker_key(user) in _provisioned:
+        return trail_bucket, trail_name
+    if _marker_exists(user):
+        print(f"♻️ CloudTrail 준비 마커 존재: {user}")
+        _provisioned.add(marker_key(user))
+        return trail_bucket, trail_name
+
+    create_bucket_if_not_exists(trail_bucket, region, account_id())
+    create_cloudtrail_trail_if_not_exists(trail_name, trail_bucket)
+    s3.put_object(
+        Bucket=PROVISION_MARKER_BUCKET,
+        Key=marker_key(user),
+        Body=json.dumps({
+            "trail_bucket": trail_bucket, "trail_name": trail_name, "region": region, "shared": SHARED_TRAIL
+        }).encode("utf-8"),
+        ContentType="application/json"
+    )
+    _provisioned.add(marker_key(user))
+    print(f"✅ CloudTrail 준비 완료 → 마커 s3://{PROVISION_MARKER_BUCKET}/{marker_key(user)}")
+    return trail_bucket, trail_name
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+
+# tflint(정적) / terratest(동적) 재시도 루프의 수렴 여부 판단
+# 반복마다 검증한 코드 해시와 에러 지문(fingerprint) 집합을 기록하고,
+# 같은 코드가 다시 나오거나(repeat), 두 상태를 오가거나(oscillation),
+# 에러 집합이 더 이상 줄지 않으면(stalled) 루프를 즉시 멈추도록 결정값을 돌려줌
+
+HISTORY_KEY = "convergence/history.json"
+STALL_LIMIT = int(os.environ.get("CONVERGENCE_STALL_LIMIT", "2"))
+
+STAGE_STATIC = "static"
+STAGE_DYNAMIC = "dynamic"
+
+CONTINUE = "continue"
+CONVERGED = "converged"
+REPEAT = "repeat"
+OSCILLATION = "oscillation"
+STALLED = "stalled"
+UNKNOWN = "unknown"
+# 일시적 실패(스로틀링 등)로 같은 코드를 재배포한 반복: 코드 실패 이력으로 보지 않음
+TRANSIENT = "transient"
+
+_BOX_CHARS = re.compile(r"[│╷╵]")
+_HEX_ID = re.compile(r"\b(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[a-z]+-[0-9a-f]{8,17}|[0-9a-f]{16,})\b")
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+_ERROR_LINE = re.compile(r"\berror\b", re.IGNORECASE)
+_CONTEXT_LINE = re.compile(r'\bin (resource|data|module|variable|output) "')
+
+
+# --- 🔧 해시 / 지문 ---
+def code_hash(code):
+    """공백/주석 차이를 무시한 Terraform 코드 해시"""
+    lines = []
+    for line in code.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("//"):
+            continue
+        lines.append(_SPACES.sub(" ", line))
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def normalize_line(line):
+    line = _BOX_CHARS.sub(" ", line).lower()
+    line = _HEX_ID.sub("<id>", line)
+    line = _DIGITS.sub("#", line)
+    return _SPACES.sub(" ", line).strip()
+
+
+def error_fingerprints(lines):
+    """로그 라인(iterable)에서 에러 지문 집합을 정렬된 리스트로 반환
+
+    에러 라인 바로 뒤 몇 줄 안에 `in resource "..." "..."` 문맥이 있으면 함께 묶어
+    같은 메시지라도 리소스가 다르면 다른 에러로 취급함
+    """
+    fingerprints = set()
+    pending = None
+    lookahead = 0
+    for line in lines:
+        if pending is not None:
+            lookahead -= 1
+            if _CONTEXT_LINE.search(line):
+                pending += " | " + normalize_line(line.split(", in ", 1)[-1])
+                lookahead = 0
+            if lookahead <= 0:
+                fingerprints.add(hashlib.sha1(pending.encode("utf-8")).hexdigest()[:12])
+                pending = None
+        if _ERROR_LINE.search(line) and "go-multierror" not in line.lower():
+            # 앞 에러의 문맥을 찾는 중에 다음 에러가 시작되면 앞 에러를 먼저 기록
+            if pending is not None:
+                fingerprints.add(hashlib.sha1(pending.encode("utf-8")).hexdigest()[:12])
+            pending = normalize_line(line)
+            lookahead = 4
+    if pending is not None:
+        fingerprints.add(hashlib.sha1(pending.encode("utf-8")).hexdigest()[:12])
+    return sorted(fingerprints)
+
+
+# --- 🔧 이력 저장 (S3) ---
+def history_key(prefix):
+    return f"{prefix.rstrip('/')}/{HISTORY_KEY}"
+
+
+def load_history(s3, bucket, prefix):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=history_key(prefix))
+    except s3.exceptions.NoSuchKey:
+        return []
+    return json.loads(obj["Body"].read()).get("iterations", [])
+
+
+def save_history(s3, bucket, prefix, history):
+    s3.put_object(
+        Bucket=bucket,
+        Key=history_key(prefix),
+        Body=json.dumps({"iterations": history}, indent=2).encode("utf-8"),
+        ContentType="application/json"
+    )
+
+
+def reset_history(s3, bucket, prefix):
+    # 새 코드 생성(3단계) 시작 시 이전 실행의 이력을 비움
+    save_history(s3, bucket, prefix, [])
+
+
+# --- 🔧 수렴 판단 ---
+def _comparable(history, stage):
+    """같은 단계에서 비교 대상이 되는 이력
+
+    정적 단계는 동적 단계에서 코드가 새로 만들어질 때마다 기준이 바뀌므로
+    마지막 동적 반복 이후의 정적 반복만 비교함
+    """
+    if stage == STAGE_STATIC:
+        entries = []
+        for entry in reversed(history):
+            if entry["stage"] != STAGE_STATIC:
+                break
+            entries.append(entry)
+        return list(reversed(entries))
+    return [entry for entry in history if entry["stage"] == stage]
+
+
+def assess(history, stage, code_hash_, errors, stall_limit=STALL_LIMIT):
+    """방금 검증한 코드 기준 판단 → (decision, reason)"""
+    if not errors:
+        return CONVERGED, "에러 없음"
+
+    entries = [e for e in _comparable(history, stage) if e["errors"] and e["decision"] != TRANSIENT]
+    if entries and entries[-1]["code_hash"] == code_hash_:
+        return REPEAT, f"{stage}: 직전 반복과 동일한 코드가 다시 검증됨"
+    if any(e["code_hash"] == code_hash_ for e in entries[:-1]):
+        return OSCILLATION, f"{stage}: 이전에 실패한 코드로 되돌아감"
+
+    stalled = 0
+    sizes = [len(e["errors"]) for e in entries] + [len(errors)]
+    for prev, cur in zip(sizes, sizes[1:]):
+        stalled = stalled + 1 if cur >= prev else 0
+    if stalled >= stall_limit:
+        return STALLED, f"{stage}: 에러 수가 {stalled}회 연속 줄지 않음 ({sizes[-stalled - 1]} → {sizes[-1]})"
+
+    return CONTINUE, f"{stage}: 에러 {len(errors)}건, 계속 수정"
+
+
+def assess_fix(history, stage, code_hash_, fix_hash):
+    """LLM이 만든 수정 코드가 이미 실패한 코드인지 빌드 전에 판단"""
+    if fix_hash == code_hash_:
+        return REPEAT, f"{stage}: 수정 결과가 원본 코드와 동일함"
+    failed = {e["code_hash"] for e in _comparable(history, stage) if e["errors"] and e["decision"] != TRANSIENT}
+    if fix_hash in failed:
+        return OSCILLATION, f"{stage}: 수정 결과가 이전에 실패한 코드와 동일함"
+    return CONTINUE, f"{stage}: 새로운 수정 코드"
+
+
+def transient_streak(history, stage):
+    """마지막 반복부터 연속된 일시적 실패 재배포 횟수"""
+    streak = 0
+    for entry in reversed(history):
+        if entry["stage"] != stage or entry["decision"] != TRANSIENT:
+            break
+        streak += 1
+    return streak
+
+
+def record_iteration(history, stage, code_hash_, errors, decision, reason, fix_hash=None):
+    entry = {
+        "iteration": len(history) + 1,
+        "stage": stage,
+        "code_hash": code_hash_,
+        "errors": list(errors),
+        "fix_hash": fix_hash,
+        "decision": decision,
+        "reason": reason
+    }
+    history.append(entry)
+    return entry
@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+# GitHub Git Data API로 여러 파일을 커밋 1개로 올림 (파일마다 get_contents + update_file 하던 방식 대체)
+# 1) 저장소 정보 / 브랜치 ref / 기준 커밋·트리 조회 (ETag 조건부 요청: 바뀌지 않았으면 304, rate limit 미차감)
+# 2) 로컬에서 git blob SHA를 계산해 기준 트리와 같은 파일은 건너뜀 → 바뀐 파일이 없으면 커밋하지 않음
+# 3) 바뀐 파일만 blob 병렬 업로드 → 트리 1개 → 커밋 1개
+# 4) ref 갱신은 fast-forward만 허용 (force=false). 그 사이 다른 커밋이 들어와 거부되면
+#    새 head를 기준으로 트리/커밋만 다시 만들어 재시도 (blob은 재사용)
+# 5) 빈 저장소는 Git Data API가 409로 거부하므로 contents API로 첫 커밋(파일 1개)을 만든 뒤 1)부터 진행
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+MAX_WORKERS = int(os.environ.get("GITHUB_BLOB_WORKERS", "8"))
+MAX_ATTEMPTS = 5
+TIMEOUT_SECONDS = 30
+FILE_MODE = "100644"
+
+# (API 주소, 경로) → (ETag, 응답 본문): 웜 컨테이너에서는 이전 실행의 ETag로 조건부 요청
+_etags = {}
+_etag_lock = threading.Lock()
+
+
+class GitHubError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"GitHub API {status}: {message}")
+        self.status = status
+
+
+def repo_path(github_repo_url):
+    """https://github.com/owner/repo(.git) 또는 owner/repo → owner/repo"""
+    path = github_repo_url.strip().rstrip("/")
+    for prefix in ("https://github.com/", "http://github.com/", "git@github.com:"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    if path.endswith(".git"):
+        path = path[:-4]
+    if path.count("/") != 1:
+        raise ValueError(f"❌ GitHub 저장소 형식이 아닙니다: {github_repo_url}")
+    return path
+
+
+def blob_sha(content):
+    """git hash-object와 같은 blob SHA (업로드 없이 기존 파일과 비교)"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class GitHubClient:
+    def __init__(self, token, repo, base_url=GITHUB_API_URL, session=None):
+        self.repo = repo
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        self.requests = 0
+        self.not_modified = 0
+        self._count_lock = threading.Lock()
+
+    def _url(self, path):
+        return f"{self.base_url}/repos/{self.repo}{path}"
+
+    def call(self, method, path, body=None, conditional=False):
+        """JSON 요청 → (상태 코드, 본문). conditional이면 저장된 ETag로 If-None-Match"""
+        url = self._url(path)
+        headers = {}
+        cached = None
+        if conditional:
+            with _etag_lock:
+                cached = _etags.get((self.base_url, url))
+            if cached:
+                headers["If-None-Match"] = cached[0]
+        response = self.session.request(method, url, json=body, headers=headers, timeout=TIMEOUT_SECONDS)
+        with self._count_lock:
+            self.requests += 1
+            if response.status_code == 304:
+                self.not_modified += 1
+        if response.status_code == 304 and cached:
+            return 200, cached[1]
+        payload = response.json() if response.content else None
+        if conditional and response.status_code == 200 and response.headers.get("ETag"):
+            with _etag_lock:
+                _etags[(self.base_url, url)] = (response.headers["ETag"], payload)
+        return response.status_code, payload
+
+    def expect(self, method, path, body=None, conditional=False, ok=(200, 201)):
+        status, payload = self.call(method, path, body, conditional)
+        if status not in ok:
+            raise GitHubError(status, (payload or {}).get("message", ""))
+        return payload
+
+    # --- 조회 (조건부) ---
+    def default_branch(self):
+        return self.expect("GET", "", conditional=True)["default_branch"]
+
+    def head(self, branch):
+        """브랜치 head 커밋 SHA / 브랜치가 없거나 빈 저장소(409)면 None"""
+        status, payload = self.call("GET", f"/git/ref/heads/{branch}", conditional=True)
+        if status in (404, 409):
+            return None
+        if status != 200:
+            raise GitHubError(status, (payload or {}).get("message", ""))
+        return payload["object"]["sha"]
+
+    def commit_tree(self, commit_sha):
+        return self.expect("GET", f"/git/commits/{commit_sha}", conditional=True)["tree"]["sha"]
+
+    def tree_blobs(self, tree_sha):
+        """트리 전체 {경로: blob SHA} (잘린 응답이면 비교 없이 전부 업로드하도록 빈 값)"""
+        tree = self.expect("GET", f"/git/trees/{tree_sha}?recursive=1", conditional=True)
+        if tree.get("truncated"):
+            return {}
+        return {entry["path"]: entry["sha"] for entry in tree["tree"] if entry["type"] == "blob"}
+
+    # --- 생성 ---
+    def create_blob(self, content):
+        return self.expect("POST", "/git/blobs", {
+            "content": base64.b64encode(content).decode("ascii"), "encoding": "base64"
+        })["sha"]
+
+    def create_tree(self, base_tree, blobs):
+        entries = [{"path": path, "mode": FILE_MODE, "type": "blob", "sha": sha} for path, sha in sorted(blobs.items())]
+        return self.expect("POST", "/git/trees", {"base_tree": base_tree, "tree": entries})["sha"]
+
+    def create_commit(self, message, tree_sha, parent):
+        return self.expect("POST", "/git/commits", {"message": message, "tree": tree_sha, "parents": [parent]})["sha"]
+
+    def create_file(self, path, content, message):
+        """contents API로 기본 브랜치에 파일 1개 커밋 (빈 저장소의 첫 커밋). 그 사이 누가 먼저 만들었으면 False"""
+        status, payload = self.call("PUT", f"/contents/{quote(path)}", {
+            "message": message, "content": base64.b64encode(content).decode("ascii")
+        })
+        if status in (200, 201):
+            return True
+        if status in (409, 422):
+            return False
+        raise GitHubError(status, (payload or {}).get("message", ""))
+
+    def update_ref(self, branch, commit_sha):
+        """fast-forward 갱신. 다른 커밋이 먼저 들어와 거부되면 False"""
+        status, payload = self.call("PATCH", f"/git/refs/heads/{branch}", {"sha": commit_sha, "force": False})
+        if status == 200:
+            return True
+        if status in (409, 422):
+            return False
+        raise GitHubError(status, (payload or {}).get("message", ""))
+
+    def create_ref(self, branch, commit_sha):
+        """새 브랜치. 그 사이 누가 먼저 만들었으면 False"""
+        status, payload = self.call("POST", "/git/refs", {"ref": f"refs/heads/{branch}", "sha": commit_sha})
+        if status == 201:
+            return True
+        if status == 422:
+            return False
+        raise GitHubError(status, (payload or {}).get("message", ""))
+
+
+def _result(client, commit_sha, branch, changed, files, attempts):
+    return {"commit": commit_sha, "branch": branch, "changed": sorted(changed), "unchanged": len(files) - len(changed),
+            "attempts": attempts, "requests": client.requests, "not_modified": client.not_modified}
+
+
+def publish(client, files, message, branch=None, max_workers=MAX_WORKERS):
+    """files {경로: bytes}를 branch에 커밋 1개로 반영
+    → {"commit", "branch", "changed", "unchanged", "attempts", "requests", "not_modified"}"""
+    branch = branch or client.default_branch()
+    blobs = {}
+    initial = {}
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        head = client.head(branch)
+        new_branch = head is None
+        if new_branch:
+            # 브랜치가 없으면 기본 브랜치에서 분기
+            head = client.head(client.default_branch())
+            if head is None:
+                # 빈 저장소: 첫 파일로 기본 브랜치를 만든 뒤 나머지는 Git Data API로 커밋 1개
+                if not files:
+                    raise GitHubError(409, f"빈 저장소에 올릴 파일이 없습니다: {client.repo}")
+                path = sorted(files)[0]
+                if client.create_file(path, files[path], message):
+                    print(f"🆕 빈 저장소 → contents API로 첫 커밋 생성: {path}")
+                    initial[path] = files[path]
+                continue
+        base_tree = client.commit_tree(head)
+        existing = client.tree_blobs(base_tree)
+        changed = {path: content for path, content in files.items() if existing.get(path) != blob_sha(content)}
+        if not changed:
+            # 내용이 같으면 커밋하지 않음 (새 브랜치는 기준 커밋을 가리키게만 함)
+            if new_branch and not client.create_ref(branch, head):
+                continue
+            return _result(client, head, branch, {**initial, **changed}, files, attempt)
+
+        # 재시도 중이면 이미 올린 blob은 다시 올리지 않음
+        pending = [path for path in changed if path not in blobs]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1))) as pool:
+            for path, sha in zip(pending, pool.map(lambda p: client.create_blob(changed[p]), pending)):
+                blobs[path] = sha
+
+        tree_sha = client.create_tree(base_tree, {path: blobs[path] for path in changed})
+        commit_sha = client.create_commit(message, tree_sha, head)
+        updated = client.create_ref(branch, commit_sha) if new_branch else client.update_ref(branch, commit_sha)
+        if updated:
+            return _result(client, commit_sha, branch, {**initial, **changed}, files, attempt)
+        print(f"🔁 {branch} 브랜치가 그 사이 갱신됨 → 새 head 기준으로 다시 커밋 ({attempt}/{MAX_ATTEMPTS})")
+        time.sleep(min(2 ** attempt * 0.1, 2))
+    raise GitHubError(409, f"{branch} ref 갱신 경합 {MAX_ATTEMPTS}회 실패")
+
+
+def read_tree(directory):
+    """디렉터리 → {상대 경로(/ 구분): bytes}"""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            full_path = os.path.join(root, name)
+            with open(full_path, "rb") as f:
+                files[os.path.relpath(full_path, directory).replace("\\", "/")] = f.read()
+    return files
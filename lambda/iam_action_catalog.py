@@ -0,0 +1,410 @@
+# 리소스 타입 → terraform이 호출하는 AWS API 목록 (terraform plan JSON으로 최소 권한 정책을 미리 예측)
+# - 정적 검증 빌드의 plan.json(terraform show -json plan.out)의 resource_changes를 읽어
+#   생성/수정/삭제할 리소스 타입별 API를 합침 → terratest 배포/CloudTrail 전달/Athena 조회 없이 바로 정책 생성
+# - CloudTrail로 관측한 실제 호출(10단계)은 나중에 예측과 비교(diff)해서 카탈로그 누락을 보완하는 검증 용도
+# 카탈로그에 없는 타입은 unknown_types로 보고 (관측 결과로만 채워짐)
+
+# 어떤 리소스든 provider가 호출하는 API / 기존처럼 항상 포함하는 API
+PROVIDER_ACTIONS = {"sts:GetCallerIdentity", "ec2:DescribeAccountAttributes", "ec2:DescribeAvailabilityZones"}
+MANDATORY_ACTIONS = {"ec2:CreateTags", "cloudwatch:PutDashboard", "ec2:DescribeInstanceStatus", "secretsmanager:GetSecretValue"}
+
+# 타입 → {"read": 조회(refresh/plan), "create", "update", "delete"}
+CATALOG = {
+    "aws_vpc": {
+        "read": ["ec2:DescribeVpcs", "ec2:DescribeVpcAttribute", "ec2:DescribeNetworkAcls",
+                 "ec2:DescribeRouteTables", "ec2:DescribeSecurityGroups", "ec2:DescribeSecurityGroupRules"],
+        "create": ["ec2:CreateVpc", "ec2:ModifyVpcAttribute", "ec2:CreateTags"],
+        "update": ["ec2:ModifyVpcAttribute", "ec2:CreateTags", "ec2:DeleteTags"],
+        "delete": ["ec2:DeleteVpc"],
+    },
+    "aws_subnet": {
+        "read": ["ec2:DescribeSubnets"],
+        "create": ["ec2:CreateSubnet", "ec2:ModifySubnetAttribute", "ec2:CreateTags"],
+        "update": ["ec2:ModifySubnetAttribute", "ec2:CreateTags", "ec2:DeleteTags"],
+        "delete": ["ec2:DeleteSubnet"],
+    },
+    "aws_internet_gateway": {
+        "read": ["ec2:DescribeInternetGateways"],
+        "create": ["ec2:CreateInternetGateway", "ec2:AttachInternetGateway", "ec2:CreateTags"],
+        "update": ["ec2:CreateTags", "ec2:DeleteTags"],
+        "delete": ["ec2:DetachInternetGateway", "ec2:DeleteInternetGateway"],
+    },
+    "aws_eip": {
+        "read": ["ec2:DescribeAddresses", "ec2:DescribeAddressesAttribute"],
+        "create": ["ec2:AllocateAddress", "ec2:CreateTags"],
+        "update": ["ec2:CreateTags", "ec2:DeleteTags"],
+        "delete": ["ec2:ReleaseAddress", "ec2:DisassociateAddress"],
+    },
+    "aws_nat_gateway": {
+        "read": ["ec2:DescribeNatGateways"],
+        "create": ["ec2:CreateNatGateway", "ec2:CreateTags"],
+        "update": ["ec2:CreateTags", "ec2:DeleteTags"],
+        "delete": ["ec2:DeleteNatGateway"],
+    },
+    "aws_route_table": {
+        "read": ["ec2:DescribeRouteTables"],
+        "create": ["ec2:CreateRouteTable", "ec2:CreateRoute", "ec2:CreateTags"],
+        "update": ["ec2:CreateRoute", "ec2:ReplaceRoute", "ec2:DeleteRoute", "ec2:CreateTags"],
+        "delete": ["ec2:DeleteRouteTable"],
+    },
+    "aws_route": {
+        "read": ["ec2:DescribeRouteTables"],
+        "create": ["ec2:CreateRoute"],
+        "update": ["ec2:ReplaceRoute"],
+        "delete": ["ec2:DeleteRoute"],
+    },
+    "aws_route_table_association": {
+        "read": ["ec2:DescribeRouteTables"],
+        "create": ["ec2:AssociateRouteTable"],
+        "update": ["ec2:ReplaceRouteTableAssociation"],
+        "delete": ["ec2:DisassociateRouteTable"],
+    },
+    "aws_security_group": {
+        "read": ["ec2:DescribeSecurityGroups", "ec2:DescribeSecurityGroupRules", "ec2:DescribeNetworkInterfaces"],
+        "create": ["ec2:CreateSecurityGroup", "ec2:AuthorizeSecurityGroupIngress", "ec2:AuthorizeSecurityGroupEgress",
+                   "ec2:RevokeSecurityGroupEgress", "ec2:CreateTags"],
+        "update": ["ec2:AuthorizeSecurityGroupIngress", "ec2:AuthorizeSecurityGroupEgress",
+                   "ec2:RevokeSecurityGroupIngress", "ec2:RevokeSecurityGroupEgress", "ec2:CreateTags"],
+        "delete": ["ec2:DeleteSecurityGroup", "ec2:RevokeSecurityGroupIngress", "ec2:RevokeSecurityGroupEgress"],
+    },
+    "aws_security_group_rule": {
+        "read": ["ec2:DescribeSecurityGroups", "ec2:DescribeSecurityGroupRules"],
+        "create": ["ec2:AuthorizeSecurityGroupIngress", "ec2:AuthorizeSecurityGroupEgress"],
+        "update": ["ec2:UpdateSecurityGroupRuleDescriptionsIngress", "ec2:UpdateSecurityGroupRuleDescriptionsEgress"],
+        "delete": ["ec2:RevokeSecurityGroupIngress", "ec2:RevokeSecurityGroupEgress"],
+    },
+    "aws_vpc_security_group_ingress_rule": {
+        "read": ["ec2:DescribeSecurityGroupRules"],
+        "create": ["ec2:AuthorizeSecurityGroupIngress", "ec2:CreateTags"],
+        "update": ["ec2:ModifySecurityGroupRules"],
+        "delete": ["ec2:RevokeSecurityGroupIngress"],
+    },
+    "aws_vpc_security_group_egress_rule": {
+        "read": ["ec2:DescribeSecurityGroupRules"],
+        "create": ["ec2:AuthorizeSecurityGroupEgress", "ec2:CreateTags"],
+        "update": ["ec2:ModifySecurityGroupRules"],
+        "delete": ["ec2:RevokeSecurityGroupEgress"],
+    },
+    "aws_instance": {
+        "read": ["ec2:DescribeInstances", "ec2:DescribeInstanceAttribute", "ec2:DescribeInstanceTypes",
+                 "ec2:DescribeVolumes", "ec2:DescribeInstanceCreditSpecifications", "ec2:DescribeTags"],
+        "create": ["ec2:RunInstances", "ec2:CreateTags", "iam:PassRole"],
+        "update": ["ec2:ModifyInstanceAttribute", "ec2:StopInstances", "ec2:StartInstances", "ec2:CreateTags"],
+        "delete": ["ec2:TerminateInstances"],
+    },
+    "aws_launch_template": {
+        "read": ["ec2:DescribeLaunchTemplates", "ec2:DescribeLaunchTemplateVersions"],
+        "create": ["ec2:CreateLaunchTemplate", "ec2:CreateTags", "iam:PassRole"],
+        "update": ["ec2:CreateLaunchTemplateVersion", "ec2:ModifyLaunchTemplate"],
+        "delete": ["ec2:DeleteLaunchTemplate"],
+    },
+    "aws_autoscaling_group": {
+        "read": ["autoscaling:DescribeAutoScalingGroups", "autoscaling:DescribeScalingActivities",
+                 "autoscaling:DescribeLifecycleHooks", "autoscaling:DescribeWarmPool"],
+        "create": ["autoscaling:CreateAutoScalingGroup", "autoscaling:AttachLoadBalancerTargetGroups",
+                   "autoscaling:CreateOrUpdateTags", "iam:CreateServiceLinkedRole", "ec2:RunInstances", "iam:PassRole"],
+        "update": ["autoscaling:UpdateAutoScalingGroup", "autoscaling:CreateOrUpdateTags",
+                   "autoscaling:AttachLoadBalancerTargetGroups", "autoscaling:DetachLoadBalancerTargetGroups"],
+        "delete": ["autoscaling:DeleteAutoScalingGroup", "autoscaling:UpdateAutoScalingGroup"],
+    },
+    "aws_autoscaling_policy": {
+        "read": ["autoscaling:DescribePolicies"],
+        "create": ["autoscaling:PutScalingPolicy"],
+        "update": ["autoscaling:PutScalingPolicy"],
+        "delete": ["autoscaling:DeletePolicy"],
+    },
+    "aws_lb": {
+        "read": ["elasticloadbalancing:DescribeLoadBalancers", "elasticloadbalancing:DescribeLoadBalancerAttributes",
+                 "elasticloadbalancing:DescribeTags"],
+        "create": ["elasticloadbalancing:CreateLoadBalancer", "elasticloadbalancing:ModifyLoadBalancerAttributes",
+                   "elasticloadbalancing:AddTags", "iam:CreateServiceLinkedRole"],
+        "update": ["elasticloadbalancing:ModifyLoadBalancerAttributes", "elasticloadbalancing:SetSecurityGroups",
+                   "elasticloadbalancing:SetSubnets", "elasticloadbalancing:AddTags"],
+        "delete": ["elasticloadbalancing:DeleteLoadBalancer"],
+    },
+    "aws_lb_target_group": {
+        "read": ["elasticloadbalancing:DescribeTargetGroups", "elasticloadbalancing:DescribeTargetGroupAttributes",
+                 "elasticloadbalancing:DescribeTags"],
+        "create": ["elasticloadbalancing:CreateTargetGroup", "elasticloadbalancing:ModifyTargetGroupAttributes",
+                   "elasticloadbalancing:AddTags"],
+        "update": ["elasticloadbalancing:ModifyTargetGroup", "elasticloadbalancing:ModifyTargetGroupAttributes"],
+        "delete": ["elasticloadbalancing:DeleteTargetGroup"],
+    },
+    "aws_lb_listener": {
+        "read": ["elasticloadbalancing:DescribeListeners", "elasticloadbalancing:DescribeListenerAttributes",
+                 "elasticloadbalancing:DescribeTags"],
+        "create": ["elasticloadbalancing:CreateListener", "elasticloadbalancing:AddTags"],
+        "update": ["elasticloadbalancing:ModifyListener"],
+        "delete": ["elasticloadbalancing:DeleteListener"],
+    },
+    "aws_lb_listener_rule": {
+        "read": ["elasticloadbalancing:DescribeRules", "elasticloadbalancing:DescribeTags"],
+        "create": ["elasticloadbalancing:CreateRule", "elasticloadbalancing:AddTags"],
+        "update": ["elasticloadbalancing:ModifyRule", "elasticloadbalancing:SetRulePriorities"],
+        "delete": ["elasticloadbalancing:DeleteRule"],
+    },
+    "aws_lb_listener_certificate": {
+        "read": ["elasticloadbalancing:DescribeListenerCertificates"],
+        "create": ["elasticloadbalancing:AddListenerCertificates"],
+        "update": [],
+        "delete": ["elasticloadbalancing:RemoveListenerCertificates"],
+    },
+    "aws_lb_target_group_attachment": {
+        "read": ["elasticloadbalancing:DescribeTargetHealth"],
+        "create": ["elasticloadbalancing:RegisterTargets"],
+        "update": [],
+        "delete": ["elasticloadbalancing:DeregisterTargets"],
+    },
+    "aws_db_instance": {
+        "read": ["rds:DescribeDBInstances", "rds:ListTagsForResource"],
+        "create": ["rds:CreateDBInstance", "rds:AddTagsToResource", "iam:CreateServiceLinkedRole"],
+        "update": ["rds:ModifyDBInstance", "rds:AddTagsToResource", "rds:RebootDBInstance"],
+        "delete": ["rds:DeleteDBInstance"],
+    },
+    "aws_db_subnet_group": {
+        "read": ["rds:DescribeDBSubnetGroups", "rds:ListTagsForResource"],
+        "create": ["rds:CreateDBSubnetGroup", "rds:AddTagsToResource"],
+        "update": ["rds:ModifyDBSubnetGroup"],
+        "delete": ["rds:DeleteDBSubnetGroup"],
+    },
+    "aws_db_parameter_group": {
+        "read": ["rds:DescribeDBParameterGroups", "rds:DescribeDBParameters", "rds:ListTagsForResource"],
+        "create": ["rds:CreateDBParameterGroup", "rds:ModifyDBParameterGroup", "rds:AddTagsToResource"],
+        "update": ["rds:ModifyDBParameterGroup", "rds:ResetDBParameterGroup"],
+        "delete": ["rds:DeleteDBParameterGroup"],
+    },
+    "aws_route53_zone": {
+        "read": ["route53:GetHostedZone", "route53:ListTagsForResource", "route53:ListResourceRecordSets"],
+        "create": ["route53:CreateHostedZone", "route53:ChangeTagsForResource", "route53:GetChange"],
+        "update": ["route53:UpdateHostedZoneComment", "route53:ChangeTagsForResource"],
+        "delete": ["route53:DeleteHostedZone", "route53:ChangeResourceRecordSets"],
+    },
+    "aws_route53_record": {
+        "read": ["route53:ListResourceRecordSets", "route53:GetHostedZone"],
+        "create": ["route53:ChangeResourceRecordSets", "route53:GetChange"],
+        "update": ["route53:ChangeResourceRecordSets", "route53:GetChange"],
+        "delete": ["route53:ChangeResourceRecordSets", "route53:GetChange"],
+    },
+    "aws_route53_health_check": {
+        "read": ["route53:GetHealthCheck", "route53:ListTagsForResource"],
+        "create": ["route53:CreateHealthCheck", "route53:ChangeTagsForResource"],
+        "update": ["route53:UpdateHealthCheck"],
+        "delete": ["route53:DeleteHealthCheck"],
+    },
+    "aws_acm_certificate": {
+        "read": ["acm:DescribeCertificate", "acm:ListTagsForCertificate"],
+        "create": ["acm:RequestCertificate", "acm:AddTagsToCertificate"],
+        "update": ["acm:AddTagsToCertificate", "acm:RemoveTagsFromCertificate"],
+        "delete": ["acm:DeleteCertificate"],
+    },
+    "aws_acm_certificate_validation": {
+        "read": ["acm:DescribeCertificate"],
+        "create": ["acm:DescribeCertificate"],
+        "update": [],
+        "delete": [],
+    },
+    "aws_iam_role": {
+        "read": ["iam:GetRole", "iam:ListRolePolicies", "iam:ListAttachedRolePolicies", "iam:ListInstanceProfilesForRole"],
+        "create": ["iam:CreateRole", "iam:TagRole"],
+        "update": ["iam:UpdateRole", "iam:UpdateAssumeRolePolicy", "iam:TagRole"],
+        "delete": ["iam:DeleteRole"],
+    },
+    "aws_iam_policy": {
+        "read": ["iam:GetPolicy", "iam:GetPolicyVersion", "iam:ListPolicyVersions"],
+        "create": ["iam:CreatePolicy", "iam:TagPolicy"],
+        "update": ["iam:CreatePolicyVersion", "iam:DeletePolicyVersion"],
+        "delete": ["iam:DeletePolicy", "iam:ListEntitiesForPolicy"],
+    },
+    "aws_iam_role_policy": {
+        "read": ["iam:GetRolePolicy"],
+        "create": ["iam:PutRolePolicy"],
+        "update": ["iam:PutRolePolicy"],
+        "delete": ["iam:DeleteRolePolicy"],
+    },
+    "aws_iam_role_policy_attachment": {
+        "read": ["iam:ListAttachedRolePolicies"],
+        "create": ["iam:AttachRolePolicy"],
+        "update": [],
+        "delete": ["iam:DetachRolePolicy"],
+    },
+    "aws_iam_instance_profile": {
+        "read": ["iam:GetInstanceProfile"],
+        "create": ["iam:CreateInstanceProfile", "iam:AddRoleToInstanceProfile", "iam:PassRole"],
+        "update": ["iam:AddRoleToInstanceProfile", "iam:RemoveRoleFromInstanceProfile"],
+        "delete": ["iam:RemoveRoleFromInstanceProfile", "iam:DeleteInstanceProfile"],
+    },
+    "aws_s3_bucket": {
+        "read": ["s3:ListBucket", "s3:GetBucketTagging", "s3:GetBucketPolicy", "s3:GetBucketAcl", "s3:GetBucketCORS",
+                 "s3:GetBucketWebsite", "s3:GetBucketVersioning", "s3:GetAccelerateConfiguration",
+                 "s3:GetBucketRequestPayment", "s3:GetBucketLogging", "s3:GetLifecycleConfiguration",
+                 "s3:GetReplicationConfiguration", "s3:GetEncryptionConfiguration", "s3:GetBucketObjectLockConfiguration"],
+        "create": ["s3:CreateBucket", "s3:PutBucketTagging"],
+        "update": ["s3:PutBucketTagging"],
+        "delete": ["s3:DeleteBucket"],
+    },
+    "aws_s3_bucket_versioning": {
+        "read": ["s3:GetBucketVersioning"],
+        "create": ["s3:PutBucketVersioning"],
+        "update": ["s3:PutBucketVersioning"],
+        "delete": ["s3:PutBucketVersioning"],
+    },
+    "aws_s3_bucket_policy": {
+        "read": ["s3:GetBucketPolicy"],
+        "create": ["s3:PutBucketPolicy"],
+        "update": ["s3:PutBucketPolicy"],
+        "delete": ["s3:DeleteBucketPolicy"],
+    },
+    "aws_s3_bucket_public_access_block": {
+        "read": ["s3:GetBucketPublicAccessBlock"],
+        "create": ["s3:PutBucketPublicAccessBlock"],
+        "update": ["s3:PutBucketPublicAccessBlock"],
+        "delete": ["s3:DeleteBucketPublicAccessBlock"],
+    },
+    "aws_s3_bucket_server_side_encryption_configuration": {
+        "read": ["s3:GetEncryptionConfiguration"],
+        "create": ["s3:PutEncryptionConfiguration"],
+        "update": ["s3:PutEncryptionConfiguration"],
+        "delete": ["s3:PutEncryptionConfiguration"],
+    },
+    "aws_cloudwatch_metric_alarm": {
+        "read": ["cloudwatch:DescribeAlarms", "cloudwatch:ListTagsForResource"],
+        "create": ["cloudwatch:PutMetricAlarm", "cloudwatch:TagResource"],
+        "update": ["cloudwatch:PutMetricAlarm"],
+        "delete": ["cloudwatch:DeleteAlarms"],
+    },
+    "aws_cloudwatch_dashboard": {
+        "read": ["cloudwatch:GetDashboard"],
+        "create": ["cloudwatch:PutDashboard"],
+        "update": ["cloudwatch:PutDashboard"],
+        "delete": ["cloudwatch:DeleteDashboards"],
+    },
+    "aws_cloudwatch_log_group": {
+        "read": ["logs:DescribeLogGroups", "logs:ListTagsForResource"],
+        "create": ["logs:CreateLogGroup", "logs:PutRetentionPolicy", "logs:TagResource"],
+        "update": ["logs:PutRetentionPolicy", "logs:TagResource"],
+        "delete": ["logs:DeleteLogGroup"],
+    },
+    "aws_sns_topic": {
+        "read": ["sns:GetTopicAttributes", "sns:ListTagsForResource"],
+        "create": ["sns:CreateTopic", "sns:SetTopicAttributes", "sns:TagResource"],
+        "update": ["sns:SetTopicAttributes"],
+        "delete": ["sns:DeleteTopic"],
+    },
+    "aws_secretsmanager_secret": {
+        "read": ["secretsmanager:DescribeSecret", "secretsmanager:GetResourcePolicy"],
+        "create": ["secretsmanager:CreateSecret", "secretsmanager:TagResource"],
+        "update": ["secretsmanager:UpdateSecret"],
+        "delete": ["secretsmanager:DeleteSecret"],
+    },
+    "aws_secretsmanager_secret_version": {
+        "read": ["secretsmanager:GetSecretValue", "secretsmanager:DescribeSecret"],
+        "create": ["secretsmanager:PutSecretValue"],
+        "update": ["secretsmanager:PutSecretValue", "secretsmanager:UpdateSecretVersionStage"],
+        "delete": ["secretsmanager:UpdateSecretVersionStage"],
+    },
+    "aws_kms_key": {
+        "read": ["kms:DescribeKey", "kms:GetKeyPolicy", "kms:GetKeyRotationStatus", "kms:ListResourceTags"],
+        "create": ["kms:CreateKey", "kms:TagResource"],
+        "update": ["kms:PutKeyPolicy", "kms:EnableKeyRotation", "kms:UpdateKeyDescription"],
+        "delete": ["kms:ScheduleKeyDeletion"],
+    },
+    "aws_dms_replication_instance": {
+        "read": ["dms:DescribeReplicationInstances", "dms:ListTagsForResource"],
+        "create": ["dms:CreateReplicationInstance", "dms:AddTagsToResource", "iam:PassRole"],
+        "update": ["dms:ModifyReplicationInstance"],
+        "delete": ["dms:DeleteReplicationInstance"],
+    },
+    "aws_dms_replication_subnet_group": {
+        "read": ["dms:DescribeReplicationSubnetGroups"],
+        "create": ["dms:CreateReplicationSubnetGroup"],
+        "update": ["dms:ModifyReplicationSubnetGroup"],
+        "delete": ["dms:DeleteReplicationSubnetGroup"],
+    },
+    "aws_dms_endpoint": {
+        "read": ["dms:DescribeEndpoints", "dms:ListTagsForResource"],
+        "create": ["dms:CreateEndpoint", "dms:AddTagsToResource"],
+        "update": ["dms:ModifyEndpoint"],
+        "delete": ["dms:DeleteEndpoint"],
+    },
+    "aws_dms_replication_task": {
+        "read": ["dms:DescribeReplicationTasks", "dms:ListTagsForResource"],
+        "create": ["dms:CreateReplicationTask", "dms:AddTagsToResource"],
+        "update": ["dms:ModifyReplicationTask"],
+        "delete": ["dms:DeleteReplicationTask"],
+    },
+}
+
+# 데이터 소스 (read만)
+DATA_SOURCES = {
+    "aws_ami": ["ec2:DescribeImages"],
+    "aws_availability_zones": ["ec2:DescribeAvailabilityZones"],
+    "aws_caller_identity": ["sts:GetCallerIdentity"],
+    "aws_region": [],
+    "aws_partition": [],
+    "aws_vpc": ["ec2:DescribeVpcs"],
+    "aws_subnet": ["ec2:DescribeSubnets"],
+    "aws_subnets": ["ec2:DescribeSubnets"],
+    "aws_security_group": ["ec2:DescribeSecurityGroups"],
+    "aws_route53_zone": ["route53:ListHostedZones", "route53:GetHostedZone", "route53:ListTagsForResource"],
+    "aws_acm_certificate": ["acm:ListCertificates", "acm:DescribeCertificate"],
+    "aws_iam_policy_document": [],
+    "aws_iam_role": ["iam:GetRole"],
+    "aws_iam_policy": ["iam:GetPolicy", "iam:GetPolicyVersion"],
+    "aws_secretsmanager_secret": ["secretsmanager:DescribeSecret"],
+    "aws_secretsmanager_secret_version": ["secretsmanager:GetSecretValue"],
+    "aws_lb": ["elasticloadbalancing:DescribeLoadBalancers"],
+}
+
+# plan의 change.actions → 카탈로그 항목
+_PHASES = {"create": ("read", "create"), "update": ("read", "update"), "delete": ("read", "delete"),
+           "read": ("read",), "no-op": ("read",)}
+
+
+def predict(plan):
+    """terraform show -json 결과(dict) → {"actions", "unknown_types", "resources"}"""
+    actions, unknown = set(PROVIDER_ACTIONS), set()
+    changes = plan.get("resource_changes", [])
+    for change in changes:
+        type_ = change.get("type", "")
+        if not type_.startswith("aws_"):
+            continue
+        if change.get("mode") == "data":
+            if type_ in DATA_SOURCES:
+                actions.update(DATA_SOURCES[type_])
+            else:
+                unknown.add(f"data.{type_}")
+            continue
+        entry = CATALOG.get(type_)
+        if entry is None:
+            unknown.add(type_)
+            continue
+        for planned in change.get("change", {}).get("actions", ["create"]):
+            for phase in _PHASES.get(planned, ("read",)):
+                actions.update(entry[phase])
+    return {"actions": sorted(actions), "unknown_types": sorted(unknown), "resources": len(changes)}
+
+
+def policy(actions):
+    """10단계와 같은 형태의 정책 문서 (항상 포함하는 API 추가)"""
+    return {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": sorted(set(actions) | MANDATORY_ACTIONS),
+                "Resource": "*"
+            }
+        ]
+    }
+
+
+def diff(predicted, observed):
+    """예측 vs CloudTrail 관측 → {"missing": 관측됐지만 예측에 없음(카탈로그 누락), "unused": 예측했지만 호출 안 됨}"""
+    predicted, observed = set(predicted), set(observed)
+    return {
+        "missing": sorted(observed - predicted),
+        "unused": sorted(predicted - observed),
+        "matched": len(predicted & observed),
+        "precision": round(len(predicted & observed) / len(predicted), 3) if predicted else None,
+        "recall": round(len(predicted & observed) / len(observed), 3) if observed else None
+    }
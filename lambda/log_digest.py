@@ -0,0 +1,125 @@
+import os
+import re
+
+import convergence
+
+# error.log / terratest-output.txt 요약기
+# 1) 스트리밍 스캐너: 로그 전체를 메모리에 올리지 않고 한 줄씩 읽으며 에러 여부, 에러 지문, 실패 마커 위치(byte offset)를 수집
+# 2) Range GET: 로그 끝부분(tail)과 실패 마커 주변 구간만 다시 읽어 크기가 제한된 요약(digest)을 만듦
+DIGEST_MAX_BYTES = int(os.environ.get("LOG_DIGEST_MAX_BYTES", "24000"))
+TAIL_BYTES = int(os.environ.get("LOG_DIGEST_TAIL_BYTES", "6000"))
+WINDOW_BEFORE = 600
+WINDOW_AFTER = 1800
+MAX_WINDOWS = 20
+CHUNK_SIZE = 64 * 1024
+
+MARKER = re.compile(r"error|fail|panic|timeout|timed out", re.IGNORECASE)
+
+
+def iter_lines(body, chunk_size=CHUNK_SIZE):
+    """StreamingBody에서 (시작 byte offset, 줄) 을 순서대로 반환"""
+    offset = 0
+    pending = b""
+    for chunk in iter(lambda: body.read(chunk_size), b""):
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for raw in lines:
+            yield offset, raw.decode("utf-8", errors="replace")
+            offset += len(raw) + 1
+    if pending:
+        yield offset, pending.decode("utf-8", errors="replace")
+
+
+def scan(s3, bucket, key, ignore=()):
+    """로그를 스트리밍으로 한 번 읽어 요약에 필요한 정보만 반환
+
+    has_error는 기존 판단과 같게 "error" 문자열 포함 여부 (ignore에 있는 문자열이 들어간 줄은 제외)
+    """
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    result = {
+        "bucket": bucket,
+        "key": key,
+        "size": obj["ContentLength"],
+        "has_error": False,
+        "markers": [],
+        "fingerprints": []
+    }
+    seen = set()
+
+    def _lines():
+        for offset, line in iter_lines(obj["Body"]):
+            lower = line.lower()
+            if any(word in lower for word in ignore):
+                continue
+            if "error" in lower:
+                result["has_error"] = True
+            if MARKER.search(line):
+                # 같은 메시지가 반복되면 첫 위치만 기록
+                normalized = convergence.normalize_line(line)
+                if normalized not in seen and len(result["markers"]) < MAX_WINDOWS:
+                    seen.add(normalized)
+                    result["markers"].append(offset)
+            yield line
+
+    result["fingerprints"] = convergence.error_fingerprints(_lines())
+    return result
+
+
+def read_range(s3, bucket, key, start, end):
+    """[start, end] 구간(byte)을 읽어 문자열로 반환"""
+    obj = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+    return obj["Body"].read().decode("utf-8", errors="replace")
+
+
+def _trim_to_lines(text, start, end, size):
+    # 구간 경계에서 잘린 줄은 버림 (파일 시작/끝은 그대로)
+    if start > 0 and "\n" in text:
+        text = text.split("\n", 1)[1]
+    if end < size - 1 and "\n" in text:
+        text = text.rsplit("\n", 1)[0]
+    return text
+
+
+def _windows(markers, size):
+    windows = []
+    for offset in sorted(markers):
+        start = max(0, offset - WINDOW_BEFORE)
+        end = min(size - 1, offset + WINDOW_AFTER)
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return windows
+
+
+def digest(s3, scan_result, max_bytes=DIGEST_MAX_BYTES, tail_bytes=TAIL_BYTES):
+    """실패 마커 주변 구간 + 로그 끝부분으로 max_bytes 이하의 요약 문자열 생성"""
+    bucket, key, size = scan_result["bucket"], scan_result["key"], scan_result["size"]
+    if size == 0:
+        return ""
+    if size <= max_bytes:
+        return read_range(s3, bucket, key, 0, size - 1)
+
+    tail_start = max(0, size - tail_bytes)
+    budget = max_bytes - (size - tail_start)
+    parts = []
+    last_end = -1
+    for start, end in _windows(scan_result["markers"], size):
+        if start >= tail_start:
+            break
+        end = min(end, tail_start - 1)
+        if end - start + 1 > budget:
+            end = start + budget - 1
+        if end <= start:
+            break
+        if start > last_end + 1:
+            parts.append(f"... ({start - last_end - 1} bytes 생략) ...")
+        parts.append(_trim_to_lines(read_range(s3, bucket, key, start, end), start, end, size))
+        budget -= end - start + 1
+        last_end = end
+
+    if tail_start > last_end + 1:
+        parts.append(f"... ({tail_start - last_end - 1} bytes 생략) ...")
+    parts.append(_trim_to_lines(read_range(s3, bucket, key, tail_start, size - 1), tail_start, size - 1, size))
+    return "\n".join(parts)
@@ -0,0 +1,98 @@
+import os
+
+# CodeBuild 빌드 간 Terraform provider / tflint plugin 캐시 공유
+# 캐시 키는 생성된 .terraform.lock.hcl의 해시, 캐시 저장소는 S3 (벤치마크에서는 로컬 디렉터리)
+PLUGIN_CACHE_URI = os.environ.get("PLUGIN_CACHE_URI", "s3://terraform-artifacts-bucket-12/plugin-cache")
+PLUGIN_CACHE_ROOT = "/root/.plugin-cache"
+SCRIPT_NAME = "plugin_cache.sh"
+
+SCRIPT = r"""#!/bin/sh
+# 사용법: sh plugin_cache.sh restore|save [terraform 디렉터리]
+#  - restore: provider 제약조건별로 저장된 lock 파일을 가져오고, lock 해시에 해당하는 plugin 묶음을 풀어둠
+#  - save   : init 후 생성된 lock 파일 기준으로 plugin 묶음이 없으면 업로드
+set -u
+MODE="$1"
+TF_DIR="${2:-.}"
+CACHE_URI="${PLUGIN_CACHE_URI:?PLUGIN_CACHE_URI is required}"
+ROOT="${PLUGIN_CACHE_ROOT:-$HOME/.plugin-cache}"
+LOCK="$TF_DIR/.terraform.lock.hcl"
+mkdir -p "$ROOT/terraform" "$ROOT/tflint"
+
+cache_get() {
+  case "$1" in
+    s3://*) aws s3 cp --only-show-errors "$1" "$2" 2>/dev/null ;;
+    *) [ -f "$1" ] && cp "$1" "$2" ;;
+  esac
+}
+
+cache_put() {
+  case "$2" in
+    s3://*) aws s3 cp --only-show-errors "$1" "$2" ;;
+    *) mkdir -p "$(dirname "$2")" && cp "$1" "$2" ;;
+  esac
+}
+
+cache_has() {
+  case "$1" in
+    s3://*) aws s3 ls "$1" >/dev/null 2>&1 ;;
+    *) [ -f "$1" ] ;;
+  esac
+}
+
+# required_providers의 source/version 조합 → lock 파일 조회 키
+constraint_key() {
+  grep -hE '^[[:space:]]*(source|version)[[:space:]]*=' "$TF_DIR"/*.tf 2>/dev/null \
+    | tr -d ' \t' | sort -u | sha256sum | cut -c1-16
+}
+
+lock_key() {
+  sha256sum "$LOCK" | cut -c1-16
+}
+
+case "$MODE" in
+  restore)
+    CONSTRAINT=$(constraint_key)
+    if [ ! -f "$LOCK" ]; then
+      cache_get "$CACHE_URI/locks/$CONSTRAINT/.terraform.lock.hcl" "$LOCK" || true
+    fi
+    if [ -f "$LOCK" ] && cache_get "$CACHE_URI/plugins/$(lock_key).tar.gz" /tmp/plugin-cache.tar.gz; then
+      tar xzf /tmp/plugin-cache.tar.gz -C "$ROOT"
+      echo "plugin_cache=hit key=$(lock_key)"
+    else
+      echo "plugin_cache=miss constraint=$CONSTRAINT"
+    fi
+    ;;
+  save)
+    [ -f "$LOCK" ] || { echo "plugin_cache=skip (no lock file)"; exit 0; }
+    CONSTRAINT=$(constraint_key)
+    KEY=$(lock_key)
+    if ! cache_has "$CACHE_URI/plugins/$KEY.tar.gz"; then
+      tar czf /tmp/plugin-cache.tar.gz -C "$ROOT" terraform tflint
+      cache_put /tmp/plugin-cache.tar.gz "$CACHE_URI/plugins/$KEY.tar.gz"
+      echo "plugin_cache=saved key=$KEY"
+    fi
+    if ! cache_has "$CACHE_URI/locks/$CONSTRAINT/.terraform.lock.hcl"; then
+      cache_put "$LOCK" "$CACHE_URI/locks/$CONSTRAINT/.terraform.lock.hcl"
+    fi
+    ;;
+  *)
+    echo "usage: $0 restore|save [terraform dir]" >&2
+    exit 2
+    ;;
+esac
+exit 0
+"""
+
+
+def script():
+    return SCRIPT
+
+
+def env_variables():
+    """buildspec env.variables에 넣을 값"""
+    return {
+        "PLUGIN_CACHE_URI": PLUGIN_CACHE_URI,
+        "PLUGIN_CACHE_ROOT": PLUGIN_CACHE_ROOT,
+        "TF_PLUGIN_CACHE_DIR": f"{PLUGIN_CACHE_ROOT}/terraform",
+        "TFLINT_PLUGIN_DIR": f"{PLUGIN_CACHE_ROOT}/tflint"
+    }
@@ -0,0 +1,336 @@
+import functools
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+# terratest apply 전 사전 점검 (수 초 안에 실패 판정)
+# 1) 생성된 HCL에서 리소스 타입별 생성 개수와 고정 이름(계정/전역 유일)을 정규식으로 추출
+# 2) 계정 한도(Service Quotas) - 현재 사용량 < 새로 만들 개수 이면 한도 초과
+# 3) 고정 이름이 이미 존재하면 이름 충돌 (같은 tfstate가 관리 중인 리소스는 재적용이므로 제외)
+# AWS 조회는 어댑터로 분리: AwsAdapter(실제 계정) / LocalAdapter(고정 값, 로컬 실행용)
+
+# 리소스 타입 → (Service Quotas 서비스 코드, 쿼터 코드, 쿼터 조회 실패 시 기본값)
+QUOTAS = {
+    "aws_vpc": ("vpc", "L-F678F1CE", 5),
+    "aws_internet_gateway": ("vpc", "L-A4707A72", 5),
+    "aws_eip": ("ec2", "L-0263D0A3", 5),
+    "aws_nat_gateway": ("vpc", "L-FE5A380F", 5),
+    "aws_lb": ("elasticloadbalancing", "L-53DA6B97", 50),
+    "aws_db_instance": ("rds", "L-7B6409FD", 40),
+}
+# 리전 전체가 아니라 가용 영역마다 적용되는 한도 (NAT 게이트웨이: AZ당 5개)
+# 새 리소스가 어느 AZ에 생길지는 정적으로 알 수 없으므로, AZ별 남은 여유의 합보다 많이 만들 때만 실패 처리
+PER_AZ_QUOTAS = {"aws_nat_gateway"}
+
+# 이름이 계정(또는 전역) 안에서 유일해야 하는 리소스 → 이름 속성
+UNIQUE_NAMES = {
+    "aws_iam_role": "name",
+    "aws_iam_policy": "name",
+    "aws_iam_instance_profile": "name",
+    "aws_s3_bucket": "bucket",
+    "aws_db_instance": "identifier",
+    "aws_db_subnet_group": "name",
+    "aws_db_parameter_group": "name",
+    "aws_lb": "name",
+    "aws_lb_target_group": "name",
+}
+
+_RESOURCE = re.compile(r'^\s*resource\s+"([\w-]+)"\s+"([\w-]+)"\s*\{', re.MULTILINE)
+_COUNT = re.compile(r"^\s*count\s*=\s*(\d+)\s*$", re.MULTILINE)
+_DYNAMIC_COUNT = re.compile(r"^\s*(count|for_each)\s*=", re.MULTILINE)
+
+
+def _block_body(code, start):
+    """start 위치의 '{'부터 짝이 맞는 '}'까지 (문자열 안의 괄호는 무시)"""
+    depth, i, in_string = 0, start, False
+    while i < len(code):
+        ch = code[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return code[start + 1:i]
+        i += 1
+    return code[start + 1:]
+
+
+def _top_level(body):
+    """중첩 블록을 뺀 최상위 속성 줄만"""
+    lines, depth = [], 0
+    for line in body.splitlines():
+        if depth == 0:
+            lines.append(line)
+        depth += line.count("{") - line.count("}")
+    return "\n".join(lines)
+
+
+def analyze(code):
+    """HCL → {"counts": {타입: 개수}, "names": [(타입, 주소, 이름)], "uncertain": [주소]}"""
+    counts, names, uncertain = {}, [], []
+    for match in _RESOURCE.finditer(code):
+        type_, name = match.groups()
+        body = _top_level(_block_body(code, match.end() - 1))
+        address = f"{type_}.{name}"
+
+        count = 1
+        literal = _COUNT.search(body)
+        if literal:
+            count = int(literal.group(1))
+        elif _DYNAMIC_COUNT.search(body):
+            # count = var.x ? 1 : 0, for_each 등 정적으로 알 수 없는 경우 1개로 보고 표시만 함
+            uncertain.append(address)
+        counts[type_] = counts.get(type_, 0) + count
+
+        attribute = UNIQUE_NAMES.get(type_)
+        if attribute and count:
+            fixed = re.search(rf'^\s*{attribute}\s*=\s*"([^"$]+)"\s*$', body, re.MULTILINE)
+            if fixed:
+                names.append((type_, address, fixed.group(1)))
+    return {"counts": counts, "names": names, "uncertain": uncertain}
+
+
+def state_resources(state):
+    """tfstate(dict) → ({타입: 개수}, {(타입, 이름)}) 이미 이 state가 관리 중인 리소스"""
+    counts, names = {}, set()
+    for resource in (state or {}).get("resources", []):
+        if resource.get("mode") != "managed":
+            continue
+        type_ = resource["type"]
+        instances = resource.get("instances", [])
+        counts[type_] = counts.get(type_, 0) + len(instances)
+        attribute = UNIQUE_NAMES.get(type_)
+        for instance in instances:
+            value = instance.get("attributes", {}).get(attribute) if attribute else None
+            if value:
+                names.add((type_, value))
+    return counts, names
+
+
+class LocalAdapter:
+    """사용량/한도/기존 이름을 직접 넣어 쓰는 어댑터 (AWS 호출 없음)"""
+
+    def __init__(self, usage=None, quotas=None, existing=(), zones=("ap-northeast-2a", "ap-northeast-2c")):
+        # AZ별 한도 타입의 usage는 {AZ: 개수}
+        self._usage = usage or {}
+        self._quotas = quotas or {}
+        self._existing = set(existing)
+        self._zones = zones
+
+    def usage(self, type_):
+        value = self._usage.get(type_, 0)
+        return sum(value.values()) if isinstance(value, dict) else value
+
+    def usage_by_az(self, type_):
+        value = self._usage.get(type_, {})
+        return {zone: value.get(zone, 0) for zone in set(self._zones) | set(value)}
+
+    def quota(self, type_):
+        return self._quotas.get(type_, QUOTAS[type_][2])
+
+    def exists(self, type_, name):
+        return (type_, name) in self._existing
+
+
+class AwsAdapter:
+    def __init__(self, region="ap-northeast-2"):
+        self.region = region
+        self.ec2 = boto3.client("ec2", region_name=region)
+        self.rds = boto3.client("rds", region_name=region)
+        self.elbv2 = boto3.client("elbv2", region_name=region)
+        self.iam = boto3.client("iam")
+        self.s3 = boto3.client("s3")
+        self.quotas = boto3.client("service-quotas", region_name=region)
+        self._account = None
+
+    def _count(self, client, operation, key, **kwargs):
+        total = 0
+        for page in client.get_paginator(operation).paginate(**kwargs):
+            total += len(page[key])
+        return total
+
+    def usage(self, type_):
+        if type_ == "aws_vpc":
+            return self._count(self.ec2, "describe_vpcs", "Vpcs")
+        if type_ == "aws_internet_gateway":
+            return self._count(self.ec2, "describe_internet_gateways", "InternetGateways")
+        if type_ == "aws_eip":
+            return len(self.ec2.describe_addresses(Filters=[{"Name": "domain", "Values": ["vpc"]}])["Addresses"])
+        if type_ in PER_AZ_QUOTAS:
+            return sum(self.usage_by_az(type_).values())
+        if type_ == "aws_lb":
+            return self._count(self.elbv2, "describe_load_balancers", "LoadBalancers")
+        if type_ == "aws_db_instance":
+            return self._count(self.rds, "describe_db_instances", "DBInstances")
+        return 0
+
+    def usage_by_az(self, type_):
+        """AZ별 한도 타입의 {AZ: 개수} (사용 중인 리소스가 없는 AZ는 0)"""
+        zones = self.ec2.describe_availability_zones(
+            Filters=[{"Name": "zone-type", "Values": ["availability-zone"]}]
+        )["AvailabilityZones"]
+        counts = {zone["ZoneName"]: 0 for zone in zones if zone["State"] == "available"}
+        if type_ != "aws_nat_gateway":
+            return counts
+        subnet_ids = []
+        for page in self.ec2.get_paginator("describe_nat_gateways").paginate(
+            Filters=[{"Name": "state", "Values": ["pending", "available"]}]
+        ):
+            subnet_ids += [gateway["SubnetId"] for gateway in page["NatGateways"]]
+        if not subnet_ids:
+            return counts
+        subnet_zones = {}
+        for page in self.ec2.get_paginator("describe_subnets").paginate(
+            Filters=[{"Name": "subnet-id", "Values": sorted(set(subnet_ids))}]
+        ):
+            subnet_zones.update({subnet["SubnetId"]: subnet["AvailabilityZone"] for subnet in page["Subnets"]})
+        for subnet_id in subnet_ids:
+            zone = subnet_zones.get(subnet_id)
+            if zone:
+                counts[zone] = counts.get(zone, 0) + 1
+        return counts
+
+    def quota(self, type_):
+        service, code, default = QUOTAS[type_]
+        try:
+            return int(self.quotas.get_service_quota(ServiceCode=service, QuotaCode=code)["Quota"]["Value"])
+        except Exception:
+            try:
+                return int(self.quotas.get_aws_default_service_quota(ServiceCode=service, QuotaCode=code)["Quota"]["Value"])
+            except Exception:
+                return default
+
+    def _account_id(self):
+        if self._account is None:
+            self._account = boto3.client("sts").get_caller_identity()["Account"]
+        return self._account
+
+    def exists(self, type_, name):
+        try:
+            if type_ == "aws_iam_role":
+                self.iam.get_role(RoleName=name)
+            elif type_ == "aws_iam_policy":
+                self.iam.get_policy(PolicyArn=f"arn:aws:iam::{self._account_id()}:policy/{name}")
+            elif type_ == "aws_iam_instance_profile":
+                self.iam.get_instance_profile(InstanceProfileName=name)
+            elif type_ == "aws_s3_bucket":
+                self.s3.head_bucket(Bucket=name)
+            elif type_ == "aws_db_instance":
+                self.rds.describe_db_instances(DBInstanceIdentifier=name)
+            elif type_ == "aws_db_subnet_group":
+                self.rds.describe_db_subnet_groups(DBSubnetGroupName=name)
+            elif type_ == "aws_db_parameter_group":
+                self.rds.describe_db_parameter_groups(DBParameterGroupName=name)
+            elif type_ == "aws_lb":
+                self.elbv2.describe_load_balancers(Names=[name])
+            elif type_ == "aws_lb_target_group":
+                self.elbv2.describe_target_groups(Names=[name])
+            else:
+                return False
+        except Exception as e:
+            code = getattr(e, "response", {}).get("Error", {}).get("Code", "")
+            # S3 버킷 이름은 전역: 다른 계정 소유(403)여도 사용할 수 없음
+            if type_ == "aws_s3_bucket" and code in ("403", "Forbidden"):
+                return True
+            if code in ("NoSuchEntity", "404", "NoSuchBucket", "NotFound", "DBInstanceNotFound",
+                        "DBSubnetGroupNotFoundFault", "DBParameterGroupNotFound", "LoadBalancerNotFound",
+                        "TargetGroupNotFound"):
+                return False
+            raise
+        return True
+
+
+def run(code, adapter, state=None, skip_types=()):
+    """사전 점검 실행 → {"ok", "problems", "diagnostic"}
+
+    skip_types: 이미 준비된 스택(웜 풀 등)이 대신 제공해서 새로 만들지 않는 리소스 타입
+    """
+    plan = analyze(code)
+    managed_counts, managed_names = state_resources(state)
+
+    def _quota(type_):
+        new = plan["counts"].get(type_, 0) - managed_counts.get(type_, 0)
+        if new <= 0 or type_ in skip_types:
+            return None
+        if type_ in PER_AZ_QUOTAS:
+            return _zone_quota(type_, new)
+        used, limit = adapter.usage(type_), adapter.quota(type_)
+        if used + new > limit:
+            return {
+                "kind": "quota", "resource_type": type_, "requested": new, "in_use": used, "limit": limit,
+                "message": f"{type_}: 새로 {new}개 필요, 현재 {used}/{limit} 사용 중 → 한도 {used + new - limit}개 초과. "
+                           f"사용하지 않는 {type_} 정리 또는 Service Quotas({QUOTAS[type_][0]} {QUOTAS[type_][1]}) 증설 필요"
+            }
+        return None
+
+    def _zone_quota(type_, new):
+        by_az, limit = adapter.usage_by_az(type_), adapter.quota(type_)
+        headroom = sum(max(0, limit - used) for used in by_az.values())
+        if new <= headroom:
+            return None
+        busy = ", ".join(f"{zone} {used}/{limit}" for zone, used in sorted(by_az.items()))
+        return {
+            "kind": "quota", "resource_type": type_, "requested": new, "in_use": sum(by_az.values()), "limit": limit,
+            "message": f"{type_}: 새로 {new}개 필요, AZ당 한도 {limit}개 기준 남은 여유 {headroom}개 ({busy}). "
+                       f"사용하지 않는 {type_} 정리 또는 Service Quotas({QUOTAS[type_][0]} {QUOTAS[type_][1]}) 증설 필요"
+        }
+
+    def _name(item):
+        type_, address, name = item
+        if (type_, name) in managed_names or not adapter.exists(type_, name):
+            return None
+        return {
+            "kind": "name", "resource_type": type_, "address": address, "name": name,
+            "message": f'{address}: 이름 "{name}" 이(가) 계정에 이미 존재함. '
+                       f"이름을 서비스별로 바꾸거나(접두어 추가) 기존 리소스를 terraform import 해야 함"
+        }
+
+    warnings = []
+
+    def _safe(check, item):
+        # 권한 부족 / 스로틀링 등 조회 실패는 해당 항목만 건너뜀 (사전 점검은 참고용이라 배포를 막지 않음)
+        try:
+            return check(item)
+        except Exception as e:
+            warnings.append(f"{item if isinstance(item, str) else item[1]}: 조회 실패로 점검 생략 ({e})")
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = (list(pool.map(lambda t: _safe(_quota, t), QUOTAS))
+                   + list(pool.map(lambda n: _safe(_name, n), plan["names"])))
+    problems = [p for p in results if p]
+
+    lines = [f"❌ 사전 점검 실패 ({len(problems)}건)"] + [f"- {p['message']}" for p in problems]
+    if plan["uncertain"]:
+        lines.append(f"(count/for_each로 개수를 정적으로 알 수 없어 1개로 계산: {', '.join(plan['uncertain'])})")
+    for warning in warnings:
+        print(f"⚠️ 사전 점검 {warning}")
+    return {
+        "ok": not problems,
+        "problems": problems,
+        "warnings": warnings,
+        "counts": plan["counts"],
+        "diagnostic": "\n".join(lines) if problems else "✅ 사전 점검 통과"
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def aws_adapter(region="ap-northeast-2"):
+    """웜 컨테이너에서는 클라이언트를 다시 만들지 않음"""
+    return AwsAdapter(region)
+
+
+def load_state(s3, bucket, key):
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+    except s3.exceptions.ClientError:
+        return None
@@ -0,0 +1,418 @@
+import datetime
+import json
+import os
+import time
+import uuid
+
+# terratest용 기본 네트워크 스택 웜 풀
+# - VPC / 서브넷 6개 / NAT 2개(+EIP) / DNS 검증 ACM 인증서를 미리 apply 해둔 스택을 N개 유지
+#   (호스팅 영역은 새로 만들면 위임이 안 돼 인증서 검증이 끝나지 않으므로 위임된 기존 영역을 조회해서 사용)
+# - 6단계가 READY 스택 하나를 임대(lease)하고, 생성 코드는 pool_* 오버라이드 변수로 그 스택에 붙어서 배포
+# - 빌드가 끝나면 7단계가 반납(release) → 관리 람다가 테스트 리소스만 destroy 후 다시 READY로 돌림
+# - 스택 상태는 S3 객체 하나(stack-pool/stacks/{stack_id}.json)에 두고 If-Match 조건부 쓰기로 동시 임대를 막음
+#
+# 상태 전이: PROVISIONING → READY → LEASED → RECLAIMING → READY (destroy 실패 시 BROKEN)
+POOL_ENABLED = os.environ.get("STACK_POOL_ENABLED", "false").lower() == "true"
+POOL_BUCKET = os.environ.get("STACK_POOL_BUCKET", "terraform-artifacts-bucket-12")
+POOL_PREFIX = "stack-pool"
+POOL_SIZE = int(os.environ.get("STACK_POOL_SIZE", "2"))
+# 임대 후 이 시간이 지나도 반납되지 않으면(람다 중단 등) 강제로 회수
+LEASE_TIMEOUT_SECONDS = int(os.environ.get("STACK_POOL_LEASE_TIMEOUT", str(6 * 3600)))
+MAX_EVENTS = 50
+
+PROVISIONING = "PROVISIONING"
+READY = "READY"
+LEASED = "LEASED"
+RECLAIMING = "RECLAIMING"
+BROKEN = "BROKEN"
+
+OVERRIDE_FILE = "pool_override.auto.tfvars.json"
+
+# 생성 코드가 풀 스택에 붙을 때 쓰는 변수 (기본값 null/[] 이면 기존처럼 직접 생성)
+OVERRIDE_VARIABLES = {
+    "pool_vpc_id": "vpc_id",
+    "pool_public_subnet_ids": "public_subnet_ids",
+    "pool_app_subnet_ids": "app_subnet_ids",
+    "pool_db_subnet_ids": "db_subnet_ids",
+    "pool_zone_id": "zone_id",
+    "pool_certificate_arn": "certificate_arn"
+}
+
+BASE_STACK_TF = """
+terraform {
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 6.0"
+    }
+  }
+}
+
+provider "aws" {
+  region = var.region
+}
+
+variable "region" {
+  default = "ap-northeast-2"
+}
+
+variable "domain_name" {
+  default = "bboaws.shop"
+}
+
+variable "stack_id" {}
+
+data "aws_availability_zones" "available" {
+  state = "available"
+}
+
+locals {
+  azs  = slice(data.aws_availability_zones.available.names, 0, 2)
+  tags = { StackPool = var.stack_id }
+}
+
+resource "aws_vpc" "pool" {
+  cidr_block           = "10.0.0.0/16"
+  enable_dns_support   = true
+  enable_dns_hostnames = true
+  tags                 = merge(local.tags, { Name = "pool-${var.stack_id}" })
+}
+
+resource "aws_internet_gateway" "pool" {
+  vpc_id = aws_vpc.pool.id
+  tags   = local.tags
+}
+
+resource "aws_subnet" "public" {
+  count                   = 2
+  vpc_id                  = aws_vpc.pool.id
+  cidr_block              = cidrsubnet(aws_vpc.pool.cidr_block, 8, count.index)
+  availability_zone       = local.azs[count.index]
+  map_public_ip_on_launch = true
+  tags                    = merge(local.tags, { Name = "pool-public-${count.index}" })
+}
+
+resource "aws_subnet" "app" {
+  count             = 2
+  vpc_id            = aws_vpc.pool.id
+  cidr_block        = cidrsubnet(aws_vpc.pool.cidr_block, 8, 10 + count.index)
+  availability_zone = local.azs[count.index]
+  tags              = merge(local.tags, { Name = "pool-app-${count.index}" })
+}
+
+resource "aws_subnet" "db" {
+  count             = 2
+  vpc_id            = aws_vpc.pool.id
+  cidr_block        = cidrsubnet(aws_vpc.pool.cidr_block, 8, 20 + count.index)
+  availability_zone = local.azs[count.index]
+  tags              = merge(local.tags, { Name = "pool-db-${count.index}" })
+}
+
+resource "aws_eip" "nat" {
+  count  = 2
+  domain = "vpc"
+  tags   = local.tags
+}
+
+resource "aws_nat_gateway" "pool" {
+  count         = 2
+  allocation_id = aws_eip.nat[count.index].id
+  subnet_id     = aws_subnet.public[count.index].id
+  tags          = local.tags
+  depends_on    = [aws_internet_gateway.pool]
+}
+
+resource "aws_route_table" "public" {
+  vpc_id = aws_vpc.pool.id
+  route {
+    cidr_block = "0.0.0.0/0"
+    gateway_id = aws_internet_gateway.pool.id
+  }
+  tags = local.tags
+}
+
+resource "aws_route_table_association" "public" {
+  count          = 2
+  subnet_id      = aws_subnet.public[count.index].id
+  route_table_id = aws_route_table.public.id
+}
+
+resource "aws_route_table" "app" {
+  count  = 2
+  vpc_id = aws_vpc.pool.id
+  route {
+    cidr_block     = "0.0.0.0/0"
+    nat_gateway_id = aws_nat_gateway.pool[count.index].id
+  }
+  tags = local.tags
+}
+
+resource "aws_route_table_association" "app" {
+  count          = 2
+  subnet_id      = aws_subnet.app[count.index].id
+  route_table_id = aws_route_table.app[count.index].id
+}
+
+data "aws_route53_zone" "pool" {
+  name         = var.domain_name
+  private_zone = false
+}
+
+resource "aws_acm_certificate" "pool" {
+  domain_name               = var.domain_name
+  subject_alternative_names = ["*.${var.domain_name}"]
+  validation_method         = "DNS"
+  tags                      = local.tags
+  lifecycle {
+    create_before_destroy = true
+  }
+}
+
+resource "aws_route53_record" "validation" {
+  for_each = {
+    for dvo in aws_acm_certificate.pool.domain_validation_options : dvo.domain_name => dvo
+  }
+  zone_id         = data.aws_route53_zone.pool.zone_id
+  name            = each.value.resource_record_name
+  type            = each.value.resource_record_type
+  records         = [each.value.resource_record_value]
+  ttl             = 60
+  allow_overwrite = true
+}
+
+resource "aws_acm_certificate_validation" "pool" {
+  certificate_arn         = aws_acm_certificate.pool.arn
+  validation_record_fqdns = [for r in aws_route53_record.validation : r.fqdn]
+}
+
+output "vpc_id" {
+  value = aws_vpc.pool.id
+}
+
+output "public_subnet_ids" {
+  value = aws_subnet.public[*].id
+}
+
+output "app_subnet_ids" {
+  value = aws_subnet.app[*].id
+}
+
+output "db_subnet_ids" {
+  value = aws_subnet.db[*].id
+}
+
+output "zone_id" {
+  value = data.aws_route53_zone.pool.zone_id
+}
+
+output "certificate_arn" {
+  value = aws_acm_certificate_validation.pool.certificate_arn
+}
+"""
+
+# 3단계 프롬프트에 덧붙이는 규칙 (풀 사용 시에만)
+PROMPT_RULES = """
+9. Base Network Override Variables
+In variables.tf, also declare these variables exactly (one argument per line):
+variable "pool_vpc_id" {{
+  type    = string
+  default = null
+}}
+
+variable "pool_public_subnet_ids" {{
+  type    = list(string)
+  default = []
+}}
+
+variable "pool_app_subnet_ids" {{
+  type    = list(string)
+  default = []
+}}
+
+variable "pool_db_subnet_ids" {{
+  type    = list(string)
+  default = []
+}}
+
+variable "pool_zone_id" {{
+  type    = string
+  default = null
+}}
+
+variable "pool_certificate_arn" {{
+  type    = string
+  default = null
+}}
+
+When pool_vpc_id is not null, the VPC, internet gateway, subnets, NAT gateways, EIPs and their route tables already exist:
+- Add `count = var.pool_vpc_id == null ? 1 : 0` (or the matching for_each guard) to those resources
+- Reference them only through locals, e.g. `local.vpc_id = var.pool_vpc_id != null ? var.pool_vpc_id : aws_vpc.{service}_vpc[0].id`,
+  and likewise local.public_subnet_ids, local.app_subnet_ids, local.db_subnet_ids
+When pool_zone_id is not null, do not create aws_route53_zone; use `local.zone_id` instead (the hosted zone rule above applies only when pool_zone_id is null).
+When pool_certificate_arn is not null, do not create the ACM certificate or its validation records; use `local.certificate_arn` in the HTTPS listener.
+"""
+
+
+def _now():
+    return time.time()
+
+
+def _key(stack_id):
+    return f"{POOL_PREFIX}/stacks/{stack_id}.json"
+
+
+def state_key(stack_id):
+    return f"{POOL_PREFIX}/stacks/{stack_id}/terraform.tfstate"
+
+
+def lease_bundle_key(stack_id):
+    return f"{POOL_PREFIX}/stacks/{stack_id}/lease.zip"
+
+
+def prompt_rules(service_name):
+    return PROMPT_RULES.format(service=service_name)
+
+
+def supports_override(code):
+    """생성 코드가 풀 오버라이드 변수를 선언했는지 (선언이 없으면 임대해도 쓸 수 없음)"""
+    return all(f'variable "{name}"' in code for name in OVERRIDE_VARIABLES)
+
+
+def override_variables(record):
+    outputs = record["outputs"]
+    return {name: outputs[output] for name, output in OVERRIDE_VARIABLES.items()}
+
+
+def record_event(record, event, seconds=None):
+    record.setdefault("events", []).append({
+        "event": event,
+        "at": datetime.datetime.utcnow().isoformat() + "Z",
+        "seconds": None if seconds is None else round(seconds, 1)
+    })
+    del record["events"][:-MAX_EVENTS]
+
+
+# --- 🔧 S3 상태 저장 (조건부 쓰기) ---
+def _put(s3, record, etag=None):
+    """etag가 있으면 If-Match, 없으면 새 객체(If-None-Match) 조건부 쓰기. 경합에 지면 False"""
+    condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        s3.put_object(
+            Bucket=POOL_BUCKET, Key=_key(record["stack_id"]),
+            Body=json.dumps(record).encode("utf-8"), ContentType="application/json", **condition
+        )
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return False
+        raise
+    return True
+
+
+def load(s3, stack_id):
+    try:
+        obj = s3.get_object(Bucket=POOL_BUCKET, Key=_key(stack_id))
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return json.loads(obj["Body"].read()), obj["ETag"]
+
+
+def list_stacks(s3):
+    """[(record, etag)] (스택 상태 객체만, 하위 번들/state 파일은 제외)"""
+    stacks = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=POOL_BUCKET, Prefix=f"{POOL_PREFIX}/stacks/", Delimiter="/"):
+        for item in page.get("Contents", []):
+            record, etag = load(s3, item["Key"].rsplit("/", 1)[-1][:-len(".json")])
+            if record is not None:
+                stacks.append((record, etag))
+    return stacks
+
+
+def transition(s3, record, etag, status, event=None, seconds=None, **fields):
+    record = dict(record, status=status, updated_at=_now(), **fields)
+    if event:
+        record_event(record, event, seconds)
+    return record if _put(s3, record, etag) else None
+
+
+# --- 🔧 임대 / 반납 ---
+def lease(s3, lessee):
+    """READY 스택 하나를 LEASED로 바꿔 반환, 없으면 None"""
+    started = _now()
+    ready = sorted((r for r in list_stacks(s3) if r[0]["status"] == READY), key=lambda r: r[0].get("updated_at", 0))
+    for record, etag in ready:
+        idle = started - record.get("updated_at", started)
+        leased = transition(
+            s3, record, etag, LEASED, event="lease", seconds=idle,
+            lessee=lessee, leased_at=_now(), lease_count=record.get("lease_count", 0) + 1, bundle_attached=False
+        )
+        if leased:
+            print(f"🏊 풀 스택 임대: {leased['stack_id']} (대기 {idle:.0f}s, 재사용 {leased['lease_count']}회차, 임대 {_now() - started:.2f}s)")
+            return leased
+    print("🏊 임대 가능한 풀 스택 없음 → 전체 생성으로 진행")
+    return None
+
+
+def attach_bundle(s3, record, bucket, key):
+    """회수(destroy) 때 쓸 수 있게 이번 임대에서 배포한 번들을 스택 위치로 복사하고 임대 기록에 표시"""
+    s3.copy_object(
+        Bucket=POOL_BUCKET, Key=lease_bundle_key(record["stack_id"]),
+        CopySource={"Bucket": bucket, "Key": key}
+    )
+    for _ in range(3):
+        current, etag = load(s3, record["stack_id"])
+        if current is None or current["status"] != LEASED or current.get("leased_at") != record.get("leased_at"):
+            return None
+        attached = transition(s3, current, etag, LEASED, bundle_attached=True)
+        if attached:
+            return attached
+    raise RuntimeError(f"❌ 풀 스택 번들 기록 실패: {record['stack_id']}")
+
+
+def release(s3, stack_id, reason="release"):
+    """LEASED 스택을 RECLAIMING으로 (이미 반납된 스택이면 아무것도 안 함)
+
+    이번 임대의 번들이 붙기 전에 반납되면(사전 점검 실패 / 빌드 시작 실패) 배포한 리소스가 없으므로
+    lease.zip(없거나 이전 임대의 번들)으로 destroy하지 않고 바로 READY로 돌림
+    """
+    for _ in range(3):
+        record, etag = load(s3, stack_id)
+        if record is None or record["status"] != LEASED:
+            return None
+        held = _now() - record.get("leased_at", _now())
+        if not record.get("bundle_attached", True):
+            released = transition(s3, record, etag, READY, event=reason, seconds=held, build_id=None, lessee=None)
+        else:
+            released = transition(s3, record, etag, RECLAIMING, event=reason, seconds=held, build_id=None, reclaim_started_at=_now())
+        if released:
+            print(f"🏊 풀 스택 반납: {stack_id} (임대 {held:.0f}s, {'회수 필요' if released['status'] == RECLAIMING else '배포 전 반납 → READY'})")
+            return released
+    return None
+
+
+def new_stack(s3):
+    record = {
+        "stack_id": uuid.uuid4().hex[:12],
+        "status": PROVISIONING,
+        "created_at": _now(),
+        "updated_at": _now(),
+        "lease_count": 0,
+        "events": []
+    }
+    _put(s3, record)
+    return load(s3, record["stack_id"])
+
+
+def summary(stacks):
+    """상태별 개수 + 이벤트별 평균 소요 시간"""
+    counts, durations = {}, {}
+    for record, _ in stacks:
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        for event in record.get("events", []):
+            if event["seconds"] is not None:
+                durations.setdefault(event["event"], []).append(event["seconds"])
+    return {
+        "counts": counts,
+        "reuse": sum(max(0, r.get("lease_count", 0) - 1) for r, _ in stacks),
+        "avg_seconds": {name: round(sum(v) / len(v), 1) for name, v in durations.items()}
+    }
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import re
+
+import convergence
+
+# terratest `go test -json` (test2json) 출력 파서 + 실패 분류기
+# - 테스트 결과(pass/fail)는 문자열 검색 대신 test2json 이벤트의 Action으로 판단
+# - terraform 에러 블록(Error: ... / with <주소>, / in resource "..." "...")을 묶어 리소스 주소별 실패로 정리
+# - 실패마다 일시적(transient: 스로틀링, 최종 일관성, DNS/ACM 대기 타임아웃 등) / 코드 결함(code)으로 분류
+#   → 모두 일시적이면 LLM 수정 없이 같은 코드로 재배포만 하면 됨
+TRANSIENT = "transient"
+CODE = "code"
+NONE = "none"
+
+MAX_BLOCK_LINES = 12
+
+# terratest logger 접두어: "TestInfraDeployment 2024-06-05T13:00:55+09:00 logger.go:66: "
+_LOGGER_PREFIX = re.compile(r"^\s*Test\w+ \d{4}-\d\d-\d\dT\S+ \S+\.go:\d+: ?")
+_BOX_CHARS = re.compile(r"^[\s│╷╵]+")
+_ERROR_START = re.compile(r"^Error: (.+)")
+_WITH_ADDRESS = re.compile(r"^with ((?:module\.[\w-]+(?:\[[^\]]+\])?\.)*(?:data\.)?[\w-]+\.[\w-]+(?:\[[^\]]+\])?),")
+_IN_BLOCK = re.compile(r'in (resource|data) "([\w-]+)" "([\w-]+)"')
+# testify 요약(Error Trace / Error: Received unexpected error ...)은 terraform 에러를 다시 출력할 뿐이라 제외
+_TESTIFY_ERROR = re.compile(r"^Received unexpected error")
+_TEST_MARKER = re.compile(r"^(?:---|===) ")
+
+TRANSIENT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    # API 스로틀링 / 서비스 측 일시 오류
+    r"RequestLimitExceeded", r"Throttl", r"Rate exceeded", r"TooManyRequests", r"SlowDown",
+    r"ServiceUnavailable", r"InternalError", r"InternalFailure", r"status code: 5\d\d",
+    r"OperationAbortedException", r"ConcurrentModification", r"PriorRequestNotComplete",
+    # 최종 일관성 (방금 만든 리소스를 아직 못 찾음 / IAM 전파 지연)
+    r"InvalidInstanceID\.NotFound", r"InvalidGroup\.NotFound", r"InvalidSubnetID\.NotFound",
+    r"InvalidRouteTableID\.NotFound", r"InvalidAllocationID\.NotFound",
+    r"Invalid IAM Instance Profile", r"cannot be assumed by", r"IncorrectState", r"DependencyViolation",
+    # 네트워크 / 대기 타임아웃 (DNS 전파, ACM 검증 등)
+    r"timeout while waiting for state", r"context deadline exceeded", r"i/o timeout",
+    r"TLS handshake timeout", r"connection reset by peer", r"no such host", r"RequestTimeout",
+    r"waiting for ACM Certificate", r"PENDING_VALIDATION", r"Error acquiring the state lock",
+)]
+
+
+def clean_line(line):
+    """terratest logger 접두어와 terraform 박스 문자를 제거한 본문"""
+    return _BOX_CHARS.sub("", _LOGGER_PREFIX.sub("", line)).rstrip()
+
+
+def iter_events(lines):
+    """test2json 출력 줄 → 이벤트 dict (JSON이 아닌 줄은 output 이벤트로 취급)"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict) or "Action" not in event:
+            event = {"Action": "output", "Output": line + "\n"}
+        yield event
+
+
+def classify(message):
+    for pattern in TRANSIENT_PATTERNS:
+        if pattern.search(message):
+            return TRANSIENT
+    return CODE
+
+
+def _failure(message, detail, address):
+    text = " ".join([message] + detail)
+    return {
+        "address": address,
+        "message": message,
+        "detail": detail,
+        "class": classify(text),
+        "fingerprint": hashlib.sha1(
+            f"{address}|{convergence.normalize_line(message)}".encode("utf-8")
+        ).hexdigest()[:12]
+    }
+
+
+def parse(lines):
+    """test2json 이벤트 스트림 → 테스트 결과 + 리소스 주소별 실패 목록
+
+    반환값: {"passed", "failed_tests", "failures": [{address, message, detail, class, fingerprint}]}
+    """
+    failed_tests, passed_tests = [], []
+    failures = []
+    block = None
+    panic = None
+
+    def _close():
+        nonlocal block
+        if block is not None:
+            failures.append(_failure(block["message"], block["detail"], block["address"]))
+            block = None
+
+    for event in iter_events(lines):
+        action = event["Action"]
+        if action in ("pass", "fail") and event.get("Test"):
+            (passed_tests if action == "pass" else failed_tests).append(event["Test"])
+            continue
+        if action == "fail" and not event.get("Test") and not failed_tests:
+            failed_tests.append(event.get("Package", "package"))
+        if action != "output":
+            continue
+
+        for raw in event.get("Output", "").splitlines():
+            line = clean_line(raw)
+            if line.startswith("panic:") and panic is None:
+                panic = line
+            match = _ERROR_START.match(line)
+            if match:
+                _close()
+                message = match.group(1).strip()
+                if not _TESTIFY_ERROR.match(message):
+                    block = {"message": message, "detail": [], "address": None}
+                continue
+            if block is None:
+                continue
+            if _TEST_MARKER.match(line):
+                _close()
+                continue
+            if not line:
+                # 에러 제목 바로 뒤 빈 줄은 블록의 일부, 상세 내용 뒤 빈 줄에서 블록 종료
+                if block["detail"]:
+                    _close()
+                continue
+            address = _WITH_ADDRESS.match(line)
+            if address and block["address"] is None:
+                block["address"] = address.group(1)
+            elif block["address"] is None:
+                in_block = _IN_BLOCK.search(line)
+                if in_block:
+                    kind, type_, name = in_block.groups()
+                    block["address"] = f"{'data.' if kind == 'data' else ''}{type_}.{name}"
+            if len(block["detail"]) < MAX_BLOCK_LINES:
+                block["detail"].append(line)
+    _close()
+
+    # terraform 에러 블록 없이 실패한 경우 (panic, 테스트 타임아웃 등)
+    if failed_tests and not failures:
+        message = panic or f"test failed: {', '.join(failed_tests)}"
+        failures.append(_failure(message, [], None))
+
+    # 같은 리소스의 같은 에러는 한 번만
+    unique = {}
+    for failure in failures:
+        unique.setdefault(failure["fingerprint"], failure)
+
+    return {
+        "passed": bool(passed_tests) and not failed_tests and not unique,
+        "failed_tests": failed_tests,
+        "failures": list(unique.values())
+    }
+
+
+def failure_class(report):
+    """실패가 모두 일시적이면 transient, 하나라도 코드 결함이면 code, 실패가 없으면 none"""
+    if not report["failures"]:
+        return NONE if report["passed"] else CODE
+    if all(f["class"] == TRANSIENT for f in report["failures"]):
+        return TRANSIENT
+    return CODE
+
+
+def summary(report, limit=20):
+    """프롬프트용 리소스 주소별 실패 요약"""
+    lines = []
+    for failure in report["failures"][:limit]:
+        address = failure["address"] or "(리소스 미상)"
+        lines.append(f"- [{failure['class']}] {address}: {failure['message']}")
+    return "\n".join(lines)
@@ -0,0 +1,249 @@
+import functools
+import json
+import os
+import threading
+import time
+
+import boto3
+
+# Step Functions TaskToken 저장소 (빌드 ID → TaskToken + 원본 input)
+# - 4/6단계가 빌드 시작 직후 put, 7단계(EventBridge 콜백)가 빌드 종료 시 claim
+# - put은 조건부 쓰기(이미 있으면 실패), claim은 PENDING → CLAIMED 조건부 전이라서
+#   같은 빌드 종료 이벤트가 여러 번 와도 send_task_success는 한 번만 호출됨
+# - 오래된 토큰은 TTL(expires_at)로 만료
+#
+# 백엔드 (TOKEN_REGISTRY_BACKEND)
+#   dynamodb : TOKEN_TABLE_NAME 테이블 (파티션 키 build_id, TTL 속성 expires_at)
+#   s3       : 기존 task-token-store/{build_id}.json 위치 (If-None-Match / If-Match 조건부 쓰기)
+#              PENDING 토큰은 task-token-store/pending/{build_id} 표시 객체로 따로 색인 (워치독 목록 조회용,
+#              claim 시 삭제 / release 시 다시 생성, 만료된 토큰은 목록 조회 때 레코드째 삭제)
+#   memory   : 프로세스 메모리 (로컬 실행 / 동작 확인용)
+TOKEN_TABLE_NAME = os.environ.get("TOKEN_TABLE_NAME")
+TOKEN_S3_PREFIX = "task-token-store"
+TOKEN_S3_PENDING_PREFIX = f"{TOKEN_S3_PREFIX}/pending"
+TOKEN_TTL_SECONDS = int(os.environ.get("TOKEN_TTL_SECONDS", str(2 * 24 * 3600)))
+
+PENDING = "PENDING"
+CLAIMED = "CLAIMED"
+
+
+def _record(build_id, task_token, input_, status, expires_at):
+    return {
+        "build_id": build_id,
+        "task_token": task_token,
+        "input": input_,
+        "status": status,
+        "expires_at": expires_at
+    }
+
+
+class DynamoTokenRegistry:
+    def __init__(self, table, client=None):
+        self.table = table
+        self.client = client or boto3.client("dynamodb")
+
+    def put(self, build_id, task_token, input_, ttl=TOKEN_TTL_SECONDS):
+        """새 토큰 등록, 같은 build_id가 이미 있으면 False"""
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={
+                    "build_id": {"S": build_id},
+                    "task_token": {"S": task_token},
+                    "input": {"S": json.dumps(input_)},
+                    "status": {"S": PENDING},
+                    "expires_at": {"N": str(int(time.time()) + ttl)}
+                },
+                ConditionExpression="attribute_not_exists(build_id)"
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def claim(self, build_id):
+        """PENDING 토큰을 CLAIMED로 바꾸고 레코드 반환, 없거나 이미 처리/만료됐으면 None"""
+        try:
+            response = self.client.update_item(
+                TableName=self.table,
+                Key={"build_id": {"S": build_id}},
+                UpdateExpression="SET #s = :claimed",
+                ConditionExpression="#s = :pending AND expires_at > :now",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":claimed": {"S": CLAIMED},
+                    ":pending": {"S": PENDING},
+                    ":now": {"N": str(int(time.time()))}
+                },
+                ReturnValues="ALL_NEW"
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return None
+        return self._from_item(response["Attributes"])
+
+    def release(self, build_id):
+        """콜백 전송이 실패했을 때 다음 이벤트가 다시 처리할 수 있도록 PENDING으로 되돌림"""
+        self.client.update_item(
+            TableName=self.table,
+            Key={"build_id": {"S": build_id}},
+            UpdateExpression="SET #s = :pending",
+            ConditionExpression="#s = :claimed",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":pending": {"S": PENDING}, ":claimed": {"S": CLAIMED}}
+        )
+
+    def list_pending(self):
+        now = int(time.time())
+        paginator = self.client.get_paginator("scan")
+        for page in paginator.paginate(
+            TableName=self.table,
+            FilterExpression="#s = :pending AND expires_at > :now",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":pending": {"S": PENDING}, ":now": {"N": str(now)}}
+        ):
+            for item in page["Items"]:
+                yield self._from_item(item)
+
+    @staticmethod
+    def _from_item(item):
+        return _record(
+            item["build_id"]["S"], item["task_token"]["S"], json.loads(item["input"]["S"]),
+            item["status"]["S"], int(item["expires_at"]["N"])
+        )
+
+
+class S3TokenRegistry:
+    """기존 S3 저장 위치를 그대로 쓰는 백엔드 (DynamoDB 테이블이 없는 환경용)"""
+
+    def __init__(self, bucket, client=None):
+        self.bucket = bucket
+        self.client = client or boto3.client("s3")
+
+    def _key(self, build_id):
+        return f"{TOKEN_S3_PREFIX}/{build_id}.json"
+
+    def _pending_key(self, build_id):
+        return f"{TOKEN_S3_PENDING_PREFIX}/{build_id}"
+
+    def _mark_pending(self, build_id):
+        self.client.put_object(Bucket=self.bucket, Key=self._pending_key(build_id), Body=b"")
+
+    def _unmark_pending(self, build_id):
+        self.client.delete_object(Bucket=self.bucket, Key=self._pending_key(build_id))
+
+    def put(self, build_id, task_token, input_, ttl=TOKEN_TTL_SECONDS):
+        body = _record(build_id, task_token, input_, PENDING, int(time.time()) + ttl)
+        try:
+            self.client.put_object(
+                Bucket=self.bucket, Key=self._key(build_id), Body=json.dumps(body), IfNoneMatch="*"
+            )
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        self._mark_pending(build_id)
+        return True
+
+    def _get(self, build_id):
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(build_id))
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        content = json.loads(obj["Body"].read())
+        # status가 없는 이전 형식({"task_token", "input"})도 PENDING으로 취급
+        content.setdefault("build_id", build_id)
+        content.setdefault("status", PENDING)
+        content.setdefault("expires_at", None)
+        return content, obj["ETag"]
+
+    def _set_status(self, build_id, record, etag, status):
+        record = dict(record, status=status)
+        try:
+            self.client.put_object(
+                Bucket=self.bucket, Key=self._key(build_id), Body=json.dumps(record), IfMatch=etag
+            )
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return None
+            raise
+        return record
+
+    def claim(self, build_id):
+        record, etag = self._get(build_id)
+        if record is None or record["status"] != PENDING:
+            return None
+        if record["expires_at"] is not None and record["expires_at"] <= time.time():
+            return None
+        claimed = self._set_status(build_id, record, etag, CLAIMED)
+        if claimed is not None:
+            # 삭제에 실패해도 목록 조회 때 CLAIMED 레코드를 보고 다시 정리함
+            try:
+                self._unmark_pending(build_id)
+            except self.client.exceptions.ClientError as e:
+                print(f"⚠️ PENDING 색인 삭제 실패 (다음 목록 조회 때 정리): {build_id} ({e})")
+        return claimed
+
+    def release(self, build_id):
+        record, etag = self._get(build_id)
+        if record is not None and record["status"] == CLAIMED:
+            if self._set_status(build_id, record, etag, PENDING) is not None:
+                self._mark_pending(build_id)
+
+    def list_pending(self):
+        """PENDING 색인만 조회 (처리/만료된 레코드 전체를 읽지 않음). 만료된 토큰은 여기서 삭제"""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{TOKEN_S3_PENDING_PREFIX}/"):
+            for item in page.get("Contents", []):
+                build_id = item["Key"][len(TOKEN_S3_PENDING_PREFIX) + 1:]
+                record, _ = self._get(build_id)
+                if record is not None and record["status"] == PENDING:
+                    if record["expires_at"] is None or record["expires_at"] > time.time():
+                        yield record
+                        continue
+                    self.client.delete_object(Bucket=self.bucket, Key=self._key(build_id))
+                self._unmark_pending(build_id)
+
+
+class MemoryTokenRegistry:
+    """DynamoDB 백엔드와 같은 조건부 동작을 하는 메모리 구현 (로컬 실행용)"""
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def put(self, build_id, task_token, input_, ttl=TOKEN_TTL_SECONDS):
+        with self.lock:
+            if build_id in self.items:
+                return False
+            self.items[build_id] = _record(build_id, task_token, input_, PENDING, int(time.time()) + ttl)
+            return True
+
+    def claim(self, build_id):
+        with self.lock:
+            record = self.items.get(build_id)
+            if record is None or record["status"] != PENDING or record["expires_at"] <= time.time():
+                return None
+            record["status"] = CLAIMED
+            return dict(record)
+
+    def release(self, build_id):
+        with self.lock:
+            record = self.items.get(build_id)
+            if record is not None and record["status"] == CLAIMED:
+                record["status"] = PENDING
+
+    def list_pending(self):
+        now = time.time()
+        with self.lock:
+            records = [dict(r) for r in self.items.values() if r["status"] == PENDING and r["expires_at"] > now]
+        return iter(records)
+
+
+@functools.lru_cache(maxsize=1)
+def registry():
+    """환경변수 기준 백엔드 (웜 컨테이너에서는 같은 인스턴스 재사용)"""
+    backend = os.environ.get("TOKEN_REGISTRY_BACKEND") or ("dynamodb" if TOKEN_TABLE_NAME else "s3")
+    if backend == "dynamodb":
+        return DynamoTokenRegistry(TOKEN_TABLE_NAME)
+    if backend == "memory":
+        return MemoryTokenRegistry()
+    return S3TokenRegistry(os.environ["TOKEN_S3_BUCKET"])
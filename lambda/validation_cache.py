@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+
+import convergence
+import log_digest
+import terratest_report
+
+# 정적 검증 결과 캐시: (정규화된 코드 해시, 툴체인 버전) → error.log
+# 같은 terraform.tf를 다시 검증할 때 CodeBuild를 돌리지 않고 이전 결과를 재사용
+CACHE_BUCKET = os.environ.get("VALIDATION_CACHE_BUCKET", "terraform-artifacts-bucket-12")
+CACHE_PREFIX = "validation-cache"
+# terraform / tflint / provider 버전을 올리면 이 값도 바꿔서 캐시를 무효화
+TOOLCHAIN_VERSION = os.environ.get("TOOLCHAIN_VERSION", "default")
+
+# 다시 검증하면 결과가 달라질 수 있는 실패: 캐시하면 같은 코드를 재검증할 때마다 그대로 재생됨
+# terratest 일시적 실패 패턴(스로틀링, 네트워크 등) + provider/모듈 다운로드 실패 + 자격 증명 만료
+UNCACHEABLE_PATTERNS = terratest_report.TRANSIENT_PATTERNS + [re.compile(p, re.IGNORECASE) for p in (
+    r"Failed to install provider", r"Failed to query available provider packages",
+    r"Failed to download module", r"could not connect to registry", r"Required plugins are not installed",
+    r"Backend initialization required", r"Failed to load plugin schemas",
+    r"ExpiredToken", r"InvalidClientTokenId", r"SignatureDoesNotMatch",
+    r"no valid credential sources", r"failed to refresh cached credentials",
+)]
+
+
+def toolchain_key(buildspec):
+    # buildspec 명령이 바뀌어도 결과가 달라질 수 있으므로 툴체인 키에 포함
+    digest = hashlib.sha256(buildspec.encode("utf-8")).hexdigest()[:12]
+    return f"{TOOLCHAIN_VERSION}-{digest}"
+
+
+def cache_key(code, buildspec):
+    return f"{CACHE_PREFIX}/{toolchain_key(buildspec)}/{convergence.code_hash(code)}/error.log"
+
+
+def sibling_key(key, file_name):
+    """같은 캐시 항목에 error.log와 함께 저장하는 파일 (예: plan.json)"""
+    return f"{key.rsplit('/', 1)[0]}/{file_name}"
+
+
+def lookup(s3, key):
+    """캐시에 error.log가 있으면 True"""
+    try:
+        s3.head_object(Bucket=CACHE_BUCKET, Key=key)
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+def uncacheable_reason(s3, bucket, log_key):
+    """error.log에 일시적 / init 실패가 있으면 해당 줄, 없으면 None"""
+    obj = s3.get_object(Bucket=bucket, Key=log_key)
+    for _, line in log_digest.iter_lines(obj["Body"]):
+        if any(pattern.search(line) for pattern in UNCACHEABLE_PATTERNS):
+            return line.strip()
+    return None
+
+
+def store(s3, key, bucket, log_key):
+    # 로그 본문을 람다로 읽지 않고 S3 안에서 복사
+    s3.copy_object(Bucket=CACHE_BUCKET, Key=key, CopySource={"Bucket": bucket, "Key": log_key})
+
+
+def store_result(s3, key, bucket, log_key, has_error, plan_key=None):
+    """검증 결과를 캐시에 저장 (일시적 / init 실패가 보이면 저장하지 않음) → 저장했으면 True
+
+    plan_key: error.log와 함께 저장할 plan.json (없으면 건너뜀)
+    """
+    uncacheable = uncacheable_reason(s3, bucket, log_key) if has_error else None
+    if uncacheable:
+        print(f"⏭️ 일시적 / init 실패라 검증 결과를 캐시하지 않음: {uncacheable[:200]}")
+        return False
+    store(s3, key, bucket, log_key)
+    if plan_key:
+        try:
+            store(s3, sibling_key(key, "plan.json"), bucket, plan_key)
+        except s3.exceptions.ClientError:
+            pass
+    return True
+
+
+def restore(s3, key, bucket, log_key):
+    s3.copy_object(Bucket=bucket, Key=log_key, CopySource={"Bucket": CACHE_BUCKET, "Key": key})
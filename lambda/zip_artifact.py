@@ -0,0 +1,186 @@
+import hashlib
+import struct
+import zlib
+
+# /tmp를 거치지 않는 zip 번들 생성기
+# - 메모리 bytes / S3 객체 본문을 바로 deflate 해서 S3 멀티파트 업로드로 흘려보냄
+# - 호출마다 새 객체를 쓰므로 웜 컨테이너에 남은 이전 실행 파일이 섞이지 않음
+# - 압축 결과는 (파일명, 내용 해시) 기준으로 컨테이너 메모리에 보관해 재시도 시 재사용
+# - 번들 내용(manifest)이 기존 객체와 같으면 업로드 자체를 생략
+PART_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+MAX_CACHED_ENTRY = 2 * 1024 * 1024
+MANIFEST_METADATA = "bundle-manifest"
+
+# 재현 가능한 zip을 위해 수정 시각은 고정 (1980-01-01 00:00)
+_DOS_TIME, _DOS_DATE = 0, (0 << 9) | (1 << 5) | 1
+_FLAGS = 0x0008 | 0x0800  # data descriptor 사용 + UTF-8 파일명
+
+_entry_cache = {}
+
+
+class S3Source:
+    """번들에 넣을 S3 객체 (ETag를 내용 해시 대신 사용)"""
+
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+
+
+class S3MultipartWriter:
+    """write()로 받은 바이트를 PART_SIZE 단위로 S3에 멀티파트 업로드
+
+    전체 크기가 PART_SIZE보다 작으면 put_object 한 번으로 끝냄
+    """
+
+    def __init__(self, s3, bucket, key, metadata=None, part_size=PART_SIZE):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.metadata = metadata or {}
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            response = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType="application/zip", Metadata=self.metadata
+            )
+            self.upload_id = response["UploadId"]
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self):
+        if self.upload_id is None:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer),
+                ContentType="application/zip", Metadata=self.metadata
+            )
+            return
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class ZipStream:
+    """출력 스트림에 zip 엔트리를 순서대로 기록 (seek 불필요)"""
+
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0
+        self.central = []
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def add(self, name, chunks, cache_key=None):
+        """chunks(bytes iterable)를 deflate 해서 기록, cache_key가 있으면 압축 결과를 재사용/보관"""
+        encoded = name.encode("utf-8")
+        header_offset = self.offset
+        self._write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 20, _FLAGS, 8, _DOS_TIME, _DOS_DATE, 0, 0, 0, len(encoded), 0
+        ) + encoded)
+
+        cached = _entry_cache.get(cache_key) if cache_key else None
+        if cached:
+            crc, size, compressed = cached
+            self._write(compressed)
+        else:
+            crc, size, kept = 0, 0, []
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            for chunk in chunks:
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                data = compressor.compress(chunk)
+                if data:
+                    self._write(data)
+                    kept.append(data)
+            data = compressor.flush()
+            self._write(data)
+            kept.append(data)
+            compressed = b"".join(kept)
+            if cache_key and len(compressed) <= MAX_CACHED_ENTRY:
+                _entry_cache[cache_key] = (crc, size, compressed)
+
+        self._write(struct.pack("<IIII", 0x08074B50, crc, len(compressed), size))
+        self.central.append((encoded, crc, len(compressed), size, header_offset))
+        return cached is not None
+
+    def close(self):
+        start = self.offset
+        for encoded, crc, compressed_size, size, header_offset in self.central:
+            self._write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 20, 20, _FLAGS, 8, _DOS_TIME, _DOS_DATE,
+                crc, compressed_size, size, len(encoded), 0, 0, 0, 0, 0o100644 << 16, header_offset
+            ) + encoded)
+        self._write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, len(self.central), len(self.central), self.offset - start, start, 0
+        ))
+
+
+def _s3_chunks(s3, source):
+    body = s3.get_object(Bucket=source.bucket, Key=source.key)["Body"]
+    return iter(lambda: body.read(CHUNK_SIZE), b"")
+
+
+def upload_zip(s3, bucket, key, entries):
+    """entries: [(zip 안 경로, bytes 또는 S3Source)] → s3://bucket/key 로 zip 업로드
+
+    반환값: {"uploaded": 업로드 여부, "reused_entries": 압축 재사용 엔트리 수, "manifest": manifest 해시}
+    """
+    # 엔트리별 내용 식별자 (bytes는 sha256, S3 객체는 ETag)
+    resolved = []
+    for name, content in entries:
+        if isinstance(content, S3Source):
+            etag = s3.head_object(Bucket=content.bucket, Key=content.key)["ETag"].strip('"')
+            resolved.append((name, content, f"s3:{etag}"))
+        else:
+            resolved.append((name, content, hashlib.sha256(content).hexdigest()))
+    manifest = hashlib.sha256(
+        "\n".join(f"{name}:{digest}" for name, _, digest in resolved).encode("utf-8")
+    ).hexdigest()
+
+    try:
+        existing = s3.head_object(Bucket=bucket, Key=key)
+        if existing.get("Metadata", {}).get(MANIFEST_METADATA) == manifest:
+            return {"uploaded": False, "reused_entries": len(resolved), "manifest": manifest}
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+            raise
+
+    writer = S3MultipartWriter(s3, bucket, key, metadata={MANIFEST_METADATA: manifest})
+    stream = ZipStream(writer)
+    reused = 0
+    try:
+        for name, content, digest in resolved:
+            cache_key = (name, digest)
+            if isinstance(content, S3Source):
+                chunks = iter(()) if cache_key in _entry_cache else _s3_chunks(s3, content)
+            else:
+                chunks = [content]
+            reused += stream.add(name, chunks, cache_key)
+        stream.close()
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    return {"uploaded": True, "reused_entries": reused, "manifest": manifest}
@@ -0,0 +1,38 @@
+# convergence.error_fingerprints 에러 지문 추출 확인
+#
+# 사용법: python -m unittest discover tests (또는 python -m pytest tests)
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+import convergence
+
+
+class ErrorFingerprintsTest(unittest.TestCase):
+    def test_back_to_back_errors_are_counted_separately(self):
+        # 첫 에러의 문맥(in resource ...)이 나오기 전에 다음 에러가 시작되는 경우
+        lines = [
+            "Error: Unsupported argument",
+            "Error: Reference to undeclared resource",
+            '  on main.tf line 12, in resource "aws_lb" "app":',
+        ]
+        self.assertEqual(len(convergence.error_fingerprints(lines)), 2)
+
+    def test_same_message_in_different_resources(self):
+        lines = [
+            "Error: Unsupported argument",
+            '  on main.tf line 3, in resource "aws_instance" "web":',
+            "",
+            "Error: Unsupported argument",
+            '  on main.tf line 9, in resource "aws_instance" "api":',
+        ]
+        self.assertEqual(len(convergence.error_fingerprints(lines)), 2)
+
+    def test_repeated_error_is_one_fingerprint(self):
+        lines = ["Error: timeout", "", "Error: timeout"]
+        self.assertEqual(len(convergence.error_fingerprints(lines)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()